@@ -1,9 +1,26 @@
 import os
+import sys
 import json
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta, time as dt_time
+from concurrent.futures import ThreadPoolExecutor
 from fyers_apiv3 import fyersModel
 
+# Shared candle warehouse lives in the trading project (core/candle_data.py)
+TRADING_API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "Algo Baddu Trading API")
+
+# Fyers symbol -> warehouse instrument (same bars the backtests and live warm-up use)
+WAREHOUSE_SYMBOLS = {"NSE:NIFTY50-INDEX": "NSE_INDEX|Nifty 50"}
+
+def get_warehouse():
+    """Shared candle warehouse, or None if the trading project / pyarrow is not available"""
+    sys.path.append(os.path.abspath(TRADING_API_DIR))
+    try:
+        from core.candle_data import get_warehouse as _get_warehouse
+    except ImportError:
+        return None
+    return _get_warehouse()
+
 # Load access token from token.json
 def load_token():
     token_file = "token.json"
@@ -32,8 +49,117 @@ def build_fyers_client():
     )
     return fyers
 
+# Fyers API allows max 100 days per intraday request
+MAX_CHUNK_DAYS = 100
+
+# Chunks sit on a fixed calendar grid (MAX_CHUNK_DAYS-day cells counted from this date),
+# so partitions keep their names from one day's run to the next
+CHUNK_GRID_ORIGIN = date(1970, 1, 1)
+SESSION_CLOSE = dt_time(15, 30)
+
+# Fyers API limits: (requests, window seconds)
+FYERS_RATE_LIMITS = [(10, 1), (200, 60)]
+
+def get_rate_limiter():
+    """Shared sliding-window limiter (core/token_guard) sized for Fyers, or None if unavailable"""
+    sys.path.append(os.path.abspath(TRADING_API_DIR))
+    try:
+        from core.token_guard import SlidingWindowLimiter
+    except ImportError:
+        return None
+    return SlidingWindowLimiter(FYERS_RATE_LIMITS)
+
+# ---------- Chunk partitions + manifest (resume) ----------
+def chunk_ranges(start_day, end_day, max_days=MAX_CHUNK_DAYS):
+    """
+    Grid cells covering start_day → end_day (inclusive).
+
+    Returns:
+        [(name, first_day, last_day), ...] - name is the whole cell ('YYYY-MM-DD_YYYY-MM-DD'),
+        first/last_day the part of it inside the requested window
+    """
+    ranges = []
+    cell = (start_day - CHUNK_GRID_ORIGIN).days // max_days
+    while True:
+        cell_start = CHUNK_GRID_ORIGIN + timedelta(days=cell * max_days)
+        cell_end = cell_start + timedelta(days=max_days - 1)
+        if cell_start > end_day:
+            break
+        ranges.append((f"{cell_start}_{cell_end}", max(cell_start, start_day), min(cell_end, end_day)))
+        cell += 1
+    return ranges
+
+def chunk_covers(entry, first_day, last_day):
+    """True if a manifest entry is a finished fetch spanning first_day → last_day"""
+    return (entry is not None and entry.get("complete")
+            and entry.get("first_day", "9999") <= str(first_day) and entry.get("last_day", "") >= str(last_day))
+
+def load_manifest(path):
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            print("⚠️ Manifest unreadable - refetching all chunks.")
+    return {"chunks": {}}
+
+def save_manifest(path, manifest):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def write_atomic_csv(df, path):
+    """Write to a temp file and rename, so a crash never leaves a half-written file behind"""
+    tmp_path = f"{path}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+def read_chunk(path):
+    df = pd.read_csv(path)
+    if df.empty:
+        return df
+    df["datetime"] = pd.to_datetime(df["datetime"]).dt.tz_convert("Asia/Kolkata")
+    return df
+
+def fetch_chunk(fyers, symbol, resolution, chunk_start, chunk_end, limiter=None):
+    """
+    One fyers.history call.
+
+    Returns:
+        (df or None on error, raw response)
+    """
+    print(f"🕒 Fetching from {chunk_start.strftime('%Y-%m-%d %H:%M')} to {chunk_end.strftime('%Y-%m-%d %H:%M')} IST")
+    params = {
+        "symbol": symbol,
+        "resolution": resolution,
+        "date_format": 0,
+        "range_from": int(chunk_start.timestamp()),
+        "range_to": int(chunk_end.timestamp()),
+        "cont_flag": 1
+    }
+    if limiter is not None:
+        limiter.acquire()
+    response = fyers.history(params)
+    if response.get("s") != "ok":
+        print("❌ Error fetching data:", response)
+        return None, response
+    candles = response.get("candles", [])
+    if not candles:
+        print("⚠️ No data returned.")
+    df = pd.DataFrame(candles, columns=["timestamp", "open", "high", "low", "close", "volume"])
+    df["datetime"] = pd.to_datetime(df["timestamp"], unit="s").dt.tz_localize("UTC").dt.tz_convert("Asia/Kolkata")
+    return df[["datetime", "open", "high", "low", "close", "volume"]], response
+
 # Fetch OHLC candles using fyers.history
-def get_ohlc(symbol="NSE:NIFTY50-INDEX", resolution="5", days_back=365):
+def get_ohlc(symbol="NSE:NIFTY50-INDEX", resolution="5", days_back=365, workers=4):
+    """
+    Chunks are fetched concurrently (within FYERS_RATE_LIMITS) and each one is written
+    atomically to its own partition file; manifest.json records finished chunks, so a
+    re-run after a failure only fetches what is left. Chunks follow a fixed calendar grid,
+    so on later days only the cell holding the newest days is fetched again.
+    The final CSV is written once.
+    """
     fyers = build_fyers_client()
     include_today = True
     end_dt = datetime.now().astimezone().replace(hour=15, minute=30, second=0, microsecond=0)
@@ -41,60 +167,109 @@ def get_ohlc(symbol="NSE:NIFTY50-INDEX", resolution="5", days_back=365):
         end_dt -= timedelta(days=1)
     start_dt = end_dt - timedelta(days=days_back)
 
-    # Fyers API allows max 100 days per intraday request
-    max_chunk = 100
-    chunk_start = start_dt
-    all_chunks = []
+    # Past days already in the warehouse are not downloaded again
+    warehouse = get_warehouse()
+    instrument = WAREHOUSE_SYMBOLS.get(symbol, symbol)
+    interval = f"{resolution}minute" if str(resolution).isdigit() else str(resolution)
+    missing = None
+    fetch_start = start_dt
+    if warehouse is not None:
+        last_past_day = end_dt.date() - timedelta(days=1)
+        missing = warehouse.missing_range(instrument, interval, start_dt.date(), last_past_day)
+        first_needed = missing[0] if missing else end_dt.date()
+        fetch_start = max(start_dt, datetime.combine(first_needed, dt_time.min, tzinfo=end_dt.tzinfo))
+        if fetch_start > start_dt:
+            print(f"📦 Warehouse already has {start_dt.date()} → {fetch_start.date() - timedelta(days=1)}")
+
     output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Output CSV")
-    os.makedirs(output_dir, exist_ok=True)
     csv_file = os.path.join(output_dir, "nifty_5min_last_year.csv")
-    first_chunk = True
-
-    # Remove old CSV if exists
-    if os.path.exists(csv_file):
-        os.remove(csv_file)
-
-    while chunk_start < end_dt:
-        chunk_end = min(chunk_start + timedelta(days=max_chunk), end_dt)
-        start_epoch = int(chunk_start.timestamp())
-        end_epoch = int(chunk_end.timestamp())
-        print(f"🕒 Fetching from {chunk_start.strftime('%Y-%m-%d %H:%M')} to {chunk_end.strftime('%Y-%m-%d %H:%M')} IST")
-        params = {
-            "symbol": symbol,
-            "resolution": resolution,
-            "date_format": 0,
-            "range_from": start_epoch,
-            "range_to": end_epoch,
-            "cont_flag": 1
-        }
-        response = fyers.history(params)
-        if response.get("s") != "ok":
-            print("❌ Error fetching data:", response)
-            chunk_start = chunk_end
-            continue
-        candles = response.get("candles", [])
-        if not candles:
-            print("⚠️ No data returned.")
-            chunk_start = chunk_end
-            continue
-        df = pd.DataFrame(candles, columns=["timestamp", "open", "high", "low", "close", "volume"])
-        df["datetime"] = pd.to_datetime(df["timestamp"], unit="s").dt.tz_localize("UTC").dt.tz_convert("Asia/Kolkata")
-        df = df[["datetime", "open", "high", "low", "close", "volume"]]
-        all_chunks.append(df)
-        # Optional: append to CSV after each chunk
-        df.to_csv(csv_file, mode="a", header=first_chunk, index=False)
-        first_chunk = False
-        chunk_start = chunk_end
+    chunk_dir = os.path.join(output_dir, f"chunks_{symbol.replace(':', '_')}_{resolution}")
+    os.makedirs(chunk_dir, exist_ok=True)
+    manifest_path = os.path.join(chunk_dir, "manifest.json")
+    manifest = load_manifest(manifest_path)
+
+    # ---------- Plan: reuse finished chunks, fetch the rest ----------
+    # A partition fetched on an earlier day is reused as long as it covers the days needed now
+    plan = []
+    for name, first_day, last_day in chunk_ranges(fetch_start.date(), end_dt.date()):
+        chunk_start = max(fetch_start, datetime.combine(first_day, dt_time.min, tzinfo=end_dt.tzinfo))
+        chunk_end = datetime.combine(last_day, SESSION_CLOSE, tzinfo=end_dt.tzinfo)
+        path = os.path.join(chunk_dir, f"{name}.csv")
+        done = chunk_covers(manifest["chunks"].get(name), first_day, last_day) and os.path.exists(path)
+        plan.append((name, chunk_start, chunk_end, path, done))
+    pending = [item for item in plan if not item[4]]
+    if len(pending) < len(plan):
+        print(f"♻️ Resuming: {len(plan) - len(pending)}/{len(plan)} chunks already on disk")
+
+    limiter = get_rate_limiter()
+    if limiter is None:
+        workers = 1
+    response = None
+    failed = 0
+
+    def run(item):
+        name, chunk_start, chunk_end, path, _ = item
+        try:
+            df, raw = fetch_chunk(fyers, symbol, resolution, chunk_start, chunk_end, limiter)
+        except Exception as e:
+            print(f"❌ Chunk {chunk_start.date()} → {chunk_end.date()} failed: {e}")
+            return item, None, None
+        if df is not None:
+            write_atomic_csv(df, path)
+        return item, df, raw
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending)))) as pool:
+            for (name, chunk_start, chunk_end, path, _), df, raw in pool.map(run, pending):
+                response = raw if raw is not None else response
+                if df is None:
+                    failed += 1
+                    continue
+                # A chunk reaching into a session that is still open is refetched next time
+                complete = datetime.now().astimezone() >= chunk_end
+                manifest["chunks"][name] = {"file": os.path.basename(path), "rows": len(df), "complete": complete,
+                                            "first_day": str(chunk_start.date()), "last_day": str(chunk_end.date())}
+                save_manifest(manifest_path, manifest)
+    if failed:
+        print(f"❌ {failed} chunk(s) failed - run again to resume. Existing CSV left untouched.")
+        return None
+
+    # ---------- Build the final dataset from the partitions (single write) ----------
+    all_chunks = [df for df in (read_chunk(item[3]) for item in plan) if not df.empty]
+    if warehouse is not None:
+        fetched = pd.concat(all_chunks, ignore_index=True) if all_chunks else pd.DataFrame()
+        today_df = pd.DataFrame()
+        if not fetched.empty:
+            # Today's bars can still be forming - only finished days go into the warehouse
+            is_today = fetched["datetime"].dt.date >= end_dt.date()
+            warehouse.write(instrument, interval, fetched[~is_today])
+            today_df = fetched[is_today]
+        if missing:
+            warehouse.mark_complete(instrument, interval, pd.date_range(*missing).date)
+        stored = warehouse.read(instrument, interval, start=start_dt.date(), end=end_dt.date() - timedelta(days=1))
+        all_chunks = [df for df in (stored, today_df) if not df.empty]
     if not all_chunks:
         print("❌ No data fetched for any chunk.")
         return None
     final_df = pd.concat(all_chunks, ignore_index=True)
+    # Reused partitions can start before this run's window
+    final_df = final_df[final_df["datetime"] >= start_dt]
     final_df = final_df.drop_duplicates(subset=["datetime"]).reset_index(drop=True)
-    final_df.to_csv(csv_file, index=False)
+    write_atomic_csv(final_df, csv_file)
     print(f"✅ Final dataset: {len(final_df)} candles from {final_df['datetime'].iloc[0]} to {final_df['datetime'].iloc[-1]}")
+
+    # Partitions outside the current window (and old epoch-named ones) are no longer needed
+    current = {item[0] for item in plan}
+    for name in [n for n in manifest["chunks"] if n not in current]:
+        stale_path = os.path.join(chunk_dir, manifest["chunks"].pop(name)["file"])
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+    save_manifest(manifest_path, manifest)
+
     # Save raw response of last chunk for inspection
-    with open("fetched_candles.json", "w") as f:
-        json.dump(response, f, indent=2)
+    if response is not None:
+        with open("fetched_candles.json", "w") as f:
+            json.dump(response, f, indent=2)
     return final_df
 
 
@@ -33,25 +33,132 @@ def get_profile():
 def get_market_quote():
     return fyers.quotes({"symbols": "NSE:NIFTY50-INDEX"})
 
-# 🧠 GitHub Copilot Prompt:
-# Add a FastAPI route /candles in my main.py that reads candle data from a local file named "fetched_candles.json" and returns it as JSON.
-# If the file doesn't exist, return a 404 error with message "Candle data not found."
-# If there's an error while reading or parsing the JSON, return a 500 error with the exception message
-# Assume the file is in the same directory as main.py
-# Use JSONResponse from FastAPI for responses
-
-from fastapi.responses import JSONResponse
+# 🕯️ /candles - served from an in-memory columnar copy of "fetched_candles.json"
+# - The file is re-read only when its mtime changes (dashboards can poll freely)
+# - ?from=&to= (epoch seconds or ISO date/datetime, IST if naive; a bare `to` date means the
+#   whole day) → binary search on timestamps
+# - ?limit=N → the N most recent candles of the range
+# - Large responses are streamed in batches instead of being built as one string
+# 404 if the file doesn't exist, 500 if it can't be read / parsed
+
+from fastapi import Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 import os
 import json
+import bisect
+import threading
+
+CANDLES_FILE = os.path.join(os.path.dirname(__file__), "fetched_candles.json")
+STREAM_BATCH = 2000  # candles per streamed chunk; smaller results are sent in one response
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+class CandleStore:
+    """Columnar copy of a candle file: one list per field, sorted by timestamp."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.snapshot = None  # (meta, timestamps, columns) - replaced as a whole on reload
+
+    def load(self):
+        """
+        Current snapshot, re-parsing the file only if its mtime changed.
+
+        Raises:
+            FileNotFoundError if the file is missing, ValueError if it can't be parsed
+        """
+        mtime = os.stat(self.path).st_mtime_ns
+        with self.lock:
+            if mtime != self.mtime:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+                # Fyers history payload {"candles": [...], "s": ..., ...} or a bare list of candles.
+                # Anything else (e.g. a Fyers error response) is kept as-is and returned unchanged.
+                if isinstance(data, dict) and "candles" in data:
+                    candles = data.get("candles") or []
+                    meta = {k: v for k, v in data.items() if k != "candles"}
+                elif isinstance(data, list):
+                    candles, meta = data, None
+                else:
+                    candles, meta = None, data
+                if candles is None:
+                    timestamps, columns = [], None
+                else:
+                    candles = sorted(candles, key=lambda c: c[0])
+                    columns = [list(col) for col in zip(*candles)]
+                    timestamps = columns[0] if columns else []
+                self.snapshot = (meta, timestamps, columns)
+                self.mtime = mtime
+            return self.snapshot
+
+
+def parse_bound(value, end_of_day=False):
+    """
+    Epoch seconds or ISO date/datetime (naive = IST) → epoch seconds.
+    With end_of_day, a bare date ('2025-06-02') means 23:59:59 of that day (for `to`).
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value.lstrip("-").isdigit():
+        return int(value)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=IST)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1, seconds=-1)
+    return int(parsed.timestamp())
+
+
+def stream_candles(meta, columns, lo, hi):
+    """JSON body in the original shape ({"candles": <file payload>}), yielded batch by batch"""
+    if meta is None:
+        yield '{"candles": ['
+    else:
+        fields = "".join(f"{json.dumps(k)}: {json.dumps(v)}, " for k, v in meta.items())
+        yield '{"candles": {' + fields + '"candles": ['
+    for start in range(lo, hi, STREAM_BATCH):
+        end = min(start + STREAM_BATCH, hi)
+        batch = json.dumps(list(zip(*(col[start:end] for col in columns))))[1:-1]
+        yield batch if start == lo else "," + batch
+    yield "]}" if meta is None else "]}}"
+
+
+candle_store = CandleStore(CANDLES_FILE)
+
 
 @app.get("/candles")
-def get_candles():
-    file_path = os.path.join(os.path.dirname(__file__), "fetched_candles.json")
-    if not os.path.exists(file_path):
-        return JSONResponse(status_code=404, content={"error": "Candle data not found."})
+def get_candles(
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+):
     try:
-        with open(file_path, "r") as f:
-            data = json.load(f)
-        return JSONResponse(content={"candles": data})
+        meta, timestamps, columns = candle_store.load()
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": "Candle data not found."})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
+
+    try:
+        start, end = parse_bound(from_), parse_bound(to, end_of_day=True)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": f"Invalid from/to: {e}"})
+
+    if columns is None:
+        return JSONResponse(content={"candles": meta})  # No candle list in the file - payload unchanged
+
+    lo = 0 if start is None else bisect.bisect_left(timestamps, start)
+    hi = len(timestamps) if end is None else bisect.bisect_right(timestamps, end)
+    hi = max(lo, hi)
+    if limit is not None:
+        lo = max(lo, hi - limit)
+
+    body = stream_candles(meta, columns, lo, hi)
+    if hi - lo <= STREAM_BATCH:
+        return Response(content="".join(body), media_type="application/json")
+    return StreamingResponse(body, media_type="application/json")
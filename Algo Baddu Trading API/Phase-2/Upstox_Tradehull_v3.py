@@ -2,8 +2,12 @@
 import requests
 import json
 import os
-import time
-from datetime import datetime, timedelta
+import sys
+from datetime import datetime
+
+# Project root on sys.path for the shared core/ package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.token_guard import get_upstox_client
 
 # Base URL for Upstox API
 BASE_URL = "https://api.upstox.com/v2/"
@@ -38,26 +42,20 @@ class UpstoxDataFetcher:
             for key, value in path_params.items():
                 url = url.replace(f"{{{key}}}", str(value))
 
-        retries = 3
-        backoff_factor = 0.5
-        for i in range(retries):
-            try:
-                if method.upper() == "GET":
-                    response = requests.get(url, headers=self.headers, params=params)
-                else:
-                    raise ValueError("Unsupported HTTP method.")
+        if method.upper() != "GET":
+            raise ValueError("Unsupported HTTP method.")
 
-                response.raise_for_status()  # Raise an exception for bad status codes
-                return response.json()
-            except requests.exceptions.RequestException as e:
-                print(f"Error during API call to {url}: {e}. Attempt {i+1} of {retries}.")
-                if i < retries - 1:
-                    time.sleep(backoff_factor * (2 ** i))
-                else:
-                    log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
-                    os.makedirs(log_dir, exist_ok=True)
-                    with open(os.path.join(log_dir, "upstox_errors.log"), "a") as f:
-                        f.write(f"{datetime.now().isoformat()} - Failed request to {url}. Error: {e}. Response: {e.response.text if e.response else 'No response'}\n")
+        # Shared client: pooled connections, process-wide rate budget, jittered retries
+        try:
+            response = get_upstox_client().get(url, headers=self.headers, params=params)
+            response.raise_for_status()  # Raise an exception for bad status codes
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"Error during API call to {url}: {e}.")
+            log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+            os.makedirs(log_dir, exist_ok=True)
+            with open(os.path.join(log_dir, "upstox_errors.log"), "a") as f:
+                f.write(f"{datetime.now().isoformat()} - Failed request to {url}. Error: {e}. Response: {e.response.text if e.response is not None else 'No response'}\n")
         return None
 
     def get_expiries(self, underlying_instrument_key: str):
@@ -0,0 +1,202 @@
+"""
+BACKTEST RESULT CACHE - CONTENT-ADDRESSED
+
+run_backtest() is deterministic for a given dataset, strategy version and
+parameter set, so its output is stored on disk under a key derived from all
+three. Repeated sweeps and reports are served from the cache; only new or
+changed configurations are simulated.
+
+Key = sha256(dataset fingerprint + strategy class/version + engine source + params)
+"""
+
+import os
+import json
+import hashlib
+import inspect
+import pickle
+import time
+import numpy as np
+import pandas as pd
+
+import strategy_v30
+import paper_trader_dynamic
+from strategy_v30 import StrategyV30
+from paper_trader_dynamic import run_backtest, DEFAULT_EXIT_STAGES
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backtest_cache")
+
+# Bump to invalidate every stored result (e.g. when the metrics layout changes)
+CACHE_FORMAT = 1
+
+_code_hash = None
+
+
+# ==================== KEYS ====================
+def dataset_fingerprint(nifty_df, options_df):
+    """
+    Content hash of the prepared NIFTY and options frames.
+    Recomputed on every call (~40ms for a year of 5-minute data) - a memo keyed on the
+    frame objects would go stale when a frame is edited in place or its id() is reused.
+    """
+    h = hashlib.sha256()
+    for df in (nifty_df, options_df):
+        h.update(",".join(map(str, df.columns)).encode())
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def code_fingerprint():
+    """Hash of the strategy and engine source - editing either invalidates the cache."""
+    global _code_hash
+    if _code_hash is None:
+        h = hashlib.sha256()
+        for module in (strategy_v30, paper_trader_dynamic):
+            h.update(inspect.getsource(module).encode())
+        _code_hash = h.hexdigest()
+    return _code_hash
+
+
+def cache_key(nifty_df, options_df, params, exit_stages=None):
+    """Build the content address for one run_backtest configuration."""
+    stages = {**DEFAULT_EXIT_STAGES, **(exit_stages or {})}
+    payload = {
+        'format': CACHE_FORMAT,
+        'dataset': dataset_fingerprint(nifty_df, options_df),
+        'strategy': StrategyV30.__name__,
+        'version': StrategyV30().get_config()['version'],
+        'code': code_fingerprint(),
+        'params': {k: float(v) for k, v in sorted(params.items())},
+    }
+    # Only non-default stages enter the key, so default runs keep their existing entries
+    if stages != DEFAULT_EXIT_STAGES:
+        payload['exit_stages'] = {k: float(v) for k, v in sorted(stages.items())}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+# ==================== METRICS ====================
+def summarize_trades(trades):
+    """
+    Summary metrics for a trade list (same definitions as generate_report).
+
+    Returns:
+        dict of plain floats/ints (JSON serializable)
+    """
+    if not trades:
+        return {'total_trades': 0, 'win_rate': 0.0, 'net_pnl': 0.0, 'profit_factor': 0.0,
+                'max_drawdown': 0.0, 'tp1_hit_rate': 0.0}
+
+    pnl = np.array([t['PnL_INR'] for t in trades], dtype=np.float64)
+    equity = np.cumsum(pnl)
+    gross_profit = pnl[pnl > 0].sum()
+    gross_loss = -pnl[pnl < 0].sum()
+
+    return {
+        'total_trades': len(trades),
+        'win_rate': round(float((pnl > 0).mean() * 100), 2),
+        'net_pnl': round(float(pnl.sum()), 2),
+        'profit_factor': round(float(gross_profit / gross_loss), 4) if gross_loss > 0 else float('inf'),
+        'max_drawdown': round(float((equity - np.maximum.accumulate(equity)).min()), 2),
+        'tp1_hit_rate': round(float(np.mean([bool(t['TP1_Hit']) for t in trades]) * 100), 2),
+    }
+
+
+# ==================== STORAGE ====================
+def _paths(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.pkl"), os.path.join(cache_dir, f"{key}.json")
+
+
+def _atomic_write(path, data, mode):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, mode) as f:
+        if mode == "wb":
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            json.dump(data, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def load_cached(key, cache_dir=CACHE_DIR):
+    """Return (trades, metrics) for a key, or None on a miss / unreadable entry."""
+    trades_path, meta_path = _paths(key, cache_dir)
+    if not (os.path.exists(trades_path) and os.path.exists(meta_path)):
+        return None
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        with open(trades_path, "rb") as f:
+            trades = pickle.load(f)
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+        return None
+    return trades, meta['metrics']
+
+
+def store_cached(key, trades, metrics, params, cache_dir=CACHE_DIR):
+    """Write trades + metrics for a key (trades first, so the JSON marks a complete entry)."""
+    os.makedirs(cache_dir, exist_ok=True)
+    trades_path, meta_path = _paths(key, cache_dir)
+    _atomic_write(trades_path, trades, "wb")
+    _atomic_write(meta_path, {
+        'params': params,
+        'metrics': metrics,
+        'strategy': StrategyV30.__name__,
+        'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+    }, "w")
+
+
+# ==================== CACHED ENTRY POINTS ====================
+def cached_run_backtest(nifty_df, options_df, ema_period=21, vi_period=21, sl_multiplier=2.0, tp_points=10,
+                        trail_atr_multiplier=0.5, workers=1, verbose=False, cache_dir=CACHE_DIR, refresh=False,
+                        exit_stages=None):
+    """
+    run_backtest() with a disk cache in front of it.
+
+    Args:
+        Same as run_backtest, plus:
+        cache_dir: Where results are stored
+        refresh: Ignore any cached entry and re-simulate
+
+    Returns:
+        (trades, metrics, cache_hit)
+    """
+    params = dict(ema_period=ema_period, vi_period=vi_period, sl_multiplier=sl_multiplier,
+                  tp_points=tp_points, trail_atr_multiplier=trail_atr_multiplier)
+    key = cache_key(nifty_df, options_df, params, exit_stages)
+
+    if not refresh:
+        cached = load_cached(key, cache_dir)
+        if cached is not None:
+            return cached[0], cached[1], True
+
+    trades = run_backtest(nifty_df, options_df, workers=workers, verbose=verbose, exit_stages=exit_stages, **params)
+    metrics = summarize_trades(trades)
+    store_cached(key, trades, metrics, {**params, 'exit_stages': exit_stages}, cache_dir)
+    return trades, metrics, False
+
+
+def cached_sweep(nifty_df, options_df, configs, workers=1, cache_dir=CACHE_DIR, refresh=False):
+    """
+    Evaluate a list of parameter dicts, simulating only the uncached ones.
+
+    Args:
+        configs: List of dicts with run_backtest parameter names
+                 (ema_period/vi_period must match the indicator columns in nifty_df)
+
+    Returns:
+        pd.DataFrame with one row per config (params + metrics + 'Cached'), best net P&L first
+    """
+    rows = []
+    hits = 0
+    start = time.time()
+    for i, params in enumerate(configs, 1):
+        _, metrics, hit = cached_run_backtest(nifty_df, options_df, workers=workers,
+                                              cache_dir=cache_dir, refresh=refresh, **params)
+        hits += hit
+        if not hit:
+            print(f"   [{i}/{len(configs)}] Simulated {params} → ₹{metrics['net_pnl']:,.0f}")
+        rows.append({**params, **metrics, 'Cached': hit})
+
+    print(f"✅ Sweep done: {len(configs)} configs | {hits} cached | {len(configs) - hits} simulated | "
+          f"{time.time() - start:.1f}s")
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values('net_pnl', ascending=False).reset_index(drop=True)
@@ -0,0 +1,265 @@
+"""
+OUT-OF-CORE CHUNKED BACKTEST - MULTI-YEAR / 1-MINUTE DATA
+
+load_and_prepare_data() reads the whole history into memory, which does not
+scale to 5+ years of 1-minute NIFTY + ATM options. This module:
+1. Converts the CSVs (read in row chunks) into a columnar Parquet store,
+   one file per calendar month for NIFTY and for options
+2. Streams the store back one month-group at a time (day-aligned chunks)
+3. Carries indicator state across chunk boundaries:
+   - EMA / MACD: recursive, seeded with the previous chunk's last values
+   - Vortex / Choppiness: rolling, computed over a short tail of previous rows
+4. Carries any open position across chunks through simulate_day()
+
+Peak memory is bounded by the largest chunk, not by the history length.
+"""
+
+import os
+import glob
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pandas_ta as ta
+
+from strategy_v30 import StrategyV30
+from paper_trader_dynamic import (EMA, choppiness_index, simulate_day, split_by_trading_day, compact_options_frame,
+                                  DEFAULT_EXIT_STAGES)
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "columnar_store")
+
+NIFTY_CSV = r"C:\Users\sakth\Desktop\VSCODE\Algo Baddu Trading API\Phase-2\nifty_5min_last_year.csv"
+OPTIONS_CSV = r"C:\Users\sakth\Desktop\VSCODE\extras\atm_daily_options_HYBRID_V3_ULTRA_FIXED.csv"
+
+
+# ==================== COLUMNAR STORE ====================
+class _MonthWriters:
+    """One ParquetWriter per month; months older than the current chunk are closed (input is time-sorted)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.writers = {}
+        self.schema = None
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, df, month_col):
+        for month in sorted(df[month_col].unique()):
+            for old in [m for m in self.writers if m < month]:
+                self.writers.pop(old).close()
+            part = df[df[month_col] == month].drop(columns=[month_col])
+            table = pa.Table.from_pandas(part, schema=self.schema, preserve_index=False)
+            if self.schema is None:
+                self.schema = table.schema
+            if month not in self.writers:
+                path = os.path.join(self.directory, f"{month}.parquet")
+                self.writers[month] = pq.ParquetWriter(path, self.schema, compression="zstd")
+            self.writers[month].write_table(table)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+
+def build_columnar_store(nifty_csv=NIFTY_CSV, options_csv=OPTIONS_CSV, store_dir=STORE_DIR, csv_chunksize=200_000):
+    """
+    Convert the NIFTY and options CSVs into monthly Parquet files without loading either fully.
+
+    Returns:
+        dict with row counts per dataset
+    """
+    counts = {}
+    for name, path, time_col, month_source in (
+        ('nifty', nifty_csv, 'datetime', 'datetime'),
+        ('options', options_csv, 'datetime', 'trading_day'),
+    ):
+        print(f"[INFO] Building columnar store for {name} from {path}...")
+        directory = os.path.join(store_dir, name)
+        for stale in glob.glob(os.path.join(directory, "*.parquet")):
+            os.remove(stale)
+        writers = _MonthWriters(directory)
+        rows = 0
+        try:
+            for chunk in pd.read_csv(path, chunksize=csv_chunksize):
+                chunk[time_col] = pd.to_datetime(chunk[time_col])
+                if 'trading_day' in chunk.columns:
+                    chunk['trading_day'] = pd.to_datetime(chunk['trading_day']).dt.date
+                for redundant in ('timestamp', 'date'):
+                    if redundant in chunk.columns and name == 'options':
+                        chunk = chunk.drop(columns=redundant)
+                chunk['_month'] = pd.to_datetime(chunk[month_source]).dt.strftime('%Y-%m')
+                writers.write(chunk, '_month')
+                rows += len(chunk)
+        finally:
+            writers.close()
+        counts[name] = rows
+        print(f"✅ {name}: {rows:,} rows → {len(glob.glob(os.path.join(directory, '*.parquet')))} monthly files")
+    return counts
+
+
+def list_store_months(store_dir=STORE_DIR):
+    """Months present in the options store (the backtest universe), oldest first."""
+    return sorted(os.path.splitext(os.path.basename(p))[0]
+                  for p in glob.glob(os.path.join(store_dir, "options", "*.parquet")))
+
+
+def _read_months(store_dir, name, months):
+    paths = [os.path.join(store_dir, name, f"{m}.parquet") for m in months]
+    paths = [p for p in paths if os.path.exists(p)]
+    if not paths:
+        return pd.DataFrame()
+    return pd.concat([pq.read_table(p).to_pandas() for p in paths], ignore_index=True)
+
+
+def iter_store_chunks(store_dir=STORE_DIR, months_per_chunk=1):
+    """
+    Yield (label, nifty_raw, options) per group of calendar months.
+
+    NIFTY months before the first options month are yielded too (with empty options)
+    so indicators warm up exactly as they do on the full history.
+    """
+    option_months = list_store_months(store_dir)
+    nifty_months = sorted(os.path.splitext(os.path.basename(p))[0]
+                          for p in glob.glob(os.path.join(store_dir, "nifty", "*.parquet")))
+    months = sorted(set(nifty_months) | set(option_months))
+    for i in range(0, len(months), months_per_chunk):
+        group = months[i:i + months_per_chunk]
+        nifty_raw = _read_months(store_dir, "nifty", group)
+        options = _read_months(store_dir, "options", group)
+        yield f"{group[0]}..{group[-1]}", nifty_raw, options
+
+
+# ==================== STREAMING INDICATORS ====================
+def _seeded_ema(series, period, seed):
+    """EMA (adjust=False) continuing from the previous chunk's last value - identical to one long run."""
+    if seed is None:
+        return EMA(series, period)
+    seeded = pd.concat([pd.Series([seed]), series.reset_index(drop=True)], ignore_index=True)
+    return EMA(seeded, period).iloc[1:].set_axis(series.index)
+
+
+class StreamingNiftyIndicators:
+    def __init__(self, ema_period=21, vi_period=21, chop_period=14):
+        """
+        NIFTY indicators for V30 computed chunk by chunk.
+
+        Args:
+            ema_period, vi_period: Strategy periods
+            chop_period: Choppiness Index window
+        """
+        self.ema_period = ema_period
+        self.vi_period = vi_period
+        self.chop_period = chop_period
+        # Rolling windows need this many previous rows (+1 for the shift in True Range)
+        self.tail_rows = max(vi_period, chop_period) + 1
+        self.tail = None
+        self.seeds = {}
+
+    def update(self, nifty_raw):
+        """
+        Add indicator columns to one chunk of raw NIFTY candles.
+
+        Returns:
+            Chunk with indicator columns; warm-up rows (NaN indicators) are dropped
+        """
+        df = nifty_raw.rename(columns={'open': 'index_open', 'high': 'index_high',
+                                       'low': 'index_low', 'close': 'index_close'})
+        df['date'] = df['datetime'].dt.date
+        close = df['index_close']
+
+        # Recursive indicators: continue from stored state
+        ema_col = f'ema{self.ema_period}'
+        df[ema_col] = _seeded_ema(close, self.ema_period, self.seeds.get(ema_col))
+        ema_fast = _seeded_ema(close, 12, self.seeds.get('ema12'))
+        ema_slow = _seeded_ema(close, 26, self.seeds.get('ema26'))
+        df['macd'] = ema_fast - ema_slow
+        df['macd_signal'] = _seeded_ema(df['macd'], 9, self.seeds.get('macd_signal'))
+        df['macd_hist'] = df['macd'] - df['macd_signal']
+        self.seeds = {ema_col: df[ema_col].iloc[-1], 'ema12': ema_fast.iloc[-1], 'ema26': ema_slow.iloc[-1],
+                      'macd_signal': df['macd_signal'].iloc[-1]}
+
+        # Rolling indicators: compute over (tail of previous chunk + this chunk)
+        hlc = df[['index_high', 'index_low', 'index_close']]
+        window = hlc if self.tail is None else pd.concat([self.tail, hlc], ignore_index=True)
+        vortex_df = ta.vortex(high=window['index_high'], low=window['index_low'], close=window['index_close'],
+                              length=self.vi_period)
+        chop = choppiness_index(pd.DataFrame({'high': window['index_high'], 'low': window['index_low'],
+                                              'close': window['index_close']}), period=self.chop_period)
+        n = len(df)
+        df[f'vi_plus_{self.vi_period}'] = vortex_df[f'VTXP_{self.vi_period}'].to_numpy()[-n:]
+        df[f'vi_minus_{self.vi_period}'] = vortex_df[f'VTXM_{self.vi_period}'].to_numpy()[-n:]
+        df['choppiness'] = chop.to_numpy()[-n:]
+        self.tail = window.iloc[-self.tail_rows:].reset_index(drop=True)
+
+        required = [ema_col, 'macd_hist', f'vi_plus_{self.vi_period}', f'vi_minus_{self.vi_period}', 'choppiness']
+        return df.dropna(subset=required).reset_index(drop=True)
+
+
+# ==================== CHUNKED RUN ====================
+def run_chunked_backtest(store_dir=STORE_DIR, ema_period=21, vi_period=21, sl_multiplier=2.0, tp_points=10,
+                         trail_atr_multiplier=0.5, months_per_chunk=1, exit_stages=None, verbose=True):
+    """
+    Backtest V30 over the columnar store, one day-aligned chunk at a time.
+
+    Returns:
+        (trades, stats) - stats has chunks, days, peak_chunk_mb, elapsed_sec
+    """
+    strategy = StrategyV30(ema_period=ema_period, vi_period=vi_period, sl_multiplier=sl_multiplier,
+                           tp_points=tp_points, trail_atr_multiplier=trail_atr_multiplier)
+    config = strategy.get_config()
+    stages = {**DEFAULT_EXIT_STAGES, **(exit_stages or {})}
+    indicators = StreamingNiftyIndicators(ema_period=ema_period, vi_period=vi_period)
+
+    trades = []
+    position = None
+    chunks = days = 0
+    peak_bytes = 0
+    start = time.time()
+
+    for label, nifty_raw, options in iter_store_chunks(store_dir, months_per_chunk):
+        if nifty_raw.empty:
+            continue
+        nifty_chunk = indicators.update(nifty_raw)
+        chunks += 1
+        if options.empty or nifty_chunk.empty:
+            continue
+        options = compact_options_frame(options)
+        chunk_bytes = int(nifty_chunk.memory_usage(deep=True).sum() + options.memory_usage(deep=True).sum())
+        peak_bytes = max(peak_bytes, chunk_bytes)
+
+        trading_days, nifty_by_day, options_by_day = split_by_trading_day(nifty_chunk, options)
+        empty_nifty = nifty_chunk.iloc[0:0]
+        empty_options = options.iloc[0:0]
+        chunk_trades = 0
+        for current_date in trading_days:
+            day_trades, position, _ = simulate_day(
+                strategy, config, ema_period,
+                nifty_by_day.get(current_date, empty_nifty),
+                options_by_day.get(current_date, empty_options),
+                position=position, verbose=False, exit_stages=stages
+            )
+            trades.extend(day_trades)
+            chunk_trades += len(day_trades)
+        days += len(trading_days)
+        if verbose:
+            print(f"📦 Chunk {label}: {len(nifty_chunk):,} NIFTY / {len(options):,} option rows | "
+                  f"{len(trading_days)} days | {chunk_trades} trades | {chunk_bytes / 1024**2:.2f} MB")
+
+    stats = {
+        'chunks': chunks,
+        'days': days,
+        'trades': len(trades),
+        'peak_chunk_mb': round(peak_bytes / 1024**2, 2),
+        'elapsed_sec': round(time.time() - start, 2),
+    }
+    if verbose:
+        print(f"\n✅ Chunked backtest: {stats['days']} days in {stats['chunks']} chunks | "
+              f"{stats['trades']} trades | peak chunk {stats['peak_chunk_mb']} MB | {stats['elapsed_sec']}s")
+    return trades, stats
+
+
+if __name__ == "__main__":
+    if not list_store_months():
+        build_columnar_store()
+    trades, _ = run_chunked_backtest(ema_period=21, vi_period=34, sl_multiplier=2.0, tp_points=10,
+                                     trail_atr_multiplier=1.0)
@@ -0,0 +1,325 @@
+"""
+VECTORIZED EXIT ENGINE - SWEEPABLE TRAILING STAGES
+
+simulate_day() walks every open position candle by candle in Python to apply
+the 3-stage exit (TP1 -> safe SL, lock-in, ATR trail). Here each trade's exit
+is resolved with array ops over the rest of its day:
+- first TP1 crossing via argmax on (high >= tp1)
+- lock-in via a running max of highs after TP1
+- ATR trail via a running max of the trail levels
+- first stop / MACD-EMA / EOD candle via argmax on the combined exit mask
+
+Entry signals are computed once per indicator setting (prepare_days), so the
+stage thresholds - and the Phase-3 "+13 lock" policy - can be swept without
+re-running entries. Results match run_backtest() for the same thresholds.
+"""
+
+import itertools
+import time
+import numpy as np
+import pandas as pd
+
+from strategy_v30 import StrategyV30
+from paper_trader_dynamic import (DEFAULT_EXIT_STAGES, simulate_day, split_by_trading_day, option_side_frame,
+                                  load_and_prepare_data)
+from strategy_comparison import ArrayDayFrame
+from backtest_cache import summarize_trades
+
+# Phase-3 PaperOrderManager policy: SL -> entry + 13 on TP1, no further stages
+PHASE3_TP1_LOCK_STAGES = {
+    'safe_sl_points': 13.0,
+    'lock_trigger_points': np.inf,
+    'lock_sl_points': 13.0,
+    'trail_trigger_points': np.inf,
+}
+
+
+# ==================== PREPARATION (ONCE) ====================
+def prepare_days(strategy, nifty_df, options_df):
+    """
+    Precompute per-day arrays and entry signals.
+
+    Signals depend only on the NIFTY indicators (EMA/VI), so the result can be
+    reused for any SL/TP/trail/stage setting of a strategy with the same periods.
+
+    Returns:
+        List of day dicts (days without NIFTY or CE/PE data are omitted, as simulate_day skips them)
+    """
+    config = strategy.get_config()
+    ema_period = strategy.EMA_PERIOD
+    trading_days, nifty_by_day, options_by_day = split_by_trading_day(nifty_df, options_df)
+
+    days = []
+    for current_date in trading_days:
+        day_nifty = nifty_by_day.get(current_date)
+        day_options = options_by_day.get(current_date)
+        if day_nifty is None or day_nifty.empty or day_options is None or day_options.empty:
+            continue
+        ce = option_side_frame(day_options, 'CE', config['atr_period'])
+        pe = option_side_frame(day_options, 'PE', config['atr_period'])
+        if ce.empty or pe.empty:
+            continue
+
+        times = pd.DatetimeIndex(day_nifty['datetime'])
+        cols = {col: day_nifty[col].to_numpy() for col in day_nifty.columns if col not in ('datetime', 'date')}
+        cols['datetime'] = list(times)
+        n = len(day_nifty)
+        frame = ArrayDayFrame(cols, 0, n)
+
+        close = cols['index_close']
+        ema = cols[f'ema{ema_period}']
+        hist = cols['macd_hist']
+        # Resampled bars (timeframe_sweep) flag each session's last bar for a forced EOD exit
+        last_bar = cols['session_last_bar'].astype(bool) if 'session_last_bar' in cols else np.zeros(n, dtype=bool)
+
+        sides = {}
+        for side, option_frame in (('BUY_CE', ce), ('BUY_PE', pe)):
+            option_times = pd.DatetimeIndex(option_frame.index)
+            sides[side] = {
+                'times': list(option_times),
+                'keys': option_times.asi8,
+                'open': option_frame['open'].to_numpy(),
+                'high': option_frame['high'].to_numpy(),
+                'close': option_frame['close'].to_numpy(),
+                'atr': option_frame['option_atr'].to_numpy(),
+                # find_next_option_candle() for every NIFTY candle
+                'pos': np.searchsorted(option_times.asi8, times.asi8, side='left'),
+            }
+
+        days.append({
+            'date': current_date,
+            'n': n,
+            'signals': [strategy.check_entry_signal(frame, idx) for idx in range(n)],
+            # Same conditions as check_macd_ema_exit (only applied once TP1 is hit)
+            'reversal': {'BUY_CE': (close < ema) | (hist < 0), 'BUY_PE': (close > ema) | (hist > 0)},
+            'eod': np.array([strategy.check_eod_exit(t.time()) for t in times], dtype=bool) | last_bar,
+            'last_bar': last_bar,
+            'sides': sides,
+            'strike': ce['strike_price'].iloc[0],
+            'nifty': day_nifty,
+            'options': day_options,
+        })
+    return days
+
+
+# ==================== VECTORIZED EXIT ====================
+def resolve_exit(day, position, signal_idx, stages, trail_atr_multiplier):
+    """
+    Resolve one trade's exit over the remainder of its day.
+
+    Returns:
+        (exit_nifty_idx, trade_fields) or None if still open at the end of the day
+        (position is then updated in place to the simulate_day end-of-day state)
+    """
+    side_data = day['sides'][position['side']]
+    entry = position['entry_price']
+
+    # Management candles: same filters as simulate_day (skip entry candle, option candle >= entry)
+    js = np.arange(signal_idx, day['n'])
+    js = js[js != position['entry_candle_index']]
+    p = side_data['pos'][js]
+    valid = p < len(side_data['keys'])
+    js, p = js[valid], p[valid]
+    valid = side_data['keys'][p] >= position['entry_key']
+    js, p = js[valid], p[valid]
+    m = len(js)
+    if m == 0:
+        return None
+
+    high = side_data['high'][p]
+    close = side_data['close'][p]
+
+    tp1_cross = high >= position['tp1']
+    k1 = int(np.argmax(tp1_cross)) if tp1_cross.any() else m
+
+    sl = np.full(m, position['sl'], dtype=np.float64)
+    safe_sl = round(entry + stages['safe_sl_points'], 2)
+    lock_sl = round(entry + stages['lock_sl_points'], 2)
+    events = []
+    if k1 < m:
+        post_high = high[k1:]
+        lock_on = np.maximum.accumulate(post_high) >= entry + stages['lock_trigger_points']
+        trail_levels = np.full(len(post_high), -np.inf)
+        for i in np.flatnonzero(post_high >= entry + stages['trail_trigger_points']):
+            trail_levels[i] = round(post_high[i] - trail_atr_multiplier * position['option_atr'], 2)
+            events.append((i, 1, trail_levels[i], "ATR Trail"))
+        if lock_on.any():
+            events.append((int(np.argmax(lock_on)), 0, lock_sl, "Locked Profit"))
+        events.sort()
+        sl[k1:] = np.maximum(np.maximum(safe_sl, np.where(lock_on, lock_sl, -np.inf)),
+                             np.maximum.accumulate(trail_levels))
+
+    tp1_on = np.arange(m) >= k1
+    sl_hit = close <= sl
+    reversal = tp1_on & day['reversal'][position['side']][js]
+    exit_mask = sl_hit | reversal | day['eod'][js]
+
+    def sl_type_at(e):
+        # Replay the (few) SL raises in stage order: a stage only takes over on a strictly higher level
+        if e < k1:
+            return position.get('sl_type')
+        level, sl_type = safe_sl, "Safe SL"
+        for i, _, value, name in events:
+            if i > e - k1:
+                break
+            if value > level:
+                level, sl_type = value, name
+        return sl_type
+
+    if not exit_mask.any():
+        position['sl'] = float(sl[-1])
+        position['tp1_hit'] = position['tp1_hit'] or k1 < m
+        position['highest'] = max(position['highest'], float(high.max()))
+        sl_type = sl_type_at(m - 1)
+        if sl_type:
+            position['sl_type'] = sl_type
+        return None
+
+    e = int(np.argmax(exit_mask))
+    if sl_hit[e]:
+        exit_reason = f"{sl_type_at(e) or 'SL'} Hit"
+        exit_price = float(sl[e])
+    elif reversal[e]:
+        exit_reason = "MACD/EMA Exit"
+        exit_price = close[e]
+    else:
+        exit_reason = "EOD Exit"
+        exit_price = close[e]
+
+    return int(js[e]), {
+        'ExitTime': side_data['times'][p[e]],
+        'ExitPrice': exit_price,
+        'ExitReason': exit_reason,
+        'SL_Value': float(sl[e]),
+        'TP1_Hit': bool(position['tp1_hit'] or e >= k1),
+    }
+
+
+def simulate_with_stages(strategy, days, exit_stages=None):
+    """
+    Cheap entry walk + vectorized exits over prepared days.
+
+    Args:
+        strategy: Strategy instance (risk params may differ from the one used in prepare_days,
+                  EMA/VI periods must not)
+        days: Output of prepare_days()
+        exit_stages: Overrides for DEFAULT_EXIT_STAGES
+
+    Returns:
+        Trade list in the run_backtest() format
+    """
+    stages = {**DEFAULT_EXIT_STAGES, **(exit_stages or {})}
+    config = strategy.get_config()
+    trail_mult = config['trail_atr_multiplier']
+    trades = []
+    carry = None
+
+    for day in days:
+        if carry is not None:
+            # Rare: a position survived a day without an EOD candle - hand it to the reference engine
+            day_trades, carry, _ = simulate_day(strategy, config, strategy.EMA_PERIOD, day['nifty'], day['options'],
+                                                position=carry, verbose=False, exit_stages=stages)
+            trades.extend(day_trades)
+            continue
+
+        idx = 0
+        while idx < day['n']:
+            signal = day['signals'][idx]
+            if signal is None:
+                idx += 1
+                continue
+            next_idx = idx + 1
+            if next_idx >= day['n'] or day['last_bar'][next_idx]:
+                break
+            side_data = day['sides'][signal]
+            pos = side_data['pos'][next_idx]
+            if pos >= len(side_data['keys']) or np.isnan(side_data['atr'][pos]):
+                idx += 1
+                continue
+
+            entry_price = side_data['open'][pos] + 0.5
+            option_atr = side_data['atr'][pos]
+            levels = strategy.calculate_entry_levels(signal, entry_price, option_atr)
+            position = {
+                'side': signal,
+                'signal_time': day['nifty']['datetime'].iloc[idx],
+                'entry_time': side_data['times'][pos],
+                'entry_key': side_data['keys'][pos],
+                'entry_candle_index': next_idx,
+                'entry_price': entry_price,
+                'strike': day['strike'],
+                'sl': levels['sl'],
+                'initial_sl': levels['sl'],
+                'tp1': levels['tp1'],
+                'tp1_hit': False,
+                'highest': side_data['high'][pos],
+                'option_atr': option_atr,
+            }
+
+            result = resolve_exit(day, position, idx, stages, trail_mult)
+            if result is None:
+                carry = position
+                break
+
+            exit_idx, exit_fields = result
+            pnl_data = strategy.calculate_pnl(signal, entry_price, exit_fields['ExitPrice'])
+            trades.append({
+                'SignalTime': position['signal_time'],
+                'EntryTime': position['entry_time'],
+                'Slippage_Sec': int((position['entry_time'] - position['signal_time']).total_seconds()),
+                'Side': signal,
+                'Strike': position['strike'],
+                'EntryPrice': entry_price,
+                'ExitTime': exit_fields['ExitTime'],
+                'ExitPrice': exit_fields['ExitPrice'],
+                'ExitReason': exit_fields['ExitReason'],
+                'SL_Value': exit_fields['SL_Value'],
+                'Initial_SL': position['initial_sl'],
+                'TP1_Hit': exit_fields['TP1_Hit'],
+                'PnL_Points': pnl_data['pnl_points'],
+                'PnL_INR': pnl_data['pnl_inr'],
+                'Gross_PnL': pnl_data.get('gross_pnl', pnl_data['pnl_inr']),
+                'Costs': pnl_data.get('cost', 0.0),
+            })
+            idx = exit_idx + 1
+
+    return trades
+
+
+# ==================== SWEEPS ====================
+def stage_grid(**values):
+    """Cartesian product of stage values, e.g. stage_grid(safe_sl_points=[6, 8], lock_sl_points=[10, 12])"""
+    keys = list(values)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(values[k] for k in keys))]
+
+
+def sweep_exit_stages(strategy, days, stage_configs):
+    """
+    Evaluate many exit-stage settings over the same prepared entries.
+
+    Returns:
+        pd.DataFrame (stage params + summary metrics), best net P&L first
+    """
+    rows = []
+    start = time.time()
+    for stages in stage_configs:
+        trades = simulate_with_stages(strategy, days, stages)
+        rows.append({**DEFAULT_EXIT_STAGES, **stages, **summarize_trades(trades)})
+    print(f"✅ Exit sweep: {len(stage_configs)} stage settings in {time.time() - start:.1f}s")
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values('net_pnl', ascending=False).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    ema_period, vi_period = 21, 34
+    nifty_df, options_df = load_and_prepare_data(ema_period=ema_period, vi_period=vi_period)
+    strategy = StrategyV30(ema_period=ema_period, vi_period=vi_period, sl_multiplier=2.0, tp_points=10,
+                           trail_atr_multiplier=1.0)
+    days = prepare_days(strategy, nifty_df, options_df)
+
+    configs = stage_grid(safe_sl_points=[6.0, 8.0], lock_trigger_points=[12.0, 15.0, 20.0],
+                         lock_sl_points=[10.0, 12.0], trail_trigger_points=[20.0, 25.0, 30.0])
+    configs.append(PHASE3_TP1_LOCK_STAGES)
+    results = sweep_exit_stages(strategy, days, configs)
+    print(results.head(15).to_string(index=False))
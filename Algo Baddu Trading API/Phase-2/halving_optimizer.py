@@ -0,0 +1,188 @@
+"""
+SUCCESSIVE-HALVING OPTIMIZER FOR V30
+
+A full grid over (EMA, VI, SL, TP, Trail) multiplies quickly and every
+configuration is simulated over every day. Successive halving instead:
+1. Evaluates ALL configurations on a short slice of the first trading days
+2. Keeps the best 1/eta of them
+3. Re-evaluates the survivors on an eta-times longer slice
+4. Repeats until the last survivors have run on the full history
+
+Evaluations run in a process pool. Each worker prepares entry signals once per
+(EMA, VI) pair and only for the days a rung actually needs (exit_engine.prepare_days),
+then resolves SL/TP/trail settings with the vectorized exit engine.
+Compute is reported in config-days against the full grid.
+"""
+
+import os
+import math
+import time
+import itertools
+import pandas as pd
+
+from strategy_v30 import StrategyV30
+from paper_trader_dynamic import load_nifty_data, load_options_data
+from strategy_comparison import add_shared_indicators
+from exit_engine import prepare_days, simulate_with_stages
+from backtest_cache import summarize_trades
+
+PARAM_NAMES = ['ema_period', 'vi_period', 'sl_multiplier', 'tp_points', 'trail_atr_multiplier']
+
+
+# ==================== GRID ====================
+def param_grid(**values):
+    """Cartesian product over the V30 parameters, e.g. param_grid(ema_period=[13, 21], vi_period=[21, 34], ...)"""
+    missing = [name for name in PARAM_NAMES if name not in values]
+    if missing:
+        raise ValueError(f"param_grid needs values for: {', '.join(missing)}")
+    return [dict(zip(PARAM_NAMES, combo)) for combo in itertools.product(*(values[k] for k in PARAM_NAMES))]
+
+
+def rung_schedule(total_days, min_days, eta):
+    """Slice lengths per rung: min_days, min_days*eta, ... ending exactly at total_days."""
+    rungs = []
+    days = max(1, min(min_days, total_days))
+    while days < total_days:
+        rungs.append(days)
+        days *= eta
+    rungs.append(total_days)
+    return rungs
+
+
+# ==================== WORKER STATE ====================
+_worker_data = {}
+
+
+def _init_worker(nifty_raw, options_df):
+    """Per-process data + lazily extended prepared days per (EMA, VI) pair."""
+    _worker_data.clear()
+    _worker_data['nifty_raw'] = nifty_raw
+    _worker_data['options'] = options_df
+    _worker_data['trading_days'] = sorted(options_df['trading_day'].unique())
+    _worker_data['pairs'] = {}
+
+
+def _prepared_days(ema_period, vi_period, n_days):
+    """Prepared days covering the first n_days trading days (only the missing days are prepared)."""
+    pairs = _worker_data['pairs']
+    if (ema_period, vi_period) not in pairs:
+        nifty_df = add_shared_indicators(_worker_data['nifty_raw'],
+                                         {('ema', ema_period), ('vi', vi_period), ('macd',), ('chop', 14)})
+        pairs[(ema_period, vi_period)] = {'nifty': nifty_df, 'covered': 0, 'days': []}
+    state = pairs[(ema_period, vi_period)]
+
+    trading_days = _worker_data['trading_days']
+    if n_days > state['covered']:
+        first, last = trading_days[state['covered']], trading_days[n_days - 1]
+        nifty_df, options_df = state['nifty'], _worker_data['options']
+        nifty_slice = nifty_df[(nifty_df['date'] >= first) & (nifty_df['date'] <= last)]
+        options_slice = options_df[(options_df['trading_day'] >= first) & (options_df['trading_day'] <= last)]
+        strategy = StrategyV30(ema_period=ema_period, vi_period=vi_period)
+        state['days'].extend(prepare_days(strategy, nifty_slice, options_slice))
+        state['covered'] = n_days
+
+    last_day = trading_days[n_days - 1]
+    return [day for day in state['days'] if day['date'] <= last_day]
+
+
+def _evaluate_worker(task):
+    """Evaluate a batch of configs (same EMA/VI pair) on the first n_days trading days."""
+    configs, n_days = task
+    days = _prepared_days(configs[0]['ema_period'], configs[0]['vi_period'], n_days)
+    results = []
+    for params in configs:
+        trades = simulate_with_stages(StrategyV30(**params), days)
+        results.append((params, summarize_trades(trades)))
+    return results
+
+
+def _batches(configs, n_days, workers):
+    """Group configs by (EMA, VI) so signals are prepared once, split so all workers get work."""
+    by_pair = {}
+    for params in configs:
+        by_pair.setdefault((params['ema_period'], params['vi_period']), []).append(params)
+    size = max(1, math.ceil(len(configs) / (workers * 2)))
+    return [(group[i:i + size], n_days) for group in by_pair.values() for i in range(0, len(group), size)]
+
+
+# ==================== OPTIMIZER ====================
+def successive_halving(nifty_raw, options_df, configs, min_days=10, eta=3, metric='net_pnl', workers=None):
+    """
+    Successive halving over V30 configurations.
+
+    Args:
+        nifty_raw: Raw NIFTY frame from load_nifty_data() (indicators are added per EMA/VI pair)
+        options_df: Options frame from load_options_data()
+        configs: List of run_backtest parameter dicts (see param_grid)
+        min_days: Trading days in the first rung
+        eta: Keep the best 1/eta per rung, and grow the slice eta-fold
+        metric: summarize_trades() key to maximise
+        workers: Worker processes (None = all cores, 1 = in-process)
+
+    Returns:
+        (results, report) - results: last-rung survivors with full-history metrics, best first;
+        report: rungs, config-days spent vs full grid, elapsed time
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    total_days = options_df['trading_day'].nunique()
+    rungs = rung_schedule(total_days, min_days, eta)
+    full_grid_cost = len(configs) * total_days
+
+    print(f"\n🪜 Successive halving: {len(configs)} configs | {total_days} days | rungs {rungs} | eta={eta} | "
+          f"{workers} worker(s)")
+
+    start = time.time()
+    executor = None
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(nifty_raw, options_df))
+    else:
+        _init_worker(nifty_raw, options_df)
+
+    survivors = list(configs)
+    spent = 0
+    history = []
+    try:
+        for rung, n_days in enumerate(rungs, 1):
+            tasks = _batches(survivors, n_days, workers)
+            if executor is not None:
+                batches = list(executor.map(_evaluate_worker, tasks))
+            else:
+                batches = [_evaluate_worker(task) for task in tasks]
+            scored = [{**params, **metrics} for batch in batches for params, metrics in batch]
+            scored.sort(key=lambda row: row[metric], reverse=True)
+            spent += len(survivors) * n_days
+            history.append({'rung': rung, 'days': n_days, 'configs': len(survivors),
+                            'best': scored[0][metric] if scored else None})
+            print(f"   Rung {rung}: {len(survivors)} configs × {n_days} days | best {metric} = "
+                  f"{scored[0][metric] if scored else 'n/a'}")
+
+            if n_days == total_days:
+                break
+            keep = max(1, math.ceil(len(scored) / eta))
+            survivors = [{name: row[name] for name in PARAM_NAMES} for row in scored[:keep]]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    report = {
+        'rungs': history,
+        'config_days': spent,
+        'full_grid_config_days': full_grid_cost,
+        'compute_saved_pct': round((1 - spent / full_grid_cost) * 100, 1) if full_grid_cost else 0.0,
+        'elapsed_sec': round(time.time() - start, 2),
+    }
+    print(f"✅ Done in {report['elapsed_sec']}s | {spent:,} config-days vs {full_grid_cost:,} for the full grid "
+          f"({report['compute_saved_pct']}% saved)")
+    return pd.DataFrame(scored).reset_index(drop=True), report
+
+
+if __name__ == "__main__":
+    nifty_raw = load_nifty_data()
+    options_df = load_options_data()
+    configs = param_grid(ema_period=[13, 21, 34], vi_period=[14, 21, 34], sl_multiplier=[1.5, 2.0, 2.5],
+                         tp_points=[8, 10, 12], trail_atr_multiplier=[0.5, 1.0, 1.5])
+    results, report = successive_halving(nifty_raw, options_df, configs, min_days=10, eta=3)
+    print(results.head(10).to_string(index=False))
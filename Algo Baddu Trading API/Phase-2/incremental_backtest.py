@@ -0,0 +1,248 @@
+"""
+INCREMENTAL BACKTEST - DAY-APPEND WITH CHECKPOINTED STATE
+
+New trading days are appended to the NIFTY and options datasets every
+evening. Instead of re-simulating the whole year, each configuration keeps
+an end-of-day checkpoint:
+- last simulated trading day + fingerprint of the data up to that day
+- indicator state (last indicator row, used to validate the recomputation)
+- trades so far and any position carried past the last day
+- cumulative running metrics
+
+The next run only simulates days after the checkpoint. If history before
+the checkpoint changed (re-downloaded candles, edited strategy code), the
+configuration falls back to a full run automatically.
+"""
+
+import os
+import json
+import pickle
+import hashlib
+import time
+import numpy as np
+import pandas as pd
+
+from strategy_v30 import StrategyV30
+from paper_trader_dynamic import simulate_day, split_by_trading_day, load_nifty_data, load_options_data
+from backtest_cache import code_fingerprint
+from strategy_comparison import add_shared_indicators
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backtest_checkpoints")
+
+# Bump when the checkpoint layout changes
+CHECKPOINT_FORMAT = 1
+
+
+# ==================== KEYS & FINGERPRINTS ====================
+def config_key(params):
+    """Checkpoint identity: strategy version + engine source + parameters (NOT the data, which grows)."""
+    payload = {
+        'format': CHECKPOINT_FORMAT,
+        'strategy': StrategyV30.__name__,
+        'version': StrategyV30().get_config()['version'],
+        'code': code_fingerprint(),
+        'params': {k: float(v) for k, v in sorted(params.items())},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:24]
+
+
+def prefix_fingerprint(nifty_df, options_df, last_day):
+    """Hash of every NIFTY/options row up to and including `last_day`."""
+    h = hashlib.sha256()
+    for df, day_col in ((nifty_df, 'date'), (options_df, 'trading_day')):
+        prefix = df[df[day_col] <= last_day]
+        h.update(",".join(map(str, prefix.columns)).encode())
+        h.update(pd.util.hash_pandas_object(prefix, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _indicator_columns(ema_period, vi_period):
+    return [f'ema{ema_period}', 'macd', 'macd_signal', 'macd_hist',
+            f'vi_plus_{vi_period}', f'vi_minus_{vi_period}', 'choppiness']
+
+
+def indicator_state(nifty_df, last_day, ema_period, vi_period):
+    """Indicator values on the last NIFTY candle of `last_day`."""
+    day_rows = nifty_df[nifty_df['date'] <= last_day]
+    if day_rows.empty:
+        return {}
+    last = day_rows.iloc[-1]
+    return {col: float(last[col]) for col in _indicator_columns(ema_period, vi_period)}
+
+
+# ==================== RUNNING METRICS ====================
+def _empty_metrics():
+    return {'total_trades': 0, 'wins': 0, 'tp1_hits': 0, 'net_pnl': 0.0, 'gross_profit': 0.0,
+            'gross_loss': 0.0, 'peak': 0.0, 'max_drawdown': 0.0}
+
+
+def _update_metrics(running, trades):
+    """Fold new trades into the cumulative counters (O(new trades))."""
+    for trade in trades:
+        pnl = float(trade['PnL_INR'])
+        running['total_trades'] += 1
+        running['wins'] += int(pnl > 0)
+        running['tp1_hits'] += bool(trade['TP1_Hit'])
+        running['net_pnl'] = round(running['net_pnl'] + pnl, 2)
+        if pnl > 0:
+            running['gross_profit'] += pnl
+        else:
+            running['gross_loss'] -= pnl
+        running['peak'] = max(running['peak'], running['net_pnl'])
+        running['max_drawdown'] = min(running['max_drawdown'], running['net_pnl'] - running['peak'])
+    return running
+
+
+def report_metrics(running):
+    """Running counters → the same keys as backtest_cache.summarize_trades."""
+    total = running['total_trades']
+    return {
+        'total_trades': total,
+        'win_rate': round(running['wins'] / total * 100, 2) if total else 0.0,
+        'net_pnl': round(running['net_pnl'], 2),
+        'profit_factor': round(running['gross_profit'] / running['gross_loss'], 4) if running['gross_loss'] > 0
+        else (float('inf') if total else 0.0),
+        'max_drawdown': round(running['max_drawdown'], 2),
+        'tp1_hit_rate': round(running['tp1_hits'] / total * 100, 2) if total else 0.0,
+    }
+
+
+# ==================== CHECKPOINT I/O ====================
+def _checkpoint_path(key, checkpoint_dir):
+    return os.path.join(checkpoint_dir, f"{key}.pkl")
+
+
+def load_checkpoint(params, checkpoint_dir=CHECKPOINT_DIR):
+    path = _checkpoint_path(config_key(params), checkpoint_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def save_checkpoint(params, state, checkpoint_dir=CHECKPOINT_DIR):
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = _checkpoint_path(config_key(params), checkpoint_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _checkpoint_is_valid(state, nifty_df, options_df, params):
+    """History up to the checkpoint must be byte-identical and reproduce the saved indicator state."""
+    last_day = state['last_day']
+    if prefix_fingerprint(nifty_df, options_df, last_day) != state['prefix_hash']:
+        return False
+    current = indicator_state(nifty_df, last_day, params['ema_period'], params['vi_period'])
+    saved = state['indicators']
+    return current.keys() == saved.keys() and all(
+        np.isclose(current[k], saved[k], rtol=1e-9, atol=1e-9, equal_nan=True) for k in saved
+    )
+
+
+# ==================== INCREMENTAL RUN ====================
+def incremental_backtest(nifty_df, options_df, ema_period=21, vi_period=21, sl_multiplier=2.0, tp_points=10,
+                         trail_atr_multiplier=0.5, checkpoint_dir=CHECKPOINT_DIR, verbose=False):
+    """
+    Bring one configuration up to date, simulating only days after its checkpoint.
+
+    Args:
+        nifty_df: Prepared NIFTY frame containing this config's EMA/VI columns
+        options_df: Options frame
+        checkpoint_dir: Where end-of-day checkpoints live
+
+    Returns:
+        (trades, metrics, new_days) - new_days == total days on a full (re)build
+    """
+    params = dict(ema_period=ema_period, vi_period=vi_period, sl_multiplier=sl_multiplier,
+                  tp_points=tp_points, trail_atr_multiplier=trail_atr_multiplier)
+    strategy = StrategyV30(**params)
+    config = strategy.get_config()
+
+    trading_days, nifty_by_day, options_by_day = split_by_trading_day(nifty_df, options_df)
+    if not trading_days:
+        return [], report_metrics(_empty_metrics()), 0
+
+    state = load_checkpoint(params, checkpoint_dir)
+    if state is not None and not _checkpoint_is_valid(state, nifty_df, options_df, params):
+        if verbose:
+            print(f"⚠️  Checkpoint for {params} no longer matches the data - full rebuild")
+        state = None
+    if state is None:
+        state = {'last_day': None, 'trades': [], 'position': None, 'metrics': _empty_metrics()}
+
+    new_days = [day for day in trading_days if state['last_day'] is None or day > state['last_day']]
+    if not new_days:
+        return state['trades'], report_metrics(state['metrics']), 0
+
+    empty_nifty = nifty_df.iloc[0:0]
+    empty_options = options_df.iloc[0:0]
+    position = state['position']
+    new_trades = []
+    for current_date in new_days:
+        day_trades, position, _ = simulate_day(
+            strategy, config, ema_period,
+            nifty_by_day.get(current_date, empty_nifty),
+            options_by_day.get(current_date, empty_options),
+            position=position, verbose=False
+        )
+        new_trades.extend(day_trades)
+
+    last_day = new_days[-1]
+    state = {
+        'last_day': last_day,
+        'prefix_hash': prefix_fingerprint(nifty_df, options_df, last_day),
+        'indicators': indicator_state(nifty_df, last_day, ema_period, vi_period),
+        'trades': state['trades'] + new_trades,
+        'position': position,
+        'metrics': _update_metrics(state['metrics'], new_trades),
+        'updated': time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    save_checkpoint(params, state, checkpoint_dir)
+
+    if verbose:
+        print(f"📅 {params}: +{len(new_days)} day(s), +{len(new_trades)} trade(s) through {last_day}")
+    return state['trades'], report_metrics(state['metrics']), len(new_days)
+
+
+def update_leaderboard(nifty_raw, options_df, configs, checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Daily leaderboard refresh: every config is brought up to date incrementally.
+
+    Args:
+        nifty_raw: Raw NIFTY frame from load_nifty_data() (indicators added per EMA/VI pair here)
+        options_df: Options frame from load_options_data()
+        configs: List of run_backtest parameter dicts
+
+    Returns:
+        pd.DataFrame sorted by net P&L (best first) with a 'New_Days' column
+    """
+    start = time.time()
+    prepared = {}
+    rows = []
+    for params in configs:
+        pair = (params['ema_period'], params['vi_period'])
+        if pair not in prepared:
+            prepared[pair] = add_shared_indicators(nifty_raw, {('ema', pair[0]), ('vi', pair[1]), ('macd',), ('chop', 14)})
+        _, metrics, new_days = incremental_backtest(prepared[pair], options_df, checkpoint_dir=checkpoint_dir, **params)
+        rows.append({**params, **metrics, 'New_Days': new_days})
+
+    print(f"✅ Leaderboard updated: {len(configs)} configs in {time.time() - start:.1f}s")
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values('net_pnl', ascending=False).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    nifty_raw = load_nifty_data()
+    options_df = load_options_data()
+    configs = [
+        dict(ema_period=21, vi_period=vi, sl_multiplier=sl, tp_points=10, trail_atr_multiplier=trail)
+        for vi in (21, 34) for sl in (1.5, 2.0) for trail in (0.5, 1.0)
+    ]
+    leaderboard = update_leaderboard(nifty_raw, options_df, configs)
+    print(leaderboard.to_string(index=False))
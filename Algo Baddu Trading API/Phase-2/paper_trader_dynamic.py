@@ -1,11 +1,13 @@
 #TRADER BADDU:D
 #PAPERTRADERDYNAMIC.py
 import os
+import sys
 import pandas as pd
 import pandas_ta as ta
 import numpy as np
 from datetime import datetime, time
 from strategy_v30 import StrategyV30
+from robustness import print_robustness_report
 
 # ==================== INDICATOR FUNCTIONS ====================
 def EMA(series, period):
@@ -134,15 +136,41 @@ def find_next_option_candle(signal_time, option_data_index):
         return None  # No future candles available
 
 # ==================== DATA LOADING ====================
-def load_and_prepare_data(ema_period=13, vi_period=14):
-    """Load NIFTY index and ATM options data"""
-    print("="*70)
-    print("📊 LOADING DATA")
-    print("="*70)
-    
-    # Load NIFTY index data
+NIFTY_CSV = r"C:\Users\sakth\Desktop\VSCODE\Algo Baddu Trading API\Phase-2\nifty_5min_last_year.csv"
+OPTIONS_CSV = r"C:\Users\sakth\Desktop\VSCODE\extras\atm_daily_options_HYBRID_V3_ULTRA_FIXED.csv"
+NIFTY_INSTRUMENT = "NSE_INDEX|Nifty 50"
+ATM_OPTIONS_DATASET = "ATM_OPTIONS|NIFTY"  # same as core.candle_data.ATM_OPTIONS_DATASET
+CANDLE_INTERVAL = "5minute"
+
+def _get_warehouse():
+    """Shared candle warehouse (core/candle_data.py), or None if pyarrow / core is unavailable"""
+    try:
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from core.candle_data import get_warehouse
+    except ImportError:
+        return None
+    return get_warehouse()
+
+def load_candles(warehouse, instrument, csv_path):
+    """
+    Candles for one dataset from the warehouse. The CSV is appended to the warehouse
+    first whenever it changed since the last import (stored bars are never duplicated).
+    """
+    if os.path.exists(csv_path):
+        warehouse.import_csv(csv_path, instrument, CANDLE_INTERVAL, only_if_changed=True)
+    df = warehouse.read(instrument, CANDLE_INTERVAL)
+    if df.empty:
+        raise FileNotFoundError(f"No {instrument} candles in the warehouse and no CSV at: {csv_path}")
+    return df
+
+def load_nifty_data():
+    """Load raw NIFTY index candles with the column names the strategies expect"""
     print(f"\n[1/2] Loading NIFTY index data...")
-    nifty_df = pd.read_csv(r"C:\Users\sakth\Desktop\VSCODE\Algo Baddu Trading API\Phase-2\nifty_5min_last_year.csv")
+    warehouse = _get_warehouse()
+    if warehouse is not None:
+        nifty_df = load_candles(warehouse, NIFTY_INSTRUMENT, NIFTY_CSV)
+    else:
+        nifty_df = pd.read_csv(NIFTY_CSV)
     nifty_df['datetime'] = pd.to_datetime(nifty_df['datetime'])
     nifty_df['date'] = nifty_df['datetime'].dt.date
     print(f"✅ Loaded {len(nifty_df)} NIFTY candles")
@@ -153,6 +181,86 @@ def load_and_prepare_data(ema_period=13, vi_period=14):
         'high': 'index_high',
         'low': 'index_low',
         'close': 'index_close'}, inplace=True)
+    return nifty_df
+
+def load_options_data(compact=False):
+    """
+    Load ATM options candles
+
+    Args:
+        compact: Categorical strings, float32 prices and narrow ints, rows pre-sorted
+                 by (trading_day, instrument_type, datetime) - a fraction of the RAM
+    """
+    print(f"\n[2/2] Loading ATM options data...")
+    warehouse = _get_warehouse()
+    if warehouse is not None:
+        options_df = load_candles(warehouse, ATM_OPTIONS_DATASET, OPTIONS_CSV)
+        if compact:
+            options_df = options_df.drop(columns=['timestamp', 'date'], errors='ignore').astype(COMPACT_OPTION_DTYPES)
+    elif not os.path.exists(OPTIONS_CSV):
+        raise FileNotFoundError(f"Options data file not found at: {OPTIONS_CSV}")
+    elif compact:
+        options_df = pd.read_csv(OPTIONS_CSV, dtype=COMPACT_OPTION_DTYPES,
+                                 usecols=lambda col: col not in ('timestamp', 'date'))
+    else:
+        options_df = pd.read_csv(OPTIONS_CSV)
+    options_df['datetime'] = pd.to_datetime(options_df['datetime'])
+    options_df['trading_day'] = pd.to_datetime(options_df['trading_day']).dt.date
+    if compact:
+        options_df = compact_options_frame(options_df)
+    print(f"✅ Loaded {len(options_df)} option candles")
+    print(f"   - CE candles: {len(options_df[options_df['instrument_type']=='CE'])}")
+    print(f"   - PE candles: {len(options_df[options_df['instrument_type']=='PE'])}")
+    print(f"   - Trading days: {options_df['trading_day'].nunique()}")
+    if compact:
+        memory_report(options_df, "options_df (compact)")
+    return options_df
+
+# ==================== COMPACT OPTION STORAGE ====================
+OPTION_PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+COMPACT_OPTION_DTYPES = {
+    'open': 'float32', 'high': 'float32', 'low': 'float32', 'close': 'float32',
+    'instrument_type': 'category', 'instrument_key': 'category', 'expiry_date': 'category',
+}
+
+def compact_options_frame(options_df):
+    """
+    Shrink an options frame: categorical strings, float32 prices, narrow ints.
+    Rows are sorted once by (trading_day, instrument_type, datetime) so per-day
+    and per-side access can use contiguous slices instead of boolean-mask copies.
+    """
+    df = options_df.drop(columns=[c for c in ('timestamp', 'date') if c in options_df.columns])
+    for col in ('instrument_type', 'instrument_key', 'expiry_date'):
+        if col in df.columns and df[col].dtype != 'category':
+            df[col] = df[col].astype('category')
+    for col in OPTION_PRICE_COLUMNS:
+        df[col] = df[col].astype('float32')
+    for col in ('volume', 'oi', 'strike_price'):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    if 'is_expired' in df.columns:
+        df['is_expired'] = df['is_expired'].astype(bool)
+    df = df.sort_values(['trading_day', 'instrument_type', 'datetime'], kind='stable')
+    return df.reset_index(drop=True)
+
+def memory_report(df, label="DataFrame"):
+    """Print deep memory use per column (largest first) and return total bytes"""
+    usage = df.memory_usage(deep=True, index=True).sort_values(ascending=False)
+    total = int(usage.sum())
+    print(f"\n🧠 MEMORY: {label} = {total / 1024**2:,.2f} MB ({len(df):,} rows, {total / max(len(df), 1):,.0f} B/row)")
+    for col, nbytes in usage.head(8).items():
+        print(f"   {str(col):<16} {nbytes / 1024**2:>9,.2f} MB  {df[col].dtype if col in df.columns else 'index'}")
+    return total
+
+def load_and_prepare_data(ema_period=13, vi_period=14):
+    """Load NIFTY index and ATM options data"""
+    print("="*70)
+    print("📊 LOADING DATA")
+    print("="*70)
+    
+    # Load NIFTY index data
+    nifty_df = load_nifty_data()
     
     # Calculate indicators on NIFTY (for signals only)
     print(f"\n[INFO] Calculating NIFTY indicators for signal generation (EMA={ema_period}, VI={vi_period})...")
@@ -196,283 +304,415 @@ def load_and_prepare_data(ema_period=13, vi_period=14):
     print(f"✅ NIFTY indicators calculated, {len(nifty_df)} valid candles")
     
     # Load ATM options data
-    print(f"\n[2/2] Loading ATM options data...")
-    # ✅ CORRECT
-    options_file_path = r"C:\Users\sakth\Desktop\VSCODE\extras\atm_daily_options_HYBRID_V3_ULTRA_FIXED.csv"
-    if not os.path.exists(options_file_path):
-        raise FileNotFoundError(f"Options data file not found at: {options_file_path}")
-    options_df = pd.read_csv(options_file_path)
-    options_df['datetime'] = pd.to_datetime(options_df['datetime'])
-    options_df['trading_day'] = pd.to_datetime(options_df['trading_day']).dt.date
-    print(f"✅ Loaded {len(options_df)} option candles")
-    print(f"   - CE candles: {len(options_df[options_df['instrument_type']=='CE'])}")
-    print(f"   - PE candles: {len(options_df[options_df['instrument_type']=='PE'])}")
-    print(f"   - Trading days: {options_df['trading_day'].nunique()}")
+    options_df = load_options_data()
     
     return nifty_df, options_df
 
 # ==================== BACKTESTING ENGINE ====================
-def run_backtest(nifty_df, options_df, ema_period=21, vi_period=21, sl_multiplier=2.0, tp_points=10, trail_atr_multiplier=0.5):
+# ==================== EXIT STAGES ====================
+# 3-stage exit (points relative to entry). Sweepable - see exit_engine.py
+DEFAULT_EXIT_STAGES = {
+    'safe_sl_points': 8.0,         # Stage 1: on TP1, SL -> entry + 8
+    'lock_trigger_points': 15.0,   # Stage 2: high >= entry + 15 ...
+    'lock_sl_points': 10.0,        #          ... SL -> entry + 10
+    'trail_trigger_points': 25.0,  # Stage 3: high >= entry + 25 -> ATR trail
+}
+
+def option_side_frame(day_options, option_type, atr_period):
     """
-    Run backtest using StrategyV29
+    One day's CE or PE candles, sorted by datetime with option ATR, indexed by datetime.
+    float32 prices (compact mode) are widened back to the exact 2-decimal float64 values.
+    """
+    side = day_options.loc[day_options['instrument_type'] == option_type,
+                           ['datetime', 'strike_price'] + OPTION_PRICE_COLUMNS]
+    side = side.sort_values('datetime', kind='stable')
+    for col in OPTION_PRICE_COLUMNS:
+        if side[col].dtype != np.float64:
+            side[col] = side[col].astype(np.float64).round(2)
+    side['option_atr'] = ATR_simple(side['high'], side['low'], side['close'], atr_period)
+    return side.set_index('datetime')
+
+def simulate_day(strategy, config, ema_period, day_nifty, day_options, position=None, verbose=True, exit_stages=None):
+    """
+    Simulate entries and exits for a single trading day.
+
+    Args:
+        strategy: Strategy instance (StrategyV30)
+        config: strategy.get_config() output
+        ema_period: EMA period used for the exit check column
+        day_nifty: NIFTY candles (with indicators) for the day
+        day_options: ATM option candles for the day
+        position: Open position carried in from the previous day (normally None)
+        verbose: Print per-day progress and stop updates
+        exit_stages: Stage thresholds (defaults to DEFAULT_EXIT_STAGES)
+
+    Returns:
+        (day_trades, position, day_stats) - position is whatever is still open at
+        the end of the day (None when flat, which is the normal EOD case)
+    """
+    day_stats = {"skipped": None, "strike": None, "signals": {"BUY_CE": 0, "BUY_PE": 0},
+                 "matched": 0, "missed": 0, "trades": 0}
+    day_trades = []
+
+    if day_nifty.empty:
+        day_stats["skipped"] = "no_nifty"
+        return day_trades, position, day_stats
+
+    # Reset index to use iloc properly
+    day_nifty = day_nifty.reset_index(drop=True)
+
+    if day_options.empty:
+        day_stats["skipped"] = "no_options"
+        return day_trades, position, day_stats
+
+    # Separate CE and PE data (only the columns the simulation reads - one small frame per side)
+    ce_data = option_side_frame(day_options, 'CE', config['atr_period'])
+    pe_data = option_side_frame(day_options, 'PE', config['atr_period'])
+
+    if ce_data.empty or pe_data.empty:
+        day_stats["skipped"] = "missing_ce_pe"
+        return day_trades, position, day_stats
+
+    strike = ce_data['strike_price'].iloc[0]
+    day_stats["strike"] = strike
+    if verbose:
+        print(f"   Strike: {strike} | CE: {len(ce_data)} candles | PE: {len(pe_data)} candles")
+
+    day_signals = day_stats["signals"]
+    ema_col = f'ema{ema_period}'
+    stages = {**DEFAULT_EXIT_STAGES, **(exit_stages or {})}
+
+    # Iterate through NIFTY candles for this day
+    for idx in range(len(day_nifty)):
+        nifty_row = day_nifty.iloc[idx]
+        signal_time = nifty_row['datetime']  # Time when signal fires
+        current_time_only = signal_time.time()
+
+        # Get NIFTY metrics (for signals and exit logic)
+        nifty_close = nifty_row['index_close']
+        ema_value = nifty_row[ema_col]
+        macd_hist = nifty_row['macd_hist']
+
+        # === ENTRY LOGIC (NEXT CANDLE OPEN) ===
+        if not position:
+            # 1. Check for signal on the CURRENT NIFTY candle
+            signal = strategy.check_entry_signal(day_nifty, idx)
+            if signal:
+                day_signals[signal] = day_signals.get(signal, 0) + 1
+
+                # 2. Plan to execute on the NEXT NIFTY candle
+                next_idx = idx + 1
+
+                # 3. Boundary Check: Ensure the next candle exists (and is not the forced EOD bar)
+                if next_idx < len(day_nifty) and not day_nifty.iloc[next_idx].get('session_last_bar', False):
+                    execution_time = day_nifty.iloc[next_idx]['datetime']
+
+                    option_data = ce_data if signal == "BUY_CE" else pe_data
+
+                    # 4. Find the corresponding option candle for the execution time
+                    exec_option_time = find_next_option_candle(execution_time, option_data.index)
+
+                    if exec_option_time:
+                        option_candle = option_data.loc[exec_option_time]
+                        option_atr = option_candle['option_atr']
+
+                        # 5. Check for valid data (ATR must be calculated)
+                        if pd.notna(option_atr):
+                            # 6. Set Entry Price: Open of the execution candle + slippage
+                            entry_price = option_candle['open'] + 0.5
+
+                            levels = strategy.calculate_entry_levels(signal, entry_price, option_atr)
+                            position = {
+                                'side': signal,
+                                'signal_time': signal_time,         # Time of signal (T)
+                                'entry_time': exec_option_time,     # Time of execution (T+1)
+                                'entry_candle_index': next_idx,     # NIFTY index of execution
+                                'entry_price': entry_price,
+                                'strike': strike,
+                                'sl': levels['sl'],
+                                'initial_sl': levels['sl'],
+                                'tp1': levels['tp1'],
+                                'tp1_hit': False,
+                                'highest': option_candle['high'],
+                                'option_atr': option_atr,
+                            }
+                            day_stats["matched"] += 1
+                        else:
+                            day_stats["missed"] += 1  # Missed due to no ATR
+                    else:
+                        day_stats["missed"] += 1  # Missed due to no option candle
+                else:
+                    day_stats["missed"] += 1  # Missed because it's the last candle(s) of the day
+
+        # === UNIFIED POSITION MANAGEMENT ===
+        if position:
+            side = position['side']
+            entry_price = position['entry_price']
+            entry_time = position['entry_time']
+
+            # ✅ CRITICAL: Skip exit checks on entry candle (prevent same-candle exit)
+            if idx == position['entry_candle_index']:
+                continue  # Must wait for next candle!
+
+            # Determine the correct option data to use
+            option_data = ce_data if side == "BUY_CE" else pe_data
+
+            # Find current option candle
+            current_option_time = find_next_option_candle(signal_time, option_data.index)
+
+            if current_option_time is None or current_option_time < entry_time:
+                continue  # Haven't entered yet or no data
+
+            current_candle = option_data.loc[current_option_time]
+            option_close = current_candle['close']
+            option_high = current_candle['high']
+
+            exit_reason = None
+            exit_price = None
+
+            # --- UNIVERSAL LOGIC FOR BOTH CE AND PE ---
+
+            # 1. Update highest price reached
+            position['highest'] = max(position.get('highest', option_high), option_high)
+
+            # --- STAGE 1: SAFETY (Hit TP1 -> Secure +8) ---
+            if not position['tp1_hit'] and strategy.check_tp1_hit(side, option_high, position['tp1']):
+                position['tp1_hit'] = True
+                position['sl'] = round(entry_price + stages['safe_sl_points'], 2)
+                position['sl_type'] = "Safe SL"
+                if verbose:
+                    print(f"✅ TP1 HIT! {side} SL moved to Safe Zone (+{stages['safe_sl_points']:g} pts) at {position['sl']:.2f}")
+
+            # --- STAGE 2: LOCK-IN (Hit +15 -> Secure +10) ---
+            if position['tp1_hit'] and option_high >= (entry_price + stages['lock_trigger_points']):
+                new_sl = round(entry_price + stages['lock_sl_points'], 2)
+                if new_sl > position['sl']:
+                    position['sl'] = new_sl
+                    position['sl_type'] = "Locked Profit"
+                    if verbose:
+                        print(f"🔒 LOCKED! {side} SL moved to Locked Profit (+{stages['lock_sl_points']:g} pts) at {position['sl']:.2f}")
+
+            # --- STAGE 3: MOONSHOT (Hit +25 -> ATR Trail) ---
+            if position['tp1_hit'] and option_high >= (entry_price + stages['trail_trigger_points']):
+                # Calculate dynamic trail: Current High - (Multiplier * ATR)
+                atr_trail = round(option_high - (config['trail_atr_multiplier'] * position['option_atr']), 2)
+                if atr_trail > position['sl']:
+                    position['sl'] = atr_trail
+                    position['sl_type'] = "ATR Trail"
+                    if verbose:
+                        print(f"🚀 MOONSHOT! {side} SL trailed via ATR to {position['sl']:.2f}")
+
+            # 3. Check for Stop Loss Hit
+            if strategy.check_sl_hit(side, option_close, position['sl']):
+                exit_reason = f"{position.get('sl_type', 'SL')} Hit"
+                exit_price = position['sl']
+
+            # 4. Check for MACD/EMA Reversal Exit (only after TP1)
+            elif strategy.check_macd_ema_exit(side, position['tp1_hit'], nifty_close, ema_value, macd_hist):
+                exit_reason = "MACD/EMA Exit"
+                exit_price = option_close
+
+            # 5. Check for EOD Exit (or the session's last bar on resampled data)
+            elif strategy.check_eod_exit(current_time_only) or nifty_row.get('session_last_bar', False):
+                exit_reason = "EOD Exit"
+                exit_price = option_close
+
+            # --- EXECUTE EXIT ---
+            if exit_reason:
+                pnl_data = strategy.calculate_pnl(side, entry_price, exit_price)
+                slippage_seconds = (entry_time - position['signal_time']).total_seconds()
+
+                day_trades.append({
+                    'SignalTime': position['signal_time'],
+                    'EntryTime': position['entry_time'],
+                    'Slippage_Sec': int(slippage_seconds),
+                    'Side': side,
+                    'Strike': position['strike'],
+                    'EntryPrice': entry_price,
+                    'ExitTime': current_option_time,
+                    'ExitPrice': exit_price,
+                    'ExitReason': exit_reason,
+                    'SL_Value': position['sl'],
+                    'Initial_SL': position['initial_sl'],
+                    'TP1_Hit': position['tp1_hit'],
+                    'PnL_Points': pnl_data['pnl_points'],
+                    'PnL_INR': pnl_data['pnl_inr'],
+                    'Gross_PnL': pnl_data['gross_pnl'],
+                    'Costs': pnl_data['cost']
+                })
+
+                day_stats["trades"] += 1
+                position = None
+
+    return day_trades, position, day_stats
+
+
+def print_day_summary(day_stats, current_date):
+    """Print the per-day summary lines for a simulated day"""
+    skipped = day_stats["skipped"]
+    if skipped == "no_nifty":
+        print(f"   ⚠️  No NIFTY data for {current_date}")
+        return
+    if skipped == "no_options":
+        print(f"   ⚠️  No options data for {current_date}")
+        return
+    if skipped == "missing_ce_pe":
+        print(f"   ⚠️  Missing CE or PE data")
+        return
+
+    day_signals = day_stats["signals"]
+    total_signals = day_signals.get('BUY_CE', 0) + day_signals.get('BUY_PE', 0)
+    match_rate = (day_stats["matched"] / total_signals * 100) if total_signals > 0 else 0
+
+    print(f"   🎯 Signals: BUY_CE={day_signals.get('BUY_CE', 0)} | BUY_PE={day_signals.get('BUY_PE', 0)}")
+    print(f"   ✅ Matched: {day_stats['matched']} ({match_rate:.1f}%) | ❌ Missed: {day_stats['missed']}")
+    print(f"   💼 {day_stats['trades']} trades executed\n")
+
+
+def split_by_trading_day(nifty_df, options_df):
+    """
+    Split NIFTY and options data into per-day frames in one pass each.
+
+    Returns:
+        (trading_days, nifty_by_day, options_by_day)
+    """
+    trading_days = sorted(options_df['trading_day'].unique())
+    nifty_by_day = _day_slices(nifty_df, 'date')
+    options_by_day = _day_slices(options_df, 'trading_day')
+    return trading_days, nifty_by_day, options_by_day
+
+
+def _day_slices(df, day_col):
+    """
+    {day: frame} as contiguous iloc slices (views, no per-day copies).
+    Frames not already ordered by day are sorted once up front.
+    """
+    if not df[day_col].is_monotonic_increasing:
+        df = df.sort_values(day_col, kind='stable')
+    days = df[day_col].to_numpy()
+    if len(days) == 0:
+        return {}
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    stops = np.r_[starts[1:], len(days)]
+    return {days[start]: df.iloc[start:stop] for start, stop in zip(starts, stops)}
+
+
+def _simulate_day_worker(task):
+    """Process-pool entry point: rebuild the strategy and simulate one day flat-to-flat."""
+    day_num, current_date, strategy_params, exit_stages, day_nifty, day_options = task
+    strategy = StrategyV30(**strategy_params)
+    config = strategy.get_config()
+    day_trades, position, day_stats = simulate_day(
+        strategy, config, strategy_params['ema_period'], day_nifty, day_options, position=None, verbose=False,
+        exit_stages=exit_stages
+    )
+    return day_num, day_trades, position, day_stats
+
+
+def run_backtest(nifty_df, options_df, ema_period=21, vi_period=21, sl_multiplier=2.0, tp_points=10, trail_atr_multiplier=0.5,
+                 workers=1, verbose=True, exit_stages=None):
+    """
+    Run backtest using StrategyV30
     WITH FULLY CONFIGURABLE PARAMETERS
+
+    Args:
+        workers: Number of worker processes. 1 = sequential. >1 (or None = all cores)
+                 simulates days in parallel - positions are flat at EOD so each day is
+                 independent once the NIFTY indicators are precomputed.
+        verbose: Print per-day progress
+        exit_stages: Overrides for DEFAULT_EXIT_STAGES (safe/lock/trail thresholds)
     """
-    # 🔥 Initialize strategy with given parameters
-    strategy = StrategyV30(
-        ema_period=ema_period, 
+    strategy_params = dict(
+        ema_period=ema_period,
         vi_period=vi_period,
         sl_multiplier=sl_multiplier,
         tp_points=tp_points,
         trail_atr_multiplier=trail_atr_multiplier
     )
+    # 🔥 Initialize strategy with given parameters
+    strategy = StrategyV30(**strategy_params)
     config = strategy.get_config()
-    
-    print("\n" + "="*70)
-    print(f"🚀 STARTING BACKTEST - V29 (EMA={ema_period}, VI={vi_period}, SL={sl_multiplier}, TP={tp_points}, Trail={trail_atr_multiplier})")
-    print("="*70)
-    print(f"\n📋 STRATEGY CONFIG:")
-    print(f"   Lot Size: {config['lot_size']}")
-    print(f"   ATR Period: {config['atr_period']}")
-    print(f"   TP1: {config['tp1_points']} pts")
-    print(f"   Trail: {config['trail_atr_multiplier']}x ATR | Max SL: {config['max_sl_points']:.1f} pts (₹{config['max_sl_points'] * 75:.0f})")
-    
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if verbose:
+        print("\n" + "="*70)
+        print(f"🚀 STARTING BACKTEST - V30 (EMA={ema_period}, VI={vi_period}, SL={sl_multiplier}, TP={tp_points}, Trail={trail_atr_multiplier})")
+        print("="*70)
+        print(f"\n📋 STRATEGY CONFIG:")
+        print(f"   Lot Size: {config['lot_size']}")
+        print(f"   ATR Period: {config['atr_period']}")
+        print(f"   TP1: {config['tp1_points']} pts")
+        print(f"   Trail: {config['trail_atr_multiplier']}x ATR | Max SL: {config['max_sl_points']:.1f} pts (₹{config['max_sl_points'] * 75:.0f})")
+
+    trading_days, nifty_by_day, options_by_day = split_by_trading_day(nifty_df, options_df)
+    empty_nifty = nifty_df.iloc[0:0]
+    empty_options = options_df.iloc[0:0]
+
+    if verbose:
+        mode = f"day-parallel ({workers} workers)" if workers > 1 else "sequential"
+        print(f"\n[INFO] Processing {len(trading_days)} trading days ({mode})...")
+        print(f"[INFO] ATR Period: {config['atr_period']} candles (faster warmup)\n")
+
     trades = []
     position = None
-    trading_days = sorted(options_df['trading_day'].unique())
-    
-    print(f"\n[INFO] Processing {len(trading_days)} trading days...")
-    print(f"[INFO] ATR Period: {14} candles (faster warmup)\n")
-    
-    for day_num, current_date in enumerate(trading_days, 1):
-        print(f"📅 Day {day_num}/{len(trading_days)}: {current_date}")        
-        
-        # Get NIFTY data for this day
-        day_nifty = nifty_df[nifty_df['date'] == current_date].copy()
-        if day_nifty.empty:
-            print(f"   ⚠️  No NIFTY data for {current_date}")
-            continue        
-        
-        # Reset index to use iloc properly
-        day_nifty = day_nifty.reset_index(drop=True)        
-        
-        # Get options data for this day
-        day_options = options_df[options_df['trading_day'] == current_date].copy()
-        if day_options.empty:
-            print(f"   ⚠️  No options data for {current_date}")
-            continue        
-        
-        # Separate CE and PE data
-        ce_data = day_options[day_options['instrument_type'] == 'CE'].copy()
-        pe_data = day_options[day_options['instrument_type'] == 'PE'].copy()        
-        
-        if ce_data.empty or pe_data.empty:
-            print(f"   ⚠️  Missing CE or PE data")
-            continue        
-        
-        # Sort by datetime
-        ce_data = ce_data.sort_values('datetime').reset_index(drop=True)
-        pe_data = pe_data.sort_values('datetime').reset_index(drop=True)        
-        
-        # Calculate ATR on OPTION prices
-        ce_atr_series = ATR_simple(ce_data['high'], ce_data['low'], ce_data['close'], config['atr_period'])
-        pe_atr_series = ATR_simple(pe_data['high'], pe_data['low'], pe_data['close'], config['atr_period'])        
-        
-        ce_data['option_atr'] = ce_atr_series
-        pe_data['option_atr'] = pe_atr_series        
-        
-        # Set index for fast lookup
-        ce_data.set_index('datetime', inplace=True)
-        pe_data.set_index('datetime', inplace=True)        
-        
-        strike = ce_data['strike_price'].iloc[0]
-        print(f"   Strike: {strike} | CE: {len(ce_data)} candles | PE: {len(pe_data)} candles")        
-        
-        day_trades = 0
-        day_signals = {"BUY_CE": 0, "BUY_PE": 0}
-        matched_entries = 0
-        missed_entries = 0        
-        
-        # Iterate through NIFTY candles for this day
-        for idx in range(len(day_nifty)):
-            nifty_row = day_nifty.iloc[idx]
-            signal_time = nifty_row['datetime']  # Time when signal fires
-            current_time_only = signal_time.time()                
-            
-            # Get NIFTY metrics (for signals and exit logic)
-            nifty_close = nifty_row['index_close']
-            ema_col = f'ema{ema_period}'
-            ema_value = nifty_row[ema_col]
-            macd_hist = nifty_row['macd_hist']                
-            
-            # === ENTRY LOGIC (NEXT CANDLE OPEN) ===
-            if not position:
-                # 1. Check for signal on the CURRENT NIFTY candle
-                signal = strategy.check_entry_signal(day_nifty, idx)
-                if signal:
-                    day_signals[signal] = day_signals.get(signal, 0) + 1
-                    
-                    # 2. Plan to execute on the NEXT NIFTY candle
-                    next_idx = idx + 1
-                    
-                    # 3. Boundary Check: Ensure the next candle exists
-                    if next_idx < len(day_nifty):
-                        execution_time = day_nifty.iloc[next_idx]['datetime']
-                        
-                        option_data = ce_data if signal == "BUY_CE" else pe_data
-                        
-                        # 4. Find the corresponding option candle for the execution time
-                        exec_option_time = find_next_option_candle(execution_time, option_data.index)
-                        
-                        if exec_option_time:
-                            option_candle = option_data.loc[exec_option_time]
-                            option_atr = option_candle['option_atr']
-
-                            # 5. Check for valid data (ATR must be calculated)
-                            if pd.notna(option_atr):
-                                # 6. Set Entry Price: Open of the execution candle + slippage
-                                entry_price = option_candle['open'] + 0.5
-                                
-                                levels = strategy.calculate_entry_levels(signal, entry_price, option_atr)
-                                position = {
-                                    'side': signal,
-                                    'signal_time': signal_time,         # Time of signal (T)
-                                    'entry_time': exec_option_time,     # Time of execution (T+1)
-                                    'entry_candle_index': next_idx,     # NIFTY index of execution
-                                    'entry_price': entry_price,
-                                    'strike': strike,
-                                    'sl': levels['sl'],
-                                    'initial_sl': levels['sl'],
-                                    'tp1': levels['tp1'],
-                                    'tp1_hit': False,
-                                    'highest': option_candle['high'],
-                                    'option_atr': option_atr,
-                                }
-                                matched_entries += 1
-                            else:
-                                missed_entries += 1 # Missed due to no ATR
-                        else:
-                            missed_entries += 1 # Missed due to no option candle
-                    else:
-                        missed_entries += 1 # Missed because it's the last candle of the day
-
-            # === UNIFIED POSITION MANAGEMENT ===
-            if position:
-                side = position['side']
-                entry_price = position['entry_price']
-                entry_time = position['entry_time']
-                entry_candle_idx = position['entry_candle_index']
-
-                # ✅ CRITICAL: Skip exit checks on entry candle (prevent same-candle exit)
-                if idx == entry_candle_idx:
-                    continue  # Must wait for next candle!
-
-                # ... rest of your exit logic continues here
-
-                # === UNIFIED POSITION MANAGEMENT ===
-                if position:
-                    side = position['side']
-                    entry_price = position['entry_price']
-                    entry_time = position['entry_time']
-
-                    # Determine the correct option data to use
-                    option_data = ce_data if side == "BUY_CE" else pe_data
-
-                    # Find current option candle
-                    current_option_time = find_next_option_candle(signal_time, option_data.index)
-
-                    if current_option_time is None or current_option_time < entry_time:
-                        continue  # Haven't entered yet or no data
-
-                    current_candle = option_data.loc[current_option_time]
-                    option_close = current_candle['close']
-                    option_high = current_candle['high']
-
-                    exit_reason = None
-                    exit_price = None
-
-                    # --- UNIVERSAL LOGIC FOR BOTH CE AND PE ---
-
-                    # 1. Update highest price reached
-                    position['highest'] = max(position.get('highest', option_high), option_high)
-
-                    # --- STAGE 1: SAFETY (Hit TP1 -> Secure +8) ---
-                    if not position['tp1_hit'] and strategy.check_tp1_hit(side, option_high, position['tp1']):
-                        position['tp1_hit'] = True
-                        position['sl'] = round(entry_price + 8.0, 2)
-                        position['sl_type'] = "Safe SL"
-                        print(f"✅ TP1 HIT! {side} SL moved to Safe Zone (+8 pts) at {position['sl']:.2f}")
-
-                    # --- STAGE 2: LOCK-IN (Hit +15 -> Secure +10) ---
-                    if position['tp1_hit'] and option_high >= (entry_price + 15.0):
-                        new_sl = round(entry_price + 10.0, 2)
-                        if new_sl > position['sl']:
-                            position['sl'] = new_sl
-                            position['sl_type'] = "Locked Profit"
-                            print(f"🔒 LOCKED! {side} SL moved to Locked Profit (+10 pts) at {position['sl']:.2f}")
-
-                    # --- STAGE 3: MOONSHOT (Hit +25 -> ATR Trail) ---
-                    if position['tp1_hit'] and option_high >= (entry_price + 25.0):
-                        # Calculate dynamic trail: Current High - (Multiplier * ATR)
-                        atr_trail = round(option_high - (config['trail_atr_multiplier'] * position['option_atr']), 2)
-                        if atr_trail > position['sl']:
-                            position['sl'] = atr_trail
-                            position['sl_type'] = "ATR Trail"
-                            print(f"🚀 MOONSHOT! {side} SL trailed via ATR to {position['sl']:.2f}")
-
-                    # 3. Check for Stop Loss Hit
-                    if strategy.check_sl_hit(side, option_close, position['sl']):
-                        exit_reason = f"{position.get('sl_type', 'SL')} Hit"
-                        exit_price = position['sl']
-
-                    # 4. Check for MACD/EMA Reversal Exit (only after TP1)
-                    elif strategy.check_macd_ema_exit(side, position['tp1_hit'], nifty_close, ema_value, macd_hist):
-                        exit_reason = "MACD/EMA Exit"
-                        exit_price = option_close
-
-                    # 5. Check for EOD Exit
-                    elif strategy.check_eod_exit(current_time_only):
-                        exit_reason = "EOD Exit"
-                        exit_price = option_close
-
-                    # --- EXECUTE EXIT ---
-                    if exit_reason:
-                        pnl_data = strategy.calculate_pnl(side, entry_price, exit_price)
-                        slippage_seconds = (entry_time - position['signal_time']).total_seconds()
-
-                        trades.append({
-                            'SignalTime': position['signal_time'],
-                            'EntryTime': position['entry_time'],
-                            'Slippage_Sec': int(slippage_seconds),
-                            'Side': side,
-                            'Strike': position['strike'],
-                            'EntryPrice': entry_price,
-                            'ExitTime': current_option_time,
-                            'ExitPrice': exit_price,
-                            'ExitReason': exit_reason,
-                            'SL_Value': position['sl'],
-                            'Initial_SL': position['initial_sl'],
-                            'TP1_Hit': position['tp1_hit'],
-                            'PnL_Points': pnl_data['pnl_points'],
-                            'PnL_INR': pnl_data['pnl_inr'],
-                            'Gross_PnL': pnl_data['gross_pnl'],
-                            'Costs': pnl_data['cost']
-                        })
-
-                        day_trades += 1
-                        position = None
-
-        total_signals = day_signals.get('BUY_CE', 0) + day_signals.get('BUY_PE', 0)
-        match_rate = (matched_entries / total_signals * 100) if total_signals > 0 else 0
-        
-        print(f"   🎯 Signals: BUY_CE={day_signals.get('BUY_CE', 0)} | BUY_PE={day_signals.get('BUY_PE', 0)}")
-        print(f"   ✅ Matched: {matched_entries} ({match_rate:.1f}%) | ❌ Missed: {missed_entries}")
-        print(f"   💼 {day_trades} trades executed\n")
-    
+
+    if workers <= 1:
+        for day_num, current_date in enumerate(trading_days, 1):
+            if verbose:
+                print(f"📅 Day {day_num}/{len(trading_days)}: {current_date}")
+            day_trades, position, day_stats = simulate_day(
+                strategy, config, ema_period,
+                nifty_by_day.get(current_date, empty_nifty),
+                options_by_day.get(current_date, empty_options),
+                position=position, verbose=verbose, exit_stages=exit_stages
+            )
+            trades.extend(day_trades)
+            if verbose:
+                print_day_summary(day_stats, current_date)
+        return trades
+
+    # === DAY-PARALLEL MODE ===
+    from concurrent.futures import ProcessPoolExecutor
+
+    tasks = [
+        (day_num, current_date, strategy_params, exit_stages,
+         nifty_by_day.get(current_date, empty_nifty),
+         options_by_day.get(current_date, empty_options))
+        for day_num, current_date in enumerate(trading_days, 1)
+    ]
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_simulate_day_worker, tasks, chunksize=chunksize))
+
+    # Merge in day order. A day that ended with an open position (no EOD candle) hands it
+    # to the next day, which is then re-simulated in-process with that carry to stay exact.
+    for (day_num, current_date, _, _, day_nifty, day_options), (_, day_trades, day_position, day_stats) in zip(tasks, results):
+        if position is not None:
+            day_trades, day_position, day_stats = simulate_day(
+                strategy, config, ema_period, day_nifty, day_options, position=position, verbose=False,
+                exit_stages=exit_stages
+            )
+        position = day_position
+        trades.extend(day_trades)
+        if verbose:
+            print(f"📅 Day {day_num}/{len(trading_days)}: {current_date}")
+            if day_stats["strike"] is not None:
+                print(f"   Strike: {day_stats['strike']}")
+            print_day_summary(day_stats, current_date)
+
     return trades
 
 # ==================== REPORTING ====================
-def generate_report(trades):
-    """Generate detailed backtest report"""
+def generate_report(trades, mc_paths=10000):
+    """
+    Generate detailed backtest report
+
+    Args:
+        trades: Trade list from run_backtest
+        mc_paths: Bootstrap paths for the robustness section (0 = skip)
+    """
     print("="*70)
     print("📊 BACKTEST RESULTS - TIMESTAMP MATCHING VERSION")
     print("="*70)
@@ -556,6 +796,10 @@ def generate_report(trades):
             side_avg_slip = side_trades['Slippage_Sec'].mean()
             print(f"{side:12} | Trades: {len(side_trades):3} | WR: {side_winrate:5.1f}% | TP1: {side_tp1:3} | Slip: {side_avg_slip:4.1f}s | P&L: ₹{side_pnl:>10,.2f}")
     
+    # Confidence intervals instead of a single lucky/unlucky path
+    if mc_paths:
+        print_robustness_report(trade_df['PnL_INR'].to_numpy(), n_paths=mc_paths)
+    
     # Save to CSV
     # ✅ CORRECT - Use hardcoded path
     OUTPUT_DIR = r'C:\Users\sakth\Desktop\VSCODE\Algo Baddu Trading API\Phase-2\trade_logs_verification'
@@ -586,21 +830,27 @@ def main():
     sl_multiplier = 2.0
     tp_points = 10
     trail_atr = 1.0
+    workers = os.cpu_count()  # Day-parallel simulation (1 = sequential)
     
     try:
         # Load data with the winning parameters
         nifty_df, options_df = load_and_prepare_data(ema_period=ema_period, vi_period=vi_period)
         
-        # Run backtest with winning parameters
-        trades = run_backtest(
+        # Run backtest with winning parameters (served from disk if this exact run was done before)
+        from backtest_cache import cached_run_backtest
+        trades, _, cache_hit = cached_run_backtest(
             nifty_df, 
             options_df, 
             ema_period=ema_period, 
             vi_period=vi_period,
             sl_multiplier=sl_multiplier,
             tp_points=tp_points,
-            trail_atr_multiplier=trail_atr
+            trail_atr_multiplier=trail_atr,
+            workers=workers,
+            verbose=True
         )
+        if cache_hit:
+            print("\n⚡ Loaded cached backtest result (same data, strategy version and parameters)")
         
         # Generate and store report
         if trades:
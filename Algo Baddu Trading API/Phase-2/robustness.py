@@ -0,0 +1,182 @@
+"""
+ROBUSTNESS ENGINE - BOOTSTRAP & MONTE CARLO FOR TRADE LISTS
+
+generate_report() prints point estimates from the single path the backtest
+happened to take. This module resamples the trade P&L array into thousands
+of alternative equity paths in one NumPy batch and reports confidence
+intervals, so sweep candidates can be compared on robustness, not luck.
+
+Methods:
+- bootstrap: draw trades with replacement (tests the edge itself)
+- shuffle:   permute the same trades (tests path dependency / drawdown luck)
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def resample_pnl_paths(pnl, n_paths=10000, method="bootstrap", seed=None):
+    """
+    Build a (n_paths, n_trades) matrix of resampled trade P&L.
+
+    Args:
+        pnl: 1-D array-like of per-trade P&L (₹)
+        n_paths: Number of simulated paths
+        method: "bootstrap" (with replacement) or "shuffle" (permutation)
+        seed: Optional RNG seed for reproducible runs
+
+    Returns:
+        np.ndarray of shape (n_paths, n_trades)
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+
+    if method == "bootstrap":
+        idx = rng.integers(0, len(pnl), size=(n_paths, len(pnl)))
+        return pnl[idx]
+    if method == "shuffle":
+        return rng.permuted(np.broadcast_to(pnl, (n_paths, len(pnl))), axis=1)
+    raise ValueError(f"Invalid method: {method}")
+
+
+def path_statistics(paths, starting_capital=100000.0, ruin_fraction=0.5):
+    """
+    Vectorized per-path metrics for a matrix of trade P&L paths.
+
+    Args:
+        paths: (n_paths, n_trades) P&L matrix
+        starting_capital: Account size used for the ruin test
+        ruin_fraction: A path is "ruined" once equity falls this fraction below start
+
+    Returns:
+        dict of 1-D arrays (one value per path)
+    """
+    equity = np.cumsum(paths, axis=1)
+    running_max = np.maximum.accumulate(equity, axis=1)
+    max_drawdown = (equity - running_max).min(axis=1)
+
+    gross_profit = np.where(paths > 0, paths, 0.0).sum(axis=1)
+    gross_loss = -np.where(paths < 0, paths, 0.0).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        profit_factor = np.where(gross_loss > 0, gross_profit / gross_loss, np.inf)
+
+    ruined = equity.min(axis=1) <= -(starting_capital * ruin_fraction)
+
+    return {
+        'net_pnl': equity[:, -1],
+        'max_drawdown': max_drawdown,
+        'profit_factor': profit_factor,
+        'win_rate': (paths > 0).mean(axis=1) * 100,
+        'ruined': ruined,
+    }
+
+
+def robustness_report(pnl, n_paths=10000, method="bootstrap", confidence=0.90, starting_capital=100000.0,
+                      ruin_fraction=0.5, seed=None, batch_size=2500):
+    """
+    Resample a trade list and summarise the distribution of outcomes.
+
+    Args:
+        pnl: Per-trade P&L (e.g. trade_df['PnL_INR'])
+        n_paths: Number of simulated equity paths
+        method: "bootstrap" or "shuffle"
+        confidence: Two-sided confidence level for the intervals (0.90 → 5th/95th pct)
+        starting_capital: Account size for the ruin probability
+        ruin_fraction: Drawdown (as a fraction of capital) that counts as ruin
+        seed: Optional RNG seed
+        batch_size: Paths per NumPy batch (bounds peak memory for long trade lists)
+
+    Returns:
+        dict with 'paths', 'method', 'ci' {metric: (low, median, high)} and 'ruin_probability'
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    if len(pnl) == 0:
+        return None
+
+    rng = np.random.default_rng(seed)
+    batches = []
+    remaining = n_paths
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        paths = resample_pnl_paths(pnl, size, method, seed=rng)
+        batches.append(path_statistics(paths, starting_capital, ruin_fraction))
+        remaining -= size
+
+    stats = {key: np.concatenate([b[key] for b in batches]) for key in batches[0]}
+
+    tail = (1 - confidence) / 2 * 100
+    ci = {}
+    for key in ('net_pnl', 'max_drawdown', 'profit_factor', 'win_rate'):
+        values = stats[key]
+        finite = values[np.isfinite(values)]
+        if len(finite) == 0:
+            ci[key] = (np.inf, np.inf, np.inf)
+            continue
+        low, median, high = np.percentile(finite, [tail, 50, 100 - tail])
+        ci[key] = (low, median, high)
+
+    return {
+        'paths': n_paths,
+        'method': method,
+        'confidence': confidence,
+        'ci': ci,
+        'ruin_probability': stats['ruined'].mean() * 100,
+        'loss_probability': (stats['net_pnl'] < 0).mean() * 100,
+    }
+
+
+def print_robustness_report(pnl, n_paths=10000, method="bootstrap", confidence=0.90, starting_capital=100000.0,
+                            ruin_fraction=0.5, seed=None):
+    """Print the robustness summary in the same layout as generate_report"""
+    report = robustness_report(pnl, n_paths=n_paths, method=method, confidence=confidence,
+                               starting_capital=starting_capital, ruin_fraction=ruin_fraction, seed=seed)
+    if report is None:
+        return None
+
+    low_pct = (1 - confidence) / 2 * 100
+    ci = report['ci']
+    print(f"\n🎲 ROBUSTNESS ({report['paths']:,} {method} paths, {confidence*100:.0f}% CI):")
+    print(f"{'='*70}")
+    print(f"{'Metric':<18} {'P' + format(low_pct, 'g'):>14} {'Median':>14} {'P' + format(100 - low_pct, 'g'):>14}")
+    print(f"{'Net P&L':<18} ₹{ci['net_pnl'][0]:>13,.0f} ₹{ci['net_pnl'][1]:>13,.0f} ₹{ci['net_pnl'][2]:>13,.0f}")
+    print(f"{'Max Drawdown':<18} ₹{ci['max_drawdown'][0]:>13,.0f} ₹{ci['max_drawdown'][1]:>13,.0f} ₹{ci['max_drawdown'][2]:>13,.0f}")
+    print(f"{'Profit Factor':<18} {ci['profit_factor'][0]:>14.2f} {ci['profit_factor'][1]:>14.2f} {ci['profit_factor'][2]:>14.2f}")
+    print(f"{'Win Rate':<18} {ci['win_rate'][0]:>13.1f}% {ci['win_rate'][1]:>13.1f}% {ci['win_rate'][2]:>13.1f}%")
+    print(f"Probability of Loss: {report['loss_probability']:.1f}%")
+    print(f"Risk of Ruin:        {report['ruin_probability']:.2f}% (equity -{ruin_fraction*100:.0f}% of ₹{starting_capital:,.0f})")
+    return report
+
+
+def compare_robustness(trade_lists, n_paths=10000, method="bootstrap", confidence=0.90, seed=None, **kwargs):
+    """
+    Rank several trade lists (e.g. sweep candidates) by their pessimistic outcomes.
+
+    Args:
+        trade_lists: {label: pnl array or trade list from run_backtest}
+
+    Returns:
+        pd.DataFrame sorted by the lower net P&L bound (best first)
+    """
+    rows = []
+    for label, trades in trade_lists.items():
+        if isinstance(trades, list) and trades and isinstance(trades[0], dict):
+            pnl = np.asarray([t['PnL_INR'] for t in trades], dtype=np.float64)
+        else:
+            pnl = np.asarray(trades, dtype=np.float64)
+        report = robustness_report(pnl, n_paths=n_paths, method=method, confidence=confidence, seed=seed, **kwargs)
+        if report is None:
+            continue
+        ci = report['ci']
+        rows.append({
+            'Config': label,
+            'Trades': len(pnl),
+            'PnL_Low': ci['net_pnl'][0],
+            'PnL_Median': ci['net_pnl'][1],
+            'PF_Low': ci['profit_factor'][0],
+            'MaxDD_Low': ci['max_drawdown'][0],
+            'P_Loss': report['loss_probability'],
+            'P_Ruin': report['ruin_probability'],
+        })
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values('PnL_Low', ascending=False).reset_index(drop=True)
@@ -0,0 +1,399 @@
+"""
+MULTI-STRATEGY COMPARISON - SINGLE PASS OVER SHARED INDICATORS
+
+Comparing V27/V28/V29/V30 used to mean one full load + backtest per strategy,
+each recomputing its NIFTY indicators. This runner:
+1. Computes the UNION of indicator columns the selected strategies need, once
+2. Prepares each day's CE/PE arrays (ATR, T+1 lookups) once
+3. Steps every strategy through the same aligned arrays in one pass,
+   using the same entry/exit rules as simulate_day()
+4. Prints side-by-side metrics
+"""
+
+import inspect
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+
+from strategy_v27 import StrategyV27
+from strategy_v28 import StrategyV28
+from strategy_v29 import StrategyV29
+from strategy_v30 import StrategyV30
+from paper_trader_dynamic import (EMA, MACD, choppiness_index, option_side_frame, split_by_trading_day,
+                                  load_nifty_data, load_options_data, DEFAULT_EXIT_STAGES)
+from backtest_cache import summarize_trades
+
+STRATEGIES = {
+    'V27': StrategyV27,
+    'V28': StrategyV28,
+    'V29': StrategyV29,
+    'V30': StrategyV30,
+}
+
+
+def build_strategy(name, **params):
+    """Instantiate a registered strategy, passing only the parameters its constructor accepts."""
+    cls = STRATEGIES[name]
+    accepted = inspect.signature(cls).parameters
+    return cls(**{k: v for k, v in params.items() if k in accepted})
+
+
+# ==================== SHARED INDICATORS ====================
+def required_indicators(strategy):
+    """
+    Indicator specs a strategy reads in check_entry_signal / exits.
+
+    Returns:
+        set of tuples: ('ema', n), ('vi', n), ('macd',), ('chop', n), ('rsi', n)
+    """
+    specs = {('macd',), ('ema', exit_ema_period(strategy))}
+    if hasattr(strategy, 'VI_PERIOD'):
+        specs.add(('vi', strategy.VI_PERIOD))
+    if hasattr(strategy, 'CHOP_THRESHOLD'):
+        specs.add(('chop', 14))
+    if isinstance(strategy, StrategyV27):
+        specs.add(('rsi', 14))
+    return specs
+
+
+def exit_ema_period(strategy):
+    """EMA period used for the MACD/EMA exit (V27 hardcodes EMA13)."""
+    return getattr(strategy, 'EMA_PERIOD', 13)
+
+
+def _spec_columns(spec):
+    kind = spec[0]
+    if kind == 'ema':
+        return [f'ema{spec[1]}']
+    if kind == 'vi':
+        return [f'vi_plus_{spec[1]}', f'vi_minus_{spec[1]}']
+    if kind == 'macd':
+        return ['macd', 'macd_signal', 'macd_hist']
+    if kind == 'chop':
+        return ['choppiness']
+    if kind == 'rsi':
+        return ['rsi']
+    raise ValueError(f"Unknown indicator spec: {spec}")
+
+
+def add_shared_indicators(nifty_df, specs):
+    """
+    Compute every indicator in `specs` once (same formulas as load_and_prepare_data).
+    Rows where any required column is still warming up are dropped, so every
+    strategy sees the same aligned candles.
+    """
+    df = nifty_df.copy()
+    for spec in sorted(specs):
+        kind = spec[0]
+        if kind == 'ema':
+            df[f'ema{spec[1]}'] = EMA(df['index_close'], spec[1])
+        elif kind == 'macd':
+            df['macd'], df['macd_signal'], df['macd_hist'] = MACD(df['index_close'])
+        elif kind == 'vi':
+            vortex_df = ta.vortex(high=df['index_high'], low=df['index_low'], close=df['index_close'], length=spec[1])
+            df[f'vi_plus_{spec[1]}'] = vortex_df[f'VTXP_{spec[1]}']
+            df[f'vi_minus_{spec[1]}'] = vortex_df[f'VTXM_{spec[1]}']
+        elif kind == 'chop':
+            chop_df = pd.DataFrame({'high': df['index_high'], 'low': df['index_low'], 'close': df['index_close']})
+            df['choppiness'] = choppiness_index(chop_df, period=spec[1])
+        elif kind == 'rsi':
+            df['rsi'] = ta.rsi(df['index_close'], length=spec[1])
+
+    columns = [col for spec in specs for col in _spec_columns(spec)]
+    df.dropna(subset=columns, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+
+class _RowView:
+    """Row proxy over the shared column arrays (supports row['col'] and row.get)."""
+    __slots__ = ('_cols', '_i')
+
+    def __init__(self, cols, i):
+        self._cols = cols
+        self._i = i
+
+    def __getitem__(self, key):
+        return self._cols[key][self._i]
+
+    def get(self, key, default=None):
+        col = self._cols.get(key)
+        return default if col is None else col[self._i]
+
+
+class ArrayDayFrame:
+    """
+    One day's window over the shared arrays, shaped like the per-day DataFrame
+    simulate_day() hands to check_entry_signal (df.iloc[idx], len(df)).
+    """
+
+    def __init__(self, cols, start, stop):
+        self._cols = cols
+        self._start = start
+        self._len = stop - start
+        self.iloc = self
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += self._len
+        return _RowView(self._cols, self._start + idx)
+
+    def __len__(self):
+        return self._len
+
+
+# ==================== PER-DAY OPTION ARRAYS ====================
+def _prepare_option_side(day_options, option_type, atr_period):
+    frame = option_side_frame(day_options, option_type, atr_period)
+    if frame.empty:
+        return None
+    times = pd.DatetimeIndex(frame.index)
+    return {
+        'times': list(times),
+        'keys': times.asi8,
+        'open': frame['open'].to_numpy(),
+        'high': frame['high'].to_numpy(),
+        'close': frame['close'].to_numpy(),
+        'atr': frame['option_atr'].to_numpy(),
+        'strike': frame['strike_price'].iloc[0],
+    }
+
+
+# ==================== STRATEGY STATE ====================
+class _StrategyRun:
+    """Position state + trades for one strategy while stepping the shared candles."""
+
+    def __init__(self, label, strategy, exit_stages=None):
+        self.label = label
+        self.strategy = strategy
+        self.config = strategy.get_config()
+        self.stages = {**DEFAULT_EXIT_STAGES, **(exit_stages or {})}
+        self.ema_col = f'ema{exit_ema_period(strategy)}'
+        self.position = None
+        self.trades = []
+        self.signals = 0
+
+    def step(self, day, idx):
+        """Same entry/exit rules as simulate_day() for NIFTY candle `idx` of the day."""
+        strategy = self.strategy
+        cols = day['cols']
+        g = day['start'] + idx
+        signal_time = cols['datetime'][g]
+        position = self.position
+
+        # === ENTRY LOGIC (NEXT CANDLE OPEN) ===
+        if not position:
+            signal = strategy.check_entry_signal(day['frame'], idx)
+            if signal:
+                self.signals += 1
+                next_idx = idx + 1
+                if next_idx < day['len'] and not day['last_bar'][next_idx]:
+                    side_data = day['CE'] if signal == "BUY_CE" else day['PE']
+                    pos = day['pos_' + signal[-2:]][next_idx]
+                    if pos < len(side_data['keys']):
+                        option_atr = side_data['atr'][pos]
+                        if pd.notna(option_atr):
+                            entry_price = side_data['open'][pos] + 0.5
+                            levels = strategy.calculate_entry_levels(signal, entry_price, option_atr)
+                            position = self.position = {
+                                'side': signal,
+                                'signal_time': signal_time,
+                                'entry_time': side_data['times'][pos],
+                                'entry_key': side_data['keys'][pos],
+                                'entry_candle_index': next_idx,
+                                'entry_price': entry_price,
+                                'strike': day['strike'],
+                                'sl': levels['sl'],
+                                'initial_sl': levels['sl'],
+                                'tp1': levels['tp1'],
+                                'tp1_hit': False,
+                                'highest': side_data['high'][pos],
+                                'option_atr': option_atr,
+                            }
+
+        # === UNIFIED POSITION MANAGEMENT ===
+        if not position or idx == position['entry_candle_index']:
+            return
+
+        side = position['side']
+        entry_price = position['entry_price']
+        side_data = day['CE'] if side == "BUY_CE" else day['PE']
+        pos = day['pos_' + side[-2:]][idx]
+        if pos >= len(side_data['keys']) or side_data['keys'][pos] < position['entry_key']:
+            return
+
+        option_close = side_data['close'][pos]
+        option_high = side_data['high'][pos]
+        position['highest'] = max(position['highest'], option_high)
+        stages = self.stages
+
+        # --- STAGE 1: SAFETY (Hit TP1 -> Secure +8) ---
+        if not position['tp1_hit'] and strategy.check_tp1_hit(side, option_high, position['tp1']):
+            position['tp1_hit'] = True
+            position['sl'] = round(entry_price + stages['safe_sl_points'], 2)
+            position['sl_type'] = "Safe SL"
+
+        # --- STAGE 2: LOCK-IN (Hit +15 -> Secure +10) ---
+        if position['tp1_hit'] and option_high >= (entry_price + stages['lock_trigger_points']):
+            new_sl = round(entry_price + stages['lock_sl_points'], 2)
+            if new_sl > position['sl']:
+                position['sl'] = new_sl
+                position['sl_type'] = "Locked Profit"
+
+        # --- STAGE 3: MOONSHOT (Hit +25 -> ATR Trail) ---
+        if position['tp1_hit'] and option_high >= (entry_price + stages['trail_trigger_points']):
+            atr_trail = round(option_high - (self.config['trail_atr_multiplier'] * position['option_atr']), 2)
+            if atr_trail > position['sl']:
+                position['sl'] = atr_trail
+                position['sl_type'] = "ATR Trail"
+
+        exit_reason = None
+        if strategy.check_sl_hit(side, option_close, position['sl']):
+            exit_reason = f"{position.get('sl_type', 'SL')} Hit"
+            exit_price = position['sl']
+        elif strategy.check_macd_ema_exit(side, position['tp1_hit'], cols['index_close'][g],
+                                          cols[self.ema_col][g], cols['macd_hist'][g]):
+            exit_reason = "MACD/EMA Exit"
+            exit_price = option_close
+        elif strategy.check_eod_exit(signal_time.time()) or day['last_bar'][idx]:
+            exit_reason = "EOD Exit"
+            exit_price = option_close
+
+        if exit_reason:
+            pnl_data = strategy.calculate_pnl(side, entry_price, exit_price)
+            self.trades.append({
+                'SignalTime': position['signal_time'],
+                'EntryTime': position['entry_time'],
+                'Slippage_Sec': int((position['entry_time'] - position['signal_time']).total_seconds()),
+                'Side': side,
+                'Strike': position['strike'],
+                'EntryPrice': entry_price,
+                'ExitTime': side_data['times'][pos],
+                'ExitPrice': exit_price,
+                'ExitReason': exit_reason,
+                'SL_Value': position['sl'],
+                'Initial_SL': position['initial_sl'],
+                'TP1_Hit': position['tp1_hit'],
+                'PnL_Points': pnl_data['pnl_points'],
+                'PnL_INR': pnl_data['pnl_inr'],
+                # V27-V29 do not model costs
+                'Gross_PnL': pnl_data.get('gross_pnl', pnl_data['pnl_inr']),
+                'Costs': pnl_data.get('cost', 0.0),
+            })
+            self.position = None
+
+
+# ==================== RUNNER ====================
+def compare_strategies(nifty_df, options_df, strategies, exit_stages=None):
+    """
+    Run several strategies over the same data in one pass.
+
+    Args:
+        nifty_df: Raw NIFTY frame from load_nifty_data() (indicators are added here)
+        options_df: Options frame from load_options_data()
+        strategies: {label: strategy instance}
+        exit_stages: Stage thresholds for every strategy (defaults to DEFAULT_EXIT_STAGES)
+
+    Returns:
+        (trades_by_label, metrics_df)
+    """
+    specs = set()
+    for strategy in strategies.values():
+        specs |= required_indicators(strategy)
+    print(f"[INFO] Shared indicators for {len(strategies)} strategies: "
+          f"{', '.join(col for spec in sorted(specs) for col in _spec_columns(spec))}")
+    aligned = add_shared_indicators(nifty_df, specs)
+
+    cols = {col: aligned[col].to_numpy() for col in aligned.columns if col not in ('datetime', 'date')}
+    cols['datetime'] = list(pd.DatetimeIndex(aligned['datetime']))
+    nifty_keys = pd.DatetimeIndex(aligned['datetime']).asi8
+
+    # Day boundaries over the aligned arrays (one slice per date, no copies)
+    dates = aligned['date'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+    stops = np.r_[starts[1:], len(dates)]
+    day_slices = {dates[s]: (s, e) for s, e in zip(starts, stops)}
+
+    runs = [_StrategyRun(label, strategy, exit_stages) for label, strategy in strategies.items()]
+    atr_period = runs[0].config['atr_period']
+    trading_days, _, options_by_day = split_by_trading_day(aligned, options_df)
+
+    print(f"[INFO] Stepping {len(runs)} strategies through {len(trading_days)} trading days...")
+    for current_date in trading_days:
+        if current_date not in day_slices:
+            continue
+        day_options = options_by_day[current_date]
+        ce = _prepare_option_side(day_options, 'CE', atr_period)
+        pe = _prepare_option_side(day_options, 'PE', atr_period)
+        if ce is None or pe is None:
+            continue
+
+        start, stop = day_slices[current_date]
+        day_keys = nifty_keys[start:stop]
+        day = {
+            'cols': cols,
+            'start': start,
+            'len': stop - start,
+            'frame': ArrayDayFrame(cols, start, stop),
+            'strike': ce['strike'],
+            # Resampled bars (timeframe_sweep) flag each session's last bar for a forced EOD exit
+            'last_bar': (cols['session_last_bar'][start:stop].astype(bool) if 'session_last_bar' in cols
+                         else np.zeros(stop - start, dtype=bool)),
+            'CE': ce,
+            'PE': pe,
+            # find_next_option_candle() for every NIFTY candle of the day, vectorized
+            'pos_CE': np.searchsorted(ce['keys'], day_keys, side='left'),
+            'pos_PE': np.searchsorted(pe['keys'], day_keys, side='left'),
+        }
+        for idx in range(day['len']):
+            for run in runs:
+                run.step(day, idx)
+
+    trades_by_label = {run.label: run.trades for run in runs}
+    rows = []
+    for run in runs:
+        metrics = summarize_trades(run.trades)
+        rows.append({
+            'Strategy': run.label,
+            'Version': run.config.get('version', ''),
+            'Signals': run.signals,
+            'Trades': metrics['total_trades'],
+            'Win_Rate': metrics['win_rate'],
+            'Net_PnL': metrics['net_pnl'],
+            'Gross_PnL': round(sum(t['Gross_PnL'] for t in run.trades), 2),
+            'Costs': round(sum(t['Costs'] for t in run.trades), 2),
+            'Profit_Factor': metrics['profit_factor'],
+            'Max_Drawdown': metrics['max_drawdown'],
+            'TP1_Hit_Rate': metrics['tp1_hit_rate'],
+        })
+    return trades_by_label, pd.DataFrame(rows)
+
+
+def print_comparison(metrics_df):
+    """Print the side-by-side table"""
+    print("\n" + "="*70)
+    print("📊 STRATEGY COMPARISON (same data, same pass)")
+    print("="*70)
+    for _, row in metrics_df.iterrows():
+        print(f"{row['Strategy']:5} | Trades: {row['Trades']:4} | WR: {row['Win_Rate']:5.1f}% | "
+              f"PF: {row['Profit_Factor']:5.2f} | TP1: {row['TP1_Hit_Rate']:5.1f}% | "
+              f"MaxDD: ₹{row['Max_Drawdown']:>10,.0f} | Net: ₹{row['Net_PnL']:>11,.2f}")
+    print("   (V27-V29 report gross P&L - only V30 deducts slippage & brokerage)")
+
+
+def main():
+    nifty_df = load_nifty_data()
+    options_df = load_options_data()
+    strategies = {
+        'V27': build_strategy('V27'),
+        'V28': build_strategy('V28', ema_period=21, vi_period=21),
+        'V29': build_strategy('V29', ema_period=21, vi_period=21, sl_multiplier=2.0, tp_points=10, trail_atr_multiplier=0.5),
+        'V30': build_strategy('V30', ema_period=21, vi_period=34, sl_multiplier=2.0, tp_points=10, trail_atr_multiplier=1.0),
+    }
+    _, metrics_df = compare_strategies(nifty_df, options_df, strategies)
+    print_comparison(metrics_df)
+    return metrics_df
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+TIMEFRAME SWEEP - BAR SIZE AS A SWEEP DIMENSION
+
+Instead of re-downloading candles at every interval, keep one fine-grained
+base dataset (ideally 1-minute NIFTY + ATM options) and build 3/5/10/15-minute
+bars from it:
+- Vectorized session-anchored resampling: buckets start at 09:15 IST each day
+  (same bars and start-time labels as Tradehull.resample_timeframe / the broker's own candles)
+- The last bar of each session is flagged (session_last_bar) so the backtest
+  forces its EOD exit there, whatever the bar size
+- Resampled frames are cached on disk per (base dataset, timeframe)
+- Backtest results are cached through backtest_cache, keyed by the resampled
+  data, so every (timeframe, parameters) pair is simulated only once
+"""
+
+import os
+import pickle
+import time
+import pandas as pd
+
+from paper_trader_dynamic import load_nifty_data, load_options_data
+from backtest_cache import dataset_fingerprint, cached_run_backtest, CACHE_DIR
+from strategy_comparison import add_shared_indicators
+
+TIMEFRAME_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "timeframe_cache")
+
+SESSION_START = pd.Timedelta(hours=9, minutes=15)
+SESSION_END = pd.Timedelta(hours=15, minutes=30)
+
+# Bar aggregation per column; anything not listed keeps the bucket's first value
+OHLCV_AGG = {
+    'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum', 'oi': 'last',
+    'index_open': 'first', 'index_high': 'max', 'index_low': 'min', 'index_close': 'last',
+}
+
+# One option contract per trading day = one bar series
+OPTION_KEYS = ['trading_day', 'instrument_type', 'strike_price', 'expiry_date', 'instrument_key']
+
+
+# ==================== RESAMPLING ====================
+def base_interval_minutes(df, time_col='datetime'):
+    """Most common candle spacing (minutes) inside a session."""
+    times = df[time_col].drop_duplicates().sort_values()
+    gaps = times.diff().dropna()
+    gaps = gaps[gaps < pd.Timedelta(hours=1)]
+    if gaps.empty:
+        raise ValueError("Cannot infer candle interval from fewer than two intraday candles")
+    return int(gaps.mode().iloc[0].total_seconds() // 60)
+
+
+def session_buckets(times, minutes):
+    """Bucket start for each timestamp: 09:15 + k * minutes on the same day."""
+    session_open = times.dt.normalize() + SESSION_START
+    step = pd.Timedelta(minutes=minutes)
+    return session_open + ((times - session_open) // step) * step
+
+
+def resample_session(df, minutes, keys=(), time_col='datetime'):
+    """
+    Resample candles to `minutes` bars anchored at 09:15, fully vectorized (no per-day loop).
+
+    Args:
+        df: Candles with a tz-aware `time_col`
+        minutes: Target bar size; must be a multiple of the base interval
+        keys: Extra grouping columns (e.g. one series per option contract)
+
+    Returns:
+        DataFrame with the same columns, one row per (keys, bar), labelled by bar start.
+        At the base interval the candles are returned unchanged.
+    """
+    if df.empty:
+        return df.copy()
+    base = base_interval_minutes(df, time_col)
+    if minutes % base:
+        raise ValueError(f"{minutes}-minute bars cannot be built from {base}-minute candles")
+
+    offset = df[time_col] - df[time_col].dt.normalize()
+    in_session = (offset >= SESSION_START) & (offset < SESSION_END)
+    df = df[in_session]
+    if minutes == base:
+        return df.reset_index(drop=True)
+
+    bucket = session_buckets(df[time_col], minutes).rename(time_col)
+    agg = {col: OHLCV_AGG.get(col, 'first') for col in df.columns if col != time_col and col not in keys}
+    grouped = df.groupby([df[k] for k in keys] + [bucket], sort=False, observed=True).agg(agg)
+    out = grouped.reset_index()[list(df.columns)]
+    return out.sort_values([time_col, *keys], kind='stable').reset_index(drop=True)
+
+
+def resample_nifty(nifty_raw, minutes):
+    """
+    NIFTY frame from load_nifty_data() → `minutes` bars ('date' recomputed).
+
+    'session_last_bar' marks each day's final bar: a 15-minute session ends on the
+    15:15 bar, before StrategyV30's 15:25 EOD time, so simulate_day() exits there
+    instead of carrying the position overnight (and takes no entry on it).
+    """
+    bars = resample_session(nifty_raw, minutes)
+    bars['date'] = bars['datetime'].dt.date
+    bars['session_last_bar'] = ~bars['date'].duplicated(keep='last')
+    return bars
+
+
+def resample_options(options_df, minutes):
+    """Options frame from load_options_data() → `minutes` bars per contract and day."""
+    keys = [k for k in OPTION_KEYS if k in options_df.columns]
+    bars = resample_session(options_df, minutes, keys=keys)
+    if 'timestamp' in bars.columns:
+        bars['timestamp'] = bars['datetime'].map(pd.Timestamp.isoformat)
+    if 'date' in bars.columns:
+        bars['date'] = bars['datetime'].dt.date.astype(str)
+    return bars
+
+
+# ==================== CACHE ====================
+def resample_cached(base_nifty, base_options, minutes, cache_dir=TIMEFRAME_CACHE_DIR):
+    """
+    Resampled (nifty_raw, options_df) for one timeframe, built once per base dataset.
+
+    Returns:
+        (nifty_raw, options_df, cache_hit)
+    """
+    # "_eod": bars carry session_last_bar (caches from older runs lack it and are not reused)
+    key = f"{dataset_fingerprint(base_nifty, base_options)[:20]}_{minutes}m_eod"
+    path = os.path.join(cache_dir, f"{key}.pkl")
+    if os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                nifty_raw, options_df = pickle.load(f)
+            return nifty_raw, options_df, True
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+
+    nifty_raw = resample_nifty(base_nifty, minutes)
+    options_df = resample_options(base_options, minutes)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump((nifty_raw, options_df), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return nifty_raw, options_df, False
+
+
+# ==================== SWEEP ====================
+def timeframe_sweep(base_nifty, base_options, timeframes, configs, workers=1, cache_dir=TIMEFRAME_CACHE_DIR,
+                    results_cache_dir=CACHE_DIR):
+    """
+    Run every V30 config on every timeframe.
+
+    Args:
+        base_nifty: Raw NIFTY frame from load_nifty_data() at the base interval
+        base_options: Options frame from load_options_data() at the base interval
+        timeframes: Bar sizes in minutes, e.g. [3, 5, 10, 15]
+        configs: List of run_backtest parameter dicts
+        workers: Day-parallel workers per backtest
+        cache_dir: Resampled bar cache
+        results_cache_dir: backtest_cache result store
+
+    Returns:
+        pd.DataFrame with one row per (timeframe, config), best net P&L first
+    """
+    base = base_interval_minutes(base_nifty)
+    rows = []
+    start = time.time()
+    for minutes in timeframes:
+        if minutes % base:
+            print(f"⚠️  Skipping {minutes}m - not a multiple of the {base}m base data")
+            continue
+        nifty_raw, options_df, bars_hit = resample_cached(base_nifty, base_options, minutes, cache_dir)
+        print(f"\n⏱️  {minutes}m bars: {len(nifty_raw):,} NIFTY / {len(options_df):,} option candles"
+              f"{' (cached)' if bars_hit else ''}")
+
+        prepared = {}
+        for params in configs:
+            pair = (params['ema_period'], params['vi_period'])
+            if pair not in prepared:
+                prepared[pair] = add_shared_indicators(
+                    nifty_raw, {('ema', pair[0]), ('vi', pair[1]), ('macd',), ('chop', 14)})
+            _, metrics, hit = cached_run_backtest(prepared[pair], options_df, workers=workers,
+                                                  cache_dir=results_cache_dir, **params)
+            rows.append({'timeframe': minutes, **params, **metrics, 'cached': hit})
+
+    print(f"\n✅ Timeframe sweep: {len(rows)} runs in {time.time() - start:.1f}s "
+          f"({sum(r['cached'] for r in rows)} served from cache)")
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values('net_pnl', ascending=False).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    base_nifty = load_nifty_data()
+    base_options = load_options_data()
+    configs = [dict(ema_period=21, vi_period=vi, sl_multiplier=2.0, tp_points=10, trail_atr_multiplier=1.0)
+               for vi in (21, 34)]
+    results = timeframe_sweep(base_nifty, base_options, [3, 5, 10, 15], configs, workers=os.cpu_count())
+    print(results.to_string(index=False))
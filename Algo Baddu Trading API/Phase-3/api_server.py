@@ -33,6 +33,333 @@ import upstox_client
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] (API) %(message)s")
 logger = logging.getLogger(__name__)
 
+# Max WebSocket frames per second; ticks arriving faster are coalesced into the next frame
+BROADCAST_MAX_FPS = 10
+
+# Per-client outbound queue: frames buffered per dashboard before latest-wins dropping kicks in
+CLIENT_QUEUE_SIZE = 8
+# Overflows in a row (without the client ever draining its queue) before it is disconnected
+CLIENT_MAX_OVERFLOWS = 5
+# A single send taking longer than this (seconds) disconnects the client
+CLIENT_SEND_TIMEOUT = 10.0
+
+
+# ======================================================================================
+# COALESCING BROADCASTER - ANY THREAD SIGNALS, THE EVENT LOOP SENDS
+# ======================================================================================
+class CoalescingBroadcaster:
+    """
+    Turns update requests from any thread into at most `max_fps` frames.
+
+    request() only sets a dirty flag and (if it was clean) wakes the loop via
+    call_soon_threadsafe; run() waits for the wake-up, respects the frame interval
+    and calls `send_frame` once for everything that happened in between.
+    """
+
+    def __init__(self, send_frame, max_fps=BROADCAST_MAX_FPS):
+        """
+        Args:
+            send_frame: Coroutine function building one snapshot and sending it to all clients
+            max_fps: Frame rate cap
+        """
+        self.send_frame = send_frame
+        self.interval = 1.0 / max_fps
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.loop = None
+        self.wakeup = None
+        self.requests = 0
+        self.coalesced = 0
+        self.frames = 0
+        self.errors = 0
+        self.last_frame_ms = 0.0
+
+    def request(self):
+        """Mark the UI state dirty. Safe to call from any thread, never blocks."""
+        with self.lock:
+            self.requests += 1
+            if self.dirty:
+                self.coalesced += 1  # A frame is already pending and will include this update
+                return
+            self.dirty = True
+            loop = self.loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self.wakeup.set)
+            except RuntimeError:
+                pass  # Event loop already closed (shutdown)
+
+    async def run(self):
+        """Frame loop; runs forever on the server's event loop."""
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            self.loop = loop
+            self.wakeup = asyncio.Event()
+            if self.dirty:
+                self.wakeup.set()  # Requests made before the loop started
+        logger.info(f"Broadcaster started (max {1.0 / self.interval:.0f} fps).")
+
+        next_frame = loop.time()
+        while True:
+            await self.wakeup.wait()
+            delay = next_frame - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)  # Ticks during this pause join the same frame
+            self.wakeup.clear()
+            with self.lock:
+                self.dirty = False
+
+            started = loop.time()
+            try:
+                await self.send_frame()
+                self.frames += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error in broadcast frame: {e}")
+            self.last_frame_ms = (loop.time() - started) * 1000
+            next_frame = started + self.interval
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "frames_sent": self.frames,
+                "ticks_coalesced": self.coalesced,
+                "errors": self.errors,
+                "last_frame_ms": round(self.last_frame_ms, 2),
+                "max_fps": round(1.0 / self.interval, 2),
+            }
+
+
+# ======================================================================================
+# VERSIONED UI STATE - SNAPSHOT ON CONNECT / RESYNC, FIELD-LEVEL DELTAS AFTER THAT
+# ======================================================================================
+def flatten_state(state, prefix=(), flat=None):
+    """
+    Nested dicts / lists → {path: (compare_key, value)}.
+    A list is recorded by its length (sent whole when the length changes) and its items
+    are flattened below it, so a P&L tick on one open position is a one-field delta.
+    """
+    flat = {} if flat is None else flat
+    for key, value in (state.items() if isinstance(state, dict) else enumerate(state)):
+        path = prefix + (str(key),)
+        if isinstance(value, (list, tuple)):
+            flat[path] = (("list", len(value)), value)
+            flatten_state(value, path, flat)
+        elif isinstance(value, dict):
+            if value:
+                flatten_state(value, path, flat)
+            else:
+                flat[path] = (("dict", 0), value)
+        else:
+            flat[path] = (value, value)
+    return flat
+
+
+class StateStream:
+    """
+    Versioned copy of the dashboard state.
+
+    Messages (JSON text):
+        {"type": "snapshot", "version": v, "state": {...}}
+        {"type": "delta", "version": v, "base": v - 1, "set": [[path, value], ...], "unset": [path, ...]}
+    A client applies a delta only if `base` equals its version, otherwise it sends
+    {"type": "resync"} and gets a fresh snapshot.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.state = None
+        self.flat = {}
+        self.snapshot_message = None
+        self.deltas = 0
+        self.snapshots = 0
+        self.delta_bytes = 0
+        self.snapshot_bytes = 0
+
+    def update(self, state):
+        """
+        Record a new state.
+
+        Returns:
+            Delta message (str), or None if nothing changed / this is the first state
+        """
+        flat = flatten_state(state)
+        old = self.flat
+        changed = [(path, value) for path, (key, value) in flat.items() if path not in old or old[path][0] != key]
+        removed = self._removed_paths(old, flat)
+
+        # A resized list is sent whole - drop the per-item entries below it
+        resent = {path for path, value in changed if isinstance(value, (list, tuple))}
+        if resent:
+            def covered(path):
+                return any(path[:i] in resent for i in range(1, len(path)))
+            changed = [(path, value) for path, value in changed if not covered(path)]
+            removed = [path for path in removed if not covered(path)]
+        changed = [[list(path), value] for path, value in changed]
+        removed = [list(path) for path in removed]
+        self.state, self.flat = state, flat
+        if self.version and not changed and not removed:
+            return None
+
+        base = self.version
+        self.version += 1
+        self.snapshot_message = None
+        if not base:
+            return None  # Nobody can hold version 0 - every client starts from a snapshot
+        message = json.dumps({"type": "delta", "version": self.version, "base": base,
+                              "set": changed, "unset": removed}, default=str)
+        self.deltas += 1
+        self.delta_bytes += len(message)
+        return message
+
+    @staticmethod
+    def _removed_paths(old, flat):
+        """
+        Shortest gone prefixes, so a vanished subtree (e.g. a live_prices entry) is unset as a whole.
+        A leaf that is gone but still a prefix of current paths (an empty dict that got filled)
+        is not unset - its children already arrive as `set` entries.
+        """
+        gone = [path for path in old if path not in flat]
+        if not gone:
+            return []
+        present = {path[:i] for path in flat for i in range(1, len(path) + 1)}
+        removed = {}
+        for path in gone:
+            prefix = next((path[:i] for i in range(1, len(path) + 1) if path[:i] not in present), None)
+            if prefix is not None:
+                removed[prefix] = None
+            elif old[path][0] != ("dict", 0):
+                removed[path] = None  # A list became a dict: clear it so the client rebuilds an object
+        return list(removed)
+
+    def snapshot(self):
+        """Full state at the current version (serialized once per version)."""
+        if self.snapshot_message is None:
+            self.snapshot_message = json.dumps({"type": "snapshot", "version": self.version, "state": self.state},
+                                               default=str)
+        self.snapshots += 1
+        self.snapshot_bytes += len(self.snapshot_message)
+        return self.snapshot_message
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "snapshots_sent": self.snapshots,
+            "deltas_built": self.deltas,
+            "avg_snapshot_bytes": round(self.snapshot_bytes / self.snapshots) if self.snapshots else 0,
+            "avg_delta_bytes": round(self.delta_bytes / self.deltas) if self.deltas else 0,
+        }
+
+
+# ======================================================================================
+# PER-CLIENT CHANNELS - BOUNDED QUEUE + OWN SENDER TASK, SLOW CLIENTS CAN'T STALL OTHERS
+# ======================================================================================
+class ClientChannel:
+    """
+    One /ws connection. The frame loop only enqueues; the channel's sender task does the
+    (possibly slow) network writes.
+
+    Queue full → everything pending is dropped and replaced by a snapshot of the latest
+    state (latest wins, and the client stays consistent without asking for a resync).
+    A client that overflows CLIENT_MAX_OVERFLOWS times in a row, or whose send blocks for
+    CLIENT_SEND_TIMEOUT, is disconnected.
+    """
+
+    def __init__(self, websocket, on_evict, maxsize=CLIENT_QUEUE_SIZE):
+        """
+        Args:
+            websocket: Accepted Starlette WebSocket
+            on_evict: Callback(channel) to unregister the channel after a disconnect / eviction
+            maxsize: Outbound queue length
+        """
+        self.websocket = websocket
+        self.on_evict = on_evict
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.name = f"{websocket.client.host}:{websocket.client.port}" if websocket.client else "unknown"
+        self.needs_snapshot = True
+        self.task = None
+        self.evict_task = None
+        self.connected_at = time.monotonic()
+        self.sent = 0
+        self.dropped = 0
+        self.overflows = 0
+        self.total_overflows = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    def start(self):
+        self.task = asyncio.create_task(self._sender())
+
+    def stop(self):
+        if self.task and self.task is not asyncio.current_task():
+            self.task.cancel()
+
+    def offer(self, message, latest_snapshot):
+        """
+        Enqueue a frame without waiting.
+
+        Args:
+            message: Serialized frame
+            latest_snapshot: Callable returning the current snapshot message (used on overflow)
+
+        Returns:
+            False if the client was evicted for lagging
+        """
+        try:
+            self.queue.put_nowait((message, time.monotonic()))
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        self.overflows += 1
+        self.total_overflows += 1
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.dropped += 1
+        if self.overflows >= CLIENT_MAX_OVERFLOWS:
+            self.evict_task = asyncio.create_task(self.evict(f"lagging ({self.overflows} overflows in a row)"))
+            return False
+        self.dropped += 1  # The frame being offered is superseded by the snapshot too
+        self.queue.put_nowait((latest_snapshot(), time.monotonic()))
+        return True
+
+    async def _sender(self):
+        while True:
+            message, queued_at = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(message), CLIENT_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                await self.evict(f"send blocked > {CLIENT_SEND_TIMEOUT:.0f}s")
+                return
+            except Exception:
+                return  # Connection is gone; the /ws handler logs it and unregisters the client
+            self.sent += 1
+            self.last_lag_ms = (time.monotonic() - queued_at) * 1000
+            self.max_lag_ms = max(self.max_lag_ms, self.last_lag_ms)
+            if self.queue.empty():
+                self.overflows = 0  # Caught up
+
+    async def evict(self, reason):
+        logger.warning(f"Disconnecting slow WebSocket client {self.name}: {reason}")
+        self.on_evict(self)
+        try:
+            await asyncio.wait_for(self.websocket.close(code=1013), CLIENT_SEND_TIMEOUT)  # 1013 = try again later
+        except Exception:
+            pass
+
+    def stats(self):
+        return {
+            "client": self.name,
+            "connected_sec": round(time.monotonic() - self.connected_at, 1),
+            "queued": self.queue.qsize(),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "overflows": self.total_overflows,
+            "last_lag_ms": round(self.last_lag_ms, 2),
+            "max_lag_ms": round(self.max_lag_ms, 2),
+        }
+
 
 # ======================================================================================
 # TRADING BOT CLASS - THE HEART OF THE SYSTEM
@@ -48,44 +375,65 @@ class TradingBot:
         self.position_tracker = None
         self.asset_type = None
         self.ui_state = {"last_signal": "WAITING...", "atm_strike": "N/A"}
-        self.websocket_clients = []
-        self.broadcast_queue = asyncio.Queue()
+        self.websocket_clients = {}  # WebSocket → ClientChannel; only touched on the event loop
+        self.evicted_clients = 0
+        self.state_stream = StateStream()
+        self.broadcaster = CoalescingBroadcaster(self.broadcast_frame)
 
     def trigger_broadcast(self):
-        """Thread-safe method to request a UI update."""
-        try:
-            # This is called from the bot's thread.
-            self.broadcast_queue.put_nowait('UPDATE')
-        except asyncio.QueueFull:
-            pass  # An update is already pending, so we can skip this one.
+        """Thread-safe method to request a UI update (coalesced, at most BROADCAST_MAX_FPS frames/sec)."""
+        self.broadcaster.request()
 
     async def add_websocket_client(self, websocket: WebSocket):
         await websocket.accept()
-        self.websocket_clients.append(websocket)
+        channel = ClientChannel(websocket, on_evict=self._evict_channel)
+        self.websocket_clients[websocket] = channel
+        channel.start()
+        self.trigger_broadcast()  # New client gets its snapshot in the next frame
 
     def remove_websocket_client(self, websocket: WebSocket):
-        self.websocket_clients.remove(websocket)
+        channel = self.websocket_clients.pop(websocket, None)
+        if channel:
+            channel.stop()
+
+    def _evict_channel(self, channel):
+        if self.websocket_clients.get(channel.websocket) is channel:
+            self.evicted_clients += 1
+            self.remove_websocket_client(channel.websocket)
+
+    def request_snapshot(self, websocket: WebSocket):
+        """Out-of-sync client: send it the full state in the next frame."""
+        channel = self.websocket_clients.get(websocket)
+        if channel:
+            channel.needs_snapshot = True
+            self.trigger_broadcast()
 
-    async def broadcast_manager(self):
-        """A dedicated async task that runs forever on the main event loop."""
-        logger.info("Broadcast Manager started.")
-        while True:
-            try:
-                await self.broadcast_queue.get() # Wait for a signal to update
-                
-                if not self.websocket_clients:
-                    continue
+    async def broadcast_frame(self):
+        """One frame: a single status snapshot, diffed once; deltas to synced clients, snapshots to the rest."""
+        if not self.websocket_clients:
+            return
 
-                status_data = self.get_status()
-                message = json.dumps(status_data, default=str)
+        delta = self.state_stream.update(self.get_status())
 
-                # Create a list of tasks to send messages to all connected clients
-                tasks = [client.send_text(message) for client in self.websocket_clients]
-                await asyncio.gather(*tasks, return_exceptions=True)
+        # Frames only go through each client's queue, so a client never sees a delta before its
+        # snapshot and a slow client never holds up the others
+        for channel in list(self.websocket_clients.values()):
+            if channel.needs_snapshot:
+                channel.needs_snapshot = False
+                channel.offer(self.state_stream.snapshot(), self.state_stream.snapshot)
+            elif delta is not None:
+                channel.offer(delta, self.state_stream.snapshot)
 
-            except Exception as e:
-                logger.error(f"Error in broadcast manager: {e}")
-                await asyncio.sleep(1)
+    def client_stats(self):
+        return {
+            "connected": len(self.websocket_clients),
+            "evicted": self.evicted_clients,
+            "channels": [channel.stats() for channel in self.websocket_clients.values()],
+        }
+
+    async def broadcast_manager(self):
+        """A dedicated async task that runs forever on the main event loop."""
+        await self.broadcaster.run()
 
     def start(self, asset_type: str):
         if self.status == "RUNNING" or self.status == "STARTING":
@@ -261,7 +609,8 @@ trading_bot = TradingBot()
 
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(trading_bot.broadcast_manager())
+    # Keep a reference so the task isn't garbage-collected
+    app.state.broadcast_task = asyncio.create_task(trading_bot.broadcast_manager())
 
 @app.post("/start")
 async def start_bot_endpoint(asset_type: str = "NIFTY"):
@@ -275,15 +624,27 @@ async def stop_bot_endpoint():
 async def get_bot_status_endpoint():
     return trading_bot.get_status()
 
+@app.get("/broadcast/stats")
+async def get_broadcast_stats_endpoint():
+    return {**trading_bot.broadcaster.stats(), "stream": trading_bot.state_stream.stats(),
+            "clients": trading_bot.client_stats()}
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await trading_bot.add_websocket_client(websocket)
     try:
-        trading_bot.trigger_broadcast()
         while True:
-            await websocket.receive_text()
-    except WebSocketDisconnect:
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(message, dict) and message.get("type") == "resync":
+                trading_bot.request_snapshot(websocket)
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the socket was already closed by an eviction
         logger.info("WebSocket client disconnected.")
+    finally:
         trading_bot.remove_websocket_client(websocket)
 
 @app.get("/")
@@ -1,15 +1,25 @@
 """
 ATM Strike Selector
-Dynamically calculates ATM strike and fetches option instruments
+Dynamically calculates ATM strike and resolves option instruments
+(nearest expiry + CE/PE keys come from the local instrument index, REST only as fallback)
 """
 
-import requests
 import json
+import os
+import sys
 from datetime import datetime, timedelta
 import logging
 
+# Project root on sys.path for the shared core/ package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.token_guard import get_upstox_client
+from core.instrument_loader import get_instrument_index
+
 logger = logging.getLogger(__name__)
 
+# Underlying symbol of NIFTY options in the instrument master
+UNDERLYING = "NIFTY"
+
 class ATMSelector:
     def __init__(self, access_token):
         self.access_token = access_token
@@ -18,6 +28,7 @@ class ATMSelector:
             "Authorization": f"Bearer {access_token}",
             "Accept": "application/json"
         }
+        self.http = get_upstox_client(access_token)
         
         self.current_strike = None
         self.ce_instrument_key = None
@@ -31,7 +42,7 @@ class ATMSelector:
             instrument_key = urllib.parse.quote("NSE_INDEX|Nifty 50", safe='')
             url = f"{self.base_url}/market-quote/quotes?instrument_key={instrument_key}"
             
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.http.get(url, headers=self.headers, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -52,14 +63,29 @@ class ATMSelector:
         logger.info(f"🎯 Spot: {spot_price} → ATM: {atm}")
         return atm
     
+    def _instrument_index(self):
+        """Local instrument index (core/instrument_loader), or None if it could not be loaded"""
+        try:
+            return get_instrument_index(("NSE",))  # NIFTY options only need the NSE master
+        except Exception as e:
+            logger.warning(f"⚠️ Instrument index unavailable ({e}) - falling back to REST")
+            return None
+
     def get_nearest_expiry(self):
         """Get nearest weekly/monthly expiry for NIFTY options"""
+        index = self._instrument_index()
+        if index is not None:
+            nearest_expiry = index.nearest_expiry(UNDERLYING)
+            if nearest_expiry:
+                logger.info(f"📅 Nearest Expiry: {nearest_expiry}")
+                return nearest_expiry
+
         try:
             import urllib.parse
             index_key = urllib.parse.quote("NSE_INDEX|Nifty 50", safe='')
             url = f"{self.base_url}/option/contract?instrument_key={index_key}"
             
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.http.get(url, headers=self.headers, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -85,12 +111,21 @@ class ATMSelector:
     
     def get_atm_instruments(self, strike, expiry_date):
         """Get CE and PE instrument keys for ATM strike"""
+        index = self._instrument_index()
+        if index is not None:
+            ce_key, pe_key = index.option_keys(UNDERLYING, expiry_date, strike)
+            if ce_key and pe_key:
+                logger.info(f"✅ ATM Instruments Found!")
+                logger.info(f"   CE: {ce_key}")
+                logger.info(f"   PE: {pe_key}")
+                return ce_key, pe_key
+
         try:
             import urllib.parse
             index_key = urllib.parse.quote("NSE_INDEX|Nifty 50", safe='')
             url = f"{self.base_url}/option/contract?instrument_key={index_key}&expiry_date={expiry_date}"
             
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.http.get(url, headers=self.headers, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
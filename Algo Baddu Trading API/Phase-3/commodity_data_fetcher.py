@@ -3,7 +3,6 @@ Commodity Data Fetcher (MCX)
 Specialized fetcher for Crude Oil and Natural Gas Futures using Upstox V3 API.
 """
 
-import requests
 import pandas as pd
 import logging
 import os
@@ -13,9 +12,12 @@ import sys
 
 # Add parent directory to path to import config_live and selectors
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config_live import UPSTOX_ACCESS_TOKEN, PROJECT_ROOT
 from commodity_selector import CommodityKeySelector
+from core.token_guard import get_upstox_client
+from core.candle_data import get_warehouse, candles_to_frame, TIMEZONE
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
@@ -50,46 +52,65 @@ class CommodityDataFetcher:
         # 2. Prepare Dates
         to_date = datetime.now().date()
         from_date = to_date - timedelta(days=days)
+        yesterday = to_date - timedelta(days=1)
+
+        # Past days already in the local warehouse are not downloaded again
+        warehouse = get_warehouse()
+        interval_name = f"{interval}minute"
+        missing = warehouse.missing_range(key, interval_name, from_date, yesterday)
+        fetch_from = missing[0] if missing else to_date
         
         # 3. Construct V3 API URL
         # /v3/historical-candle/{instrumentKey}/{unit}/{interval}/{to_date}/{from_date}
         # unit = 'minutes'
         encoded_key = urllib.parse.quote(key, safe='')
-        url = f"{self.base_url}/{encoded_key}/minutes/{interval}/{to_date}/{from_date}"
+        url = f"{self.base_url}/{encoded_key}/minutes/{interval}/{to_date}/{fetch_from}"
         
         headers = {
             "Authorization": f"Bearer {self.access_token}",
             "Accept": "application/json"
         }
 
-        logger.info(f"⏳ Fetching data from {from_date} to {to_date}...")
+        logger.info(f"⏳ Fetching data from {fetch_from} to {to_date}..."
+                    f"{'' if missing else ' (past days served from the warehouse)'}")
         
         try:
-            response = requests.get(url, headers=headers, timeout=15)
+            response = get_upstox_client(self.access_token).get(url, headers=headers, timeout=15)
             
             if response.status_code == 200:
                 data = response.json().get("data", {})
                 candles = data.get("candles", [])
                 
-                if not candles:
+                # Format: [timestamp, open, high, low, close, volume, oi]
+                fetched = candles_to_frame(candles)
+                today_df = pd.DataFrame()
+                if not fetched.empty:
+                    is_today = fetched['datetime'].dt.date >= to_date
+                    warehouse.write(key, interval_name, fetched[~is_today])
+                    today_df = fetched[is_today]
+                if missing:
+                    # Holidays inside the gap return no bars but are still done
+                    warehouse.mark_complete(key, interval_name, pd.date_range(*missing).date)
+
+                stored = warehouse.read(key, interval_name, start=from_date, end=yesterday)
+                parts = [f for f in (stored, today_df) if not f.empty]
+                if not parts:
                     logger.warning("⚠️ No candles returned.")
                     return pd.DataFrame()
                 
                 # Parse Candles
-                # Format: [timestamp, open, high, low, close, volume, oi]
-                parsed_data = []
-                for c in candles:
-                    parsed_data.append({
-                        'timestamp': pd.to_datetime(c[0]).tz_localize(None), # Force naive for compatibility
-                        'open': float(c[1]),
-                        'high': float(c[2]),
-                        'low': float(c[3]),
-                        'close': float(c[4]),
-                        'volume': int(c[5]),
-                        'oi': int(c[6]) if len(c) > 6 else 0
-                    })
-                
-                df = pd.DataFrame(parsed_data)
+                df = pd.concat(parts, ignore_index=True)
+                if 'oi' not in df.columns:
+                    df['oi'] = 0
+                df = pd.DataFrame({
+                    'timestamp': df['datetime'].dt.tz_convert(TIMEZONE).dt.tz_localize(None), # Force naive (IST) for compatibility
+                    'open': df['open'].astype(float),
+                    'high': df['high'].astype(float),
+                    'low': df['low'].astype(float),
+                    'close': df['close'].astype(float),
+                    'volume': df['volume'].astype(int),
+                    'oi': df['oi'].fillna(0).astype(int)
+                })
                 df.sort_values('timestamp', inplace=True)
                 df.reset_index(drop=True, inplace=True)
                 
@@ -1,10 +1,10 @@
-import React, { useEffect, useState, useCallback } from 'react';
+import React, { useEffect, useState, useCallback, useRef } from 'react';
 import useWebSocket, { ReadyState } from 'react-use-websocket';
 import { Play, Square, Wifi, WifiOff, Terminal, Zap, Crosshair, Clock, Activity } from 'lucide-react';
-import { BotData } from '../types';
+import { BotData, StateMessage } from '../types';
 import { PriceCard } from './PriceCard';
 import { PositionsTable } from './PositionsTable';
-import { startBot, stopBot } from '../services/apiService';
+import { startBot, stopBot, applyStateMessage, RESYNC_MESSAGE } from '../services/apiService';
 
 const WS_URL = 'ws://localhost:8000/ws';
 
@@ -13,18 +13,36 @@ export const Dashboard: React.FC = () => {
   const [errorMsg, setErrorMsg] = useState<string | null>(null);
   const [selectedAsset, setSelectedAsset] = useState('NIFTY'); // STATE ADDED
 
+  // Versioned copy of the server state: snapshot on connect, deltas after that
+  const streamRef = useRef<{ version: number; state: BotData } | null>(null);
+  const resyncPendingRef = useRef(false);
+
   // Using react-use-websocket for robust WS handling
-  const { lastJsonMessage, readyState } = useWebSocket<BotData>(WS_URL, {
+  const { sendMessage, readyState } = useWebSocket(WS_URL, {
     shouldReconnect: () => true,
     reconnectInterval: 3000,
+    onOpen: () => {
+      streamRef.current = null; // The server sends a fresh snapshot to every new connection
+      resyncPendingRef.current = true;
+    },
+    onMessage: (event: MessageEvent) => {
+      const message = JSON.parse(event.data) as StateMessage;
+      const next = applyStateMessage(streamRef.current, message);
+      if (!next) {
+        if (!resyncPendingRef.current) {
+          resyncPendingRef.current = true;
+          sendMessage(RESYNC_MESSAGE); // Missed a version - ask for a full snapshot
+        }
+        return;
+      }
+      if (message.type === 'snapshot') {
+        resyncPendingRef.current = false;
+      }
+      streamRef.current = next;
+      setBotData(next.state);
+    },
   });
 
-  useEffect(() => {
-    if (lastJsonMessage) {
-      setBotData(lastJsonMessage);
-    }
-  }, [lastJsonMessage]);
-
   const connectionStatus = {
     [ReadyState.CONNECTING]: 'Connecting',
     [ReadyState.OPEN]: 'Online',
@@ -1,4 +1,5 @@
 // Service to talk to the backend. Don't ghost the server, bro.
+import { BotData, StateMessage } from '../types';
 
 const API_BASE = 'http://localhost:8000';
 
@@ -31,3 +32,41 @@ export const stopBot = async () => {
     throw error;
   }
 };
+
+// Keeps our copy of the bot state in sync with the /ws snapshot + delta stream.
+// Returns null when a delta doesn't fit our version - time to ask for a resync.
+export const RESYNC_MESSAGE = JSON.stringify({ type: 'resync' });
+
+export const applyStateMessage = (
+  current: { version: number; state: BotData } | null,
+  message: StateMessage
+): { version: number; state: BotData } | null => {
+  if (message.type === 'snapshot') {
+    return { version: message.version, state: message.state };
+  }
+  if (!current || message.base !== current.version) {
+    return null;
+  }
+
+  const state = structuredClone(current.state) as any;
+  for (const path of message.unset) {
+    let node = state;
+    for (const key of path.slice(0, -1)) {
+      node = node?.[key];
+    }
+    if (node && typeof node === 'object') {
+      delete node[path[path.length - 1]];
+    }
+  }
+  for (const [path, value] of message.set) {
+    let node = state;
+    for (const key of path.slice(0, -1)) {
+      if (node[key] === null || typeof node[key] !== 'object') {
+        node[key] = {};
+      }
+      node = node[key];
+    }
+    node[path[path.length - 1]] = value;
+  }
+  return { version: message.version, state };
+};
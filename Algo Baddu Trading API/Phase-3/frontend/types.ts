@@ -43,3 +43,23 @@ export interface StatCardProps {
   statusColor?: 'green' | 'red' | 'yellow' | 'blue' | 'gray';
   subValue?: string;
 }
+
+// Live stream from /ws: one full snapshot, then field-level deltas.
+// A delta only applies on top of the version it was built from (base).
+export type StatePath = string[];
+
+export interface StateSnapshotMessage {
+  type: 'snapshot';
+  version: number;
+  state: BotData;
+}
+
+export interface StateDeltaMessage {
+  type: 'delta';
+  version: number;
+  base: number;
+  set: [StatePath, unknown][];
+  unset: StatePath[];
+}
+
+export type StateMessage = StateSnapshotMessage | StateDeltaMessage;
@@ -0,0 +1,424 @@
+"""
+Historical Replay Source - ACCELERATED BACKTEST THROUGH THE LIVE STACK
+Feeds dataset candles (or synthetic ticks) through the real Phase-3 components
+(IndicatorCalculator, LiveSignalScanner, PaperOrderManager, PositionTracker)
+as fast as they can consume them - no sleeps, no fixed replay dates.
+
+Replaces the archived Phase-4 mock streamer (iterrows + MOCK_SPEED_DELAY).
+"""
+
+import os
+import time
+import logging
+from contextlib import contextmanager
+from datetime import timedelta
+import pandas as pd
+
+from indicator_calculator import IndicatorCalculator
+from live_signal_scanner import LiveSignalScanner
+from paper_order_manager import PaperOrderManager
+from position_tracker import PositionTracker
+from trade_logger import TradeLogger
+from strategy_v30 import StrategyV30
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _naive_ist(series):
+    """Parse timestamps and drop the +05:30 offset so the calculator keeps IST wall-clock times."""
+    ts = pd.to_datetime(series)
+    if getattr(ts.dt, 'tz', None) is not None:
+        ts = ts.dt.tz_localize(None)
+    return ts
+
+
+def load_replay_data(nifty_file, options_file):
+    """
+    Load NIFTY and ATM option candles in the Phase-2 CSV layouts.
+
+    Returns:
+        (nifty_df, options_df) with naive IST 'datetime' columns
+    """
+    nifty_df = pd.read_csv(nifty_file)
+    nifty_df['datetime'] = _naive_ist(nifty_df['datetime'])
+
+    options_df = pd.read_csv(options_file)
+    options_df['datetime'] = _naive_ist(options_df['datetime'])
+    options_df = options_df[options_df['instrument_type'].isin(['CE', 'PE'])]
+    return nifty_df, options_df
+
+
+@contextmanager
+def _quiet_logging(enabled):
+    """Silence per-candle INFO logging from the components while replaying."""
+    if not enabled:
+        yield
+        return
+    previous = logging.root.manager.disable
+    logging.disable(logging.INFO)
+    try:
+        yield
+    finally:
+        logging.disable(previous)
+
+
+class HistoricalReplaySource:
+    def __init__(self, nifty_df, options_df, indicator_calculator, on_candle_closed_callback,
+                 on_tick_callback=None, mode='candle', interval_minutes=5):
+        """
+        Initialize Historical Replay Source.
+
+        Mirrors the LiveDataStreamer surface (current_candles, get_current_prices,
+        is_connected, disconnect) so the live wiring can be reused unchanged.
+
+        Args:
+            nifty_df: NIFTY candles with 'datetime', 'open', 'high', 'low', 'close'
+            options_df: ATM option candles (Phase-2 options CSV layout)
+            indicator_calculator: IndicatorCalculator instance
+            on_candle_closed_callback: Called with 'NIFTY' after each candle close
+            on_tick_callback: Called after every candle (candle mode) or synthetic tick (tick mode)
+            mode: 'candle' (one update per bar) or 'tick' (O→L/H→H/L→C synthetic ticks)
+            interval_minutes: Bar size of the dataset
+        """
+        if mode not in ('candle', 'tick'):
+            raise ValueError(f"Invalid replay mode: {mode}")
+
+        self.indicator_calculator = indicator_calculator
+        self.on_candle_closed_callback = on_candle_closed_callback
+        self.on_tick_callback = on_tick_callback
+        self.mode = mode
+        self.interval = timedelta(minutes=interval_minutes)
+
+        self.current_candles = {'NIFTY': None, 'CE': None, 'PE': None}
+        self.latest_prices = {'NIFTY': None, 'CE': None, 'PE': None}
+        self.is_connected = False
+
+        # Columnar copies: the replay loop never touches a DataFrame row
+        nifty_df = nifty_df.sort_values('datetime')
+        self._times = list(pd.to_datetime(nifty_df['datetime']))
+        self._nifty = {col: nifty_df[col].to_numpy(dtype=float) for col in ('open', 'high', 'low', 'close')}
+        self._nifty_volume = nifty_df['volume'].to_numpy() if 'volume' in nifty_df.columns else None
+
+        # {instrument_type: {timestamp: candle dict}} - O(1) sync with the NIFTY clock
+        self._options = {'CE': {}, 'PE': {}}
+        for opt_type, frame in options_df.groupby('instrument_type'):
+            if opt_type not in self._options:
+                continue
+            records = frame[['datetime', 'open', 'high', 'low', 'close', 'volume', 'strike_price']].to_dict('records')
+            self._options[opt_type] = {rec['datetime']: rec for rec in records}
+
+        self.stats = {'candles': 0, 'ticks': 0, 'days': 0, 'elapsed_sec': 0.0, 'candles_per_sec': 0.0}
+
+    # ==============================================================================
+    #  WARM-UP
+    # ==============================================================================
+
+    def warmup(self, until):
+        """
+        Silently feed NIFTY candles before `until` (no callbacks).
+        Options are NOT warmed up - Phase 2 starts option ATR cold every day.
+
+        Returns:
+            Index of the first replay candle
+        """
+        start_idx = 0
+        for i, ts in enumerate(self._times):
+            if ts >= until:
+                break
+            self.indicator_calculator.add_candle('NIFTY', self._nifty_candle(i))
+            start_idx = i + 1
+        logger.info(f"🔥 Replay warm-up: {start_idx} NIFTY candles before {until}")
+        return start_idx
+
+    # ==============================================================================
+    #  REPLAY LOOP
+    # ==============================================================================
+
+    def replay(self, start=None, end=None, on_candle=None):
+        """
+        Run the replay from `start` to `end` (inclusive dates) at full speed.
+
+        Args:
+            start: First replay date/timestamp (None = first candle, no warm-up)
+            end: Last replay date/timestamp (None = last candle)
+            on_candle: Driver hook called as on_candle(source, timestamp, phase) with
+                       phase 'tick' (intra-candle update) or 'closed' (after the close callback)
+
+        Returns:
+            dict with candles, ticks, days, elapsed_sec, candles_per_sec
+        """
+        start_ts = pd.Timestamp(start) if start is not None else None
+        end_ts = pd.Timestamp(end) + timedelta(days=1) if end is not None else None
+
+        start_idx = self.warmup(start_ts) if start_ts is not None else 0
+        self.is_connected = True
+        last_date = None
+        candles = ticks = days = 0
+        began = time.perf_counter()
+
+        for i in range(start_idx, len(self._times)):
+            if not self.is_connected:
+                break
+            ts = self._times[i]
+            if end_ts is not None and ts >= end_ts:
+                break
+
+            # === DAILY RESET (Cold Start, matches Phase 2) ===
+            if ts.date() != last_date:
+                if last_date is not None:
+                    self.indicator_calculator.reset_option_buffers()
+                last_date = ts.date()
+                days += 1
+
+            nifty = self._nifty_candle(i)
+            ce = self._options['CE'].get(ts)
+            pe = self._options['PE'].get(ts)
+
+            if self.mode == 'tick':
+                ticks += self._replay_ticks(ts, nifty, ce, pe, on_candle)
+            else:
+                self.current_candles = {'NIFTY': dict(nifty), 'CE': ce and dict(ce), 'PE': pe and dict(pe)}
+                self._set_latest_prices()
+
+            self._close_candles(nifty, ce, pe)
+            if on_candle:
+                on_candle(self, ts, 'closed')
+            if self.on_tick_callback and self.mode == 'candle':
+                self.on_tick_callback()
+            candles += 1
+
+        elapsed = time.perf_counter() - began
+        self.is_connected = False
+        self.stats = {
+            'candles': candles,
+            'ticks': ticks,
+            'days': days,
+            'elapsed_sec': round(elapsed, 3),
+            'candles_per_sec': round(candles / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+        logger.info(f"🏁 Replay finished: {candles} candles / {days} days in {elapsed:.2f}s "
+                    f"({self.stats['candles_per_sec']} candles/s)")
+        return self.stats
+
+    def _nifty_candle(self, i):
+        return {
+            'timestamp': self._times[i],
+            'open': self._nifty['open'][i],
+            'high': self._nifty['high'][i],
+            'low': self._nifty['low'][i],
+            'close': self._nifty['close'][i],
+            'volume': int(self._nifty_volume[i]) if self._nifty_volume is not None else 0,
+        }
+
+    def _replay_ticks(self, ts, nifty, ce, pe, on_candle):
+        """Synthesize O→L→H→C (bullish) or O→H→L→C (bearish) ticks for every instrument."""
+        paths = {}
+        for name, candle in (('NIFTY', nifty), ('CE', ce), ('PE', pe)):
+            if candle is None:
+                continue
+            if candle['close'] >= candle['open']:
+                paths[name] = (candle['open'], candle['low'], candle['high'], candle['close'])
+            else:
+                paths[name] = (candle['open'], candle['high'], candle['low'], candle['close'])
+
+        self.current_candles = {'NIFTY': None, 'CE': None, 'PE': None}
+        step = self.interval / 4
+        for k in range(4):
+            for name, path in paths.items():
+                ltp = path[k]
+                forming = self.current_candles[name]
+                if forming is None:
+                    source = nifty if name == 'NIFTY' else (ce if name == 'CE' else pe)
+                    forming = {'timestamp': ts, 'open': ltp, 'high': ltp, 'low': ltp, 'close': ltp,
+                               'volume': source.get('volume', 0)}
+                    if 'strike_price' in source:
+                        forming['strike_price'] = source['strike_price']
+                    self.current_candles[name] = forming
+                else:
+                    forming['high'] = max(forming['high'], ltp)
+                    forming['low'] = min(forming['low'], ltp)
+                    forming['close'] = ltp
+            self._set_latest_prices()
+            if on_candle:
+                on_candle(self, ts + step * k, 'tick')
+            if self.on_tick_callback:
+                self.on_tick_callback()
+        return 4
+
+    def _set_latest_prices(self):
+        for name, candle in self.current_candles.items():
+            if candle is None:
+                continue
+            self.latest_prices[name] = {
+                'ltp': candle['close'],
+                'open': candle['open'],
+                'high': candle['high'],
+                'low': candle['low'],
+                **({'strike_price': candle['strike_price']} if 'strike_price' in candle else {})
+            }
+
+    def _close_candles(self, nifty, ce, pe):
+        """Push the completed candles to the Calculator (same order as LiveDataStreamer)."""
+        self.indicator_calculator.add_candle('NIFTY', nifty)
+        if ce:
+            self.indicator_calculator.add_candle('CE', {'timestamp': nifty['timestamp'], **_ohlcv(ce)})
+            self.indicator_calculator.calculate_option_indicators('CE')
+        if pe:
+            self.indicator_calculator.add_candle('PE', {'timestamp': nifty['timestamp'], **_ohlcv(pe)})
+            self.indicator_calculator.calculate_option_indicators('PE')
+        if self.on_candle_closed_callback:
+            self.on_candle_closed_callback('NIFTY')
+
+    def disconnect(self):
+        """Stop the replay loop after the current candle."""
+        self.is_connected = False
+
+    def get_current_prices(self):
+        return self.latest_prices
+
+
+def _ohlcv(candle):
+    return {k: candle[k] for k in ('open', 'high', 'low', 'close', 'volume')}
+
+
+class ReplayRunner:
+    def __init__(self, nifty_df, options_df, strategy=None, mode='candle', buffer_size=500, log_dir=None, quiet=True):
+        """
+        Wire the Phase-3 components exactly like live_trader_main, but driven by a replay source.
+
+        Args:
+            nifty_df, options_df: Replay dataset (see load_replay_data)
+            strategy: StrategyV30 instance (default parameters if None)
+            mode: 'candle' or 'tick'
+            buffer_size: IndicatorCalculator buffer size (live uses 500)
+            log_dir: TradeLogger directory (default: trade_logs/replay)
+            quiet: Suppress component INFO logs during the run
+        """
+        self.strategy = strategy or StrategyV30()
+        self.quiet = quiet
+        self.position_tracker = PositionTracker()
+        self.trade_logger = TradeLogger(log_dir or os.path.join(PROJECT_ROOT, "trade_logs", "replay"))
+        self.indicator_calculator = IndicatorCalculator(buffer_size=buffer_size, strategy_params=self.strategy.get_config())
+        self.signal_scanner = LiveSignalScanner(self.indicator_calculator, self.position_tracker)
+        self.order_manager = PaperOrderManager(self.strategy, self.position_tracker, self.trade_logger)
+        self.source = HistoricalReplaySource(
+            nifty_df, options_df, self.indicator_calculator,
+            on_candle_closed_callback=self._signal_handler_callback, mode=mode
+        )
+        self.signals = []
+
+    def _signal_handler_callback(self, candle_type):
+        # Same bridge as live_trader_main.signal_handler_callback
+        if candle_type != 'NIFTY':
+            return
+        signal = self.signal_scanner.on_candle_closed(candle_type)
+        if signal:
+            signal_time = self.indicator_calculator.get_nifty_indicators().get('timestamp')
+            self.signals.append({'SignalTime': signal_time, 'Side': signal})
+            self.order_manager.on_signal_detected(signal, signal_time)
+
+    def _on_candle(self, source, current_time, phase):
+        """Position management - candle mode runs once per closed bar, tick mode on every tick."""
+        if (source.mode == 'candle') != (phase == 'closed'):
+            return
+        prices = source.get_current_prices()
+        ce_candle = source.current_candles['CE']
+        pe_candle = source.current_candles['PE']
+        if not ce_candle or not pe_candle:
+            return
+        ce_data = dict(ce_candle, atr=self.indicator_calculator.get_option_indicators('CE').get('atr'))
+        pe_data = dict(pe_candle, atr=self.indicator_calculator.get_option_indicators('PE').get('atr'))
+        self.order_manager.update_positions(
+            prices['CE']['ltp'], prices['PE']['ltp'], prices['CE']['high'], prices['PE']['high'],
+            ce_data, pe_data, self.indicator_calculator.get_nifty_indicators(), current_time
+        )
+
+    def run(self, start=None, end=None):
+        """
+        Replay the dataset and return throughput stats.
+
+        Returns:
+            dict from HistoricalReplaySource.replay plus 'trades' and 'signals'
+        """
+        with _quiet_logging(self.quiet):
+            stats = self.source.replay(start=start, end=end, on_candle=self._on_candle)
+        stats = dict(stats, trades=len(self.position_tracker.closed_positions), signals=len(self.signals))
+        logger.info(f"⚡ REPLAY THROUGHPUT: {stats['candles_per_sec']} candles/s | "
+                    f"{stats['candles']} candles | {stats['trades']} trades")
+        return stats
+
+    def get_trades(self):
+        """Closed positions in the Phase-2 trade log layout (for diffing)."""
+        rows = []
+        for pos in self.position_tracker.closed_positions:
+            pnl = self.strategy.calculate_pnl(pos['side'], pos['entry_price'], pos['exit_price'])
+            rows.append({
+                'SignalTime': pos['signal_time'],
+                'EntryTime': pos['entry_time'],
+                'Side': pos['side'],
+                'Strike': pos['strike'],
+                'EntryPrice': pos['entry_price'],
+                'ExitTime': pos['exit_time'],
+                'ExitPrice': pos['exit_price'],
+                'ExitReason': pos['exit_reason'],
+                'SL_Value': pos['sl'],
+                'Initial_SL': pos['initial_sl'],
+                'TP1_Hit': pos['tp1_hit'],
+                'PnL_Points': pnl['pnl_points'],
+                'PnL_INR': pnl['pnl_inr'],
+            })
+        return pd.DataFrame(rows)
+
+
+def diff_against_phase2(replay_trades, phase2_trades):
+    """
+    Align live-logic trades with Phase-2 backtest trades by signal time.
+
+    Args:
+        replay_trades: DataFrame from ReplayRunner.get_trades()
+        phase2_trades: Trade list or DataFrame from Phase-2 run_backtest
+
+    Returns:
+        (diff_df, summary) - diff_df has one row per signal with a 'Match' column
+    """
+    phase2 = pd.DataFrame(phase2_trades).copy()
+    replay = replay_trades.copy()
+    for df in (phase2, replay):
+        if not df.empty:
+            df['SignalTime'] = _naive_ist(df['SignalTime'])
+
+    cols = ['SignalTime', 'Side', 'EntryPrice', 'ExitPrice', 'ExitReason', 'PnL_Points']
+    merged = pd.merge(
+        phase2.reindex(columns=cols), replay.reindex(columns=cols),
+        on='SignalTime', how='outer', suffixes=('_P2', '_P3'), indicator=True
+    ).sort_values('SignalTime').reset_index(drop=True)
+
+    same_side = merged['Side_P2'] == merged['Side_P3']
+    same_exit = (merged['ExitPrice_P2'] - merged['ExitPrice_P3']).abs() < 0.01
+    merged['Match'] = (merged['_merge'] == 'both') & same_side & same_exit
+
+    summary = {
+        'phase2_trades': int((merged['_merge'] != 'right_only').sum()),
+        'replay_trades': int((merged['_merge'] != 'left_only').sum()),
+        'matched': int(merged['Match'].sum()),
+        'phase2_only': int((merged['_merge'] == 'left_only').sum()),
+        'replay_only': int((merged['_merge'] == 'right_only').sum()),
+        'pnl_points_p2': round(merged['PnL_Points_P2'].sum(), 2),
+        'pnl_points_p3': round(merged['PnL_Points_P3'].sum(), 2),
+    }
+    return merged.drop(columns=['_merge']), summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    nifty_df, options_df = load_replay_data(
+        os.path.join(PROJECT_ROOT, "Phase-2", "nifty_5min_last_year.csv"),
+        os.path.join(os.path.dirname(PROJECT_ROOT), "extras", "atm_daily_options_HYBRID_V3_ULTRA_FIXED.csv"),
+    )
+    first_day = options_df['datetime'].dt.date.min()
+    runner = ReplayRunner(nifty_df, options_df, mode='candle')
+    stats = runner.run(start=first_day)
+    print(runner.get_trades().tail(10).to_string(index=False))
+    print(f"\n⚡ {stats['candles']} candles in {stats['elapsed_sec']}s → {stats['candles_per_sec']} candles/s")
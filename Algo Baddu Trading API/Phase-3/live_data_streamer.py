@@ -5,9 +5,10 @@ Handles Warm-Up (Historical) and Live Streaming (SDK).
 """
 
 import logging
+import os
+import sys
 import threading
 import time
-import requests
 import urllib.parse
 from datetime import datetime, timedelta
 import pandas as pd
@@ -15,6 +16,11 @@ import upstox_client
 # CORRECTED IMPORT PATH
 from upstox_client.feeder import MarketDataStreamerV3
 
+# Project root on sys.path for the shared core/ package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.token_guard import get_upstox_client
+from core.candle_data import get_warehouse, candles_to_frame, frame_to_candles, decode_candles
+
 logger = logging.getLogger(__name__)
 
 class LiveDataStreamer:
@@ -55,6 +61,8 @@ class LiveDataStreamer:
         """
         Fetches historical data for NIFTY, CE, and PE to warm up indicators.
         Merges 'Historical' (Past Days) + 'Intraday' (Today) to ensure no gaps.
+        Past days come from the local candle warehouse; only days it does not hold yet
+        are downloaded (and stored for the next start-up and the backtests).
         """
         logger.info(f"🔥 STARTING WARM-UP: Fetching last {days} days + TODAY'S Intraday Data...")
         
@@ -66,13 +74,15 @@ class LiveDataStreamer:
         ]
         
         # 1. Historical Range (Up to Yesterday)
-        # We use 'today' as to_date because Upstox Historical is exclusive/end-of-day logic mostly.
         to_date = datetime.now().date()
         from_date = to_date - timedelta(days=days)
+        yesterday = to_date - timedelta(days=1)
         
         # Extract token
         access_token = self.api_client.configuration.access_token
         headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
+        http = get_upstox_client(access_token)
+        warehouse = get_warehouse()
 
         for type_label, key in instruments_to_fetch:
             if not key:
@@ -81,24 +91,36 @@ class LiveDataStreamer:
             encoded_key = urllib.parse.quote(key, safe='')
             combined_candles = []
 
-            # --- A. Fetch Historical (Past Days) ---
-            url_hist = f"https://api.upstox.com/v3/historical-candle/{encoded_key}/minutes/5/{to_date}/{from_date}"
-            try:
-                res = requests.get(url_hist, headers=headers, timeout=15)
-                if res.status_code == 200:
-                    data = res.json().get("data", {})
-                    candles = data.get("candles", [])
-                    if candles:
-                        combined_candles.extend(candles)
-                        logger.info(f"   📄 {type_label} Historical: {len(candles)} candles")
-            except Exception as e:
-                logger.error(f"   ❌ {type_label} Historical Fetch Failed: {e}")
+            # --- A. Historical (Past Days): warehouse first, download only the gap ---
+            missing = warehouse.missing_range(key, "5minute", from_date, yesterday)
+            if missing:
+                gap_from, gap_to = missing
+                # We use the day after the gap as to_date because Upstox Historical is exclusive/end-of-day logic mostly.
+                url_hist = f"https://api.upstox.com/v3/historical-candle/{encoded_key}/minutes/5/{gap_to + timedelta(days=1)}/{gap_from}"
+                try:
+                    res = http.get(url_hist, headers=headers, timeout=15)
+                    if res.status_code == 200:
+                        candles = res.json().get("data", {}).get("candles", [])
+                        past = candles_to_frame(candles)
+                        if not past.empty:
+                            past = past[past['datetime'].dt.date <= gap_to]
+                        warehouse.write(key, "5minute", past)
+                        # Holidays inside the gap return no bars but are still done
+                        warehouse.mark_complete(key, "5minute", pd.date_range(gap_from, gap_to).date)
+                        logger.info(f"   📄 {type_label} Historical: {len(candles)} candles downloaded ({gap_from} → {gap_to})")
+                except Exception as e:
+                    logger.error(f"   ❌ {type_label} Historical Fetch Failed: {e}")
+
+            stored = warehouse.read(key, "5minute", start=from_date, end=yesterday)
+            if not stored.empty:
+                combined_candles.extend(frame_to_candles(stored))
+                logger.info(f"   📦 {type_label} Historical: {len(stored)} candles from the warehouse")
 
             # --- B. Fetch Intraday (Today) ---
             # V3 Format: /historical-candle/intraday/{instrumentKey}/{unit}/{interval}
             url_intra = f"https://api.upstox.com/v3/historical-candle/intraday/{encoded_key}/minutes/5"
             try:
-                res = requests.get(url_intra, headers=headers, timeout=15)
+                res = http.get(url_intra, headers=headers, timeout=15)
                 if res.status_code == 200:
                     data = res.json().get("data", {})
                     candles = data.get("candles", [])
@@ -120,35 +142,30 @@ class LiveDataStreamer:
         """
         Parses, Sorts, and Deduplicates candles before feeding to calculator.
         """
-        parsed_candles = []
-        seen_timestamps = set()
-        
-        for c in candles:
-            try:
-                # Upstox: [timestamp, open, high, low, close, vol, oi]
-                ts_str = c[0]
-                ts = pd.to_datetime(ts_str)
-                
-                if pd.isna(ts): continue
-                
-                # Deduplicate by Timestamp
-                if ts in seen_timestamps:
-                    continue
-                seen_timestamps.add(ts)
-                
-                parsed_candles.append({
-                    'timestamp': ts,
-                    'open': float(c[1]),
-                    'high': float(c[2]),
-                    'low': float(c[3]),
-                    'close': float(c[4]),
-                    'volume': int(c[5])
-                })
-            except Exception:
-                continue
-        
-        # Sort ascending (oldest first)
-        parsed_candles.sort(key=lambda x: x['timestamp'])
+        # Upstox: [timestamp, open, high, low, close, vol, oi] -> typed columns in one pass
+        total = len(candles)
+        candles = [c for c in candles if len(c) >= 6]
+        try:
+            frame = decode_candles(candles)
+        except (ValueError, TypeError) as e:
+            # A malformed row breaks the vectorized decode - keep the rows that decode on their own
+            good = [c for c in candles if self._decodes(c)]
+            logger.warning(f"⚠️ {instrument_type}: {total - len(good)} malformed warm-up candle(s) skipped ({e})")
+            frame = decode_candles(good)
+        if frame.empty:
+            return
+
+        # Rows with missing prices / volume (None → NaN) are dropped, like the bad rows above
+        frame = frame.dropna(subset=['datetime', 'open', 'high', 'low', 'close', 'volume'])
+        frame['volume'] = frame['volume'].astype('int64')
+
+        # Deduplicate by Timestamp, sort ascending (oldest first)
+        frame = frame.drop_duplicates(subset='datetime').sort_values('datetime', kind='stable')
+        parsed_candles = [
+            {'timestamp': ts, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+            for ts, o, h, l, c, v in zip(frame['datetime'], frame['open'].tolist(), frame['high'].tolist(),
+                                         frame['low'].tolist(), frame['close'].tolist(), frame['volume'].tolist())
+        ]
         
         logger.info(f"✅ {instrument_type}: Loaded {len(parsed_candles)} unique candles into Calculator.")
         
@@ -156,6 +173,14 @@ class LiveDataStreamer:
         for candle in parsed_candles:
             self.indicator_calculator.add_candle(instrument_type, candle)
             
+    @staticmethod
+    def _decodes(candle):
+        try:
+            decode_candles([candle])
+            return True
+        except (ValueError, TypeError):
+            return False
+
     # _process_historical_candles is replaced by _process_historical_candles_merged
     # keeping old one or removing? I'll remove the old one by overwriting or just unused.
     # The replace tool replaces exact text. I should be careful.
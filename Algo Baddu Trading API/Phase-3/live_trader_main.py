@@ -25,6 +25,9 @@ from position_tracker import PositionTracker
 from atm_selector import ATMSelector 
 from commodity_selector import CommodityKeySelector 
 
+sys.path.append(PROJECT_ROOT)
+from core.token_guard import get_upstox_client
+
 # Setup Logging
 LOG_DIR = os.path.join(PROJECT_ROOT, "logs")
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -54,12 +57,11 @@ def load_instrument_keys():
     pe_key = None
     
     # Fetch initial Spot to determine ATM
-    import requests
     url = "https://api.upstox.com/v2/market-quote/ltp?instrument_key=NSE_INDEX|Nifty 50"
     headers = {"Authorization": f"Bearer {UPSTOX_ACCESS_TOKEN}", "Accept": "application/json"}
     
     try:
-        res = requests.get(url, headers=headers, timeout=10)
+        res = get_upstox_client(UPSTOX_ACCESS_TOKEN).get(url, headers=headers, timeout=10)
         if res.status_code == 200:
             data = res.json()
             nifty_ltp = data['data']['NSE_INDEX:Nifty 50']['last_price']
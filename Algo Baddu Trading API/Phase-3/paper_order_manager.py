@@ -11,7 +11,7 @@ import pandas as pd
 logger = logging.getLogger(__name__)
 
 class PaperOrderManager:
-    def __init__(self, strategy, position_tracker, trade_logger, asset_type='NIFTY'):
+    def __init__(self, strategy, position_tracker, trade_logger, asset_type='NIFTY', tp1_lock_points=13.0):
         """
         Initialize Paper Order Manager
         
@@ -20,12 +20,14 @@ class PaperOrderManager:
             position_tracker: PositionTracker instance
             trade_logger: TradeLogger instance
             asset_type: 'NIFTY', 'CRUDEOIL', 'NATURALGAS'
+            tp1_lock_points: SL moves to entry + this on TP1 (Phase-2 exit_engine.PHASE3_TP1_LOCK_STAGES)
         """
         self.strategy = strategy
         self.position_tracker = position_tracker
         self.trade_logger = trade_logger
         self.config = strategy.get_config()
         self.asset_type = asset_type
+        self.tp1_lock_points = tp1_lock_points
         
         # === T+1 EXECUTION SYSTEM ===
         # Store pending signal to execute on next candle (matches Phase 2 behavior)
@@ -166,9 +168,9 @@ class PaperOrderManager:
             
             # Check for TP1 hit
             if self.position_tracker.check_tp1_hit(order_id, current_high):
-                # ✅ MATCHING PHASE 2: Lock Profit to Entry + 13 points immediately upon TP1
+                # ✅ MATCHING PHASE 2: Lock Profit to Entry + tp1_lock_points (13) immediately upon TP1
                 # This ensures we don't give back profits and exit early to take next trades
-                new_sl = round(position['entry_price'] + 13.0, 2)
+                new_sl = round(position['entry_price'] + self.tp1_lock_points, 2)
                 self.position_tracker.update_trailing_sl(order_id, new_sl)
                 self.trade_logger.log_event('TP1_HIT', f"TP1 hit for {side} {position['strike']}", {'order_id': order_id, 'new_sl': new_sl})
             
@@ -0,0 +1,66 @@
+import sys
+import os
+import tempfile
+import multiprocessing
+
+import pandas as pd
+
+# Force UTF-8
+sys.stdout.reconfigure(encoding='utf-8')
+
+# Project root on sys.path for the shared core/ package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.candle_data import CandleWarehouse
+
+DAYS = [pd.Timestamp("2025-06-02"), pd.Timestamp("2025-06-03"), pd.Timestamp("2025-06-04")]
+
+
+def day_bars(day, bars=75):
+    """One session of 5-minute bars starting 09:15 IST"""
+    times = pd.date_range(day + pd.Timedelta(hours=9, minutes=15), periods=bars, freq="5min", tz="Asia/Kolkata")
+    return pd.DataFrame({"datetime": times, "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 10})
+
+
+def write_days(root, instrument):
+    warehouse = CandleWarehouse(root)
+    for day in DAYS:
+        warehouse.write(instrument, "5minute", day_bars(day), complete=True)
+
+
+def test_two_instances_keep_each_others_days():
+    with tempfile.TemporaryDirectory() as root:
+        first, second = CandleWarehouse(root), CandleWarehouse(root)
+        first.write("NIFTY", "5minute", day_bars(DAYS[0]), complete=True)
+        second.write("BANKNIFTY", "5minute", day_bars(DAYS[0]), complete=True)
+        # Both instances load the index once; neither save may drop the other's rows
+        first.write("NIFTY", "5minute", day_bars(DAYS[1]), complete=True)
+
+        for warehouse in (first, second, CandleWarehouse(root)):
+            assert warehouse.missing_days("NIFTY", "5minute", DAYS) == [DAYS[2]]
+            assert warehouse.missing_days("BANKNIFTY", "5minute", DAYS) == DAYS[1:]
+            assert len(warehouse.read("NIFTY", "5minute")) == 150
+
+
+def test_concurrent_processes_same_day():
+    with tempfile.TemporaryDirectory() as root:
+        workers = [multiprocessing.Process(target=write_days, args=(root, name))
+                   for name in ("NIFTY", "BANKNIFTY", "NIFTY", "BANKNIFTY")]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            assert worker.exitcode == 0
+
+        warehouse = CandleWarehouse(root)
+        for name in ("NIFTY", "BANKNIFTY"):
+            assert warehouse.missing_days(name, "5minute", DAYS) == []
+            frame = warehouse.read(name, "5minute")
+            # Same bars written twice: stored once, nothing overwritten
+            assert len(frame) == 75 * len(DAYS)
+            assert frame["datetime"].is_unique
+
+
+if __name__ == "__main__":
+    test_two_instances_keep_each_others_days()
+    test_concurrent_processes_same_day()
+    print("✅ CandleWarehouse multi-instance OK")
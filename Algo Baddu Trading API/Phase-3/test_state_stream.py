@@ -0,0 +1,75 @@
+import sys
+import os
+import copy
+import json
+
+# Force UTF-8
+sys.stdout.reconfigure(encoding='utf-8')
+
+from api_server import StateStream
+
+
+def apply(state, message):
+    """Same rules as applyStateMessage in frontend/services/apiService.ts"""
+    if message["type"] == "snapshot":
+        return copy.deepcopy(message["state"])
+    for path in message["unset"]:
+        node = state
+        for key in path[:-1]:
+            node = node[int(key)] if isinstance(node, list) else node.get(key)
+        if isinstance(node, dict):
+            node.pop(path[-1], None)
+    for path, value in message["set"]:
+        node = state
+        for key in path[:-1]:
+            if isinstance(node, list):
+                node = node[int(key)]
+                continue
+            if not isinstance(node.get(key), (dict, list)):
+                node[key] = {}
+            node = node[key]
+        if isinstance(node, list):
+            node[int(path[-1])] = value
+        else:
+            node[path[-1]] = value
+    return state
+
+
+def check(states):
+    stream = StateStream()
+    stream.update(states[0])
+    client = apply(None, json.loads(stream.snapshot()))
+    for state in states[1:]:
+        delta = stream.update(state)
+        if delta:
+            client = apply(client, json.loads(delta))
+        assert client == json.loads(json.dumps(state, default=str)), (client, state)
+    return stream
+
+
+def test_empty_dict_gets_filled():
+    # Bot start: live_prices / indicators are {} until the first tick
+    states = [
+        {"bot_status": "STARTING", "live_prices": {}, "indicators": {}},
+        {"bot_status": "RUNNING", "live_prices": {"NIFTY": {"ltp": 1}}, "indicators": {"ema": 2.0}},
+        {"bot_status": "RUNNING", "live_prices": {"NIFTY": {"ltp": 2}}, "indicators": {"ema": 2.5}},
+        {"bot_status": "STOPPED", "live_prices": {}, "indicators": {}},
+    ]
+    stream = check(states)
+    assert stream.version == len(states)
+
+
+def test_structure_changes():
+    states = [
+        {"positions": [], "ui_state": {"last_signal": "WAITING..."}},
+        {"positions": [{"symbol": "CE", "pnl": 1.0}], "ui_state": {"last_signal": "BUY", "extra": [1, 2]}},
+        {"positions": [{"symbol": "CE", "pnl": 2.0}], "ui_state": {"last_signal": "BUY", "extra": {"a": 1}}},
+        {"positions": [], "ui_state": {"last_signal": "WAITING...", "extra": 5}},
+    ]
+    check(states)
+
+
+if __name__ == "__main__":
+    test_empty_dict_gets_filled()
+    test_structure_changes()
+    print("✅ StateStream deltas OK")
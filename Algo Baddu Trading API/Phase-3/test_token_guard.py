@@ -0,0 +1,67 @@
+import sys
+import os
+import bisect
+
+# Force UTF-8
+sys.stdout.reconfigure(encoding='utf-8')
+
+# Project root on sys.path for the shared core/ package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.token_guard import SlidingWindowLimiter, UPSTOX_RATE_LIMITS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def max_in_window(times, window):
+    """Most requests inside any half-open window (t - window, t]"""
+    return max(i + 1 - bisect.bisect_right(times, t - window) for i, t in enumerate(times))
+
+
+def run_limiter(limits, until, safety=0.9):
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter(limits, safety=safety, clock=clock, sleep=clock.sleep)
+    times = []
+    while clock.now < until:
+        limiter.acquire()
+        times.append(clock.now)
+    return limiter, times
+
+
+def test_upstox_windows_never_exceeded():
+    # Back-to-back requests for 1 hour of fake time
+    limiter, times = run_limiter(UPSTOX_RATE_LIMITS, until=3600)
+    for max_requests, window in UPSTOX_RATE_LIMITS:
+        assert max_in_window(times, window) <= int(max_requests * 0.9), (window, max_in_window(times, window))
+    # ...and the budget is actually used: 2 x 1800 requests in 2 x 30 min
+    assert len(times) >= 2 * int(2000 * 0.9)
+
+
+def test_fyers_windows_never_exceeded():
+    limits = [(10, 1), (200, 60)]
+    limiter, times = run_limiter(limits, until=600, safety=1.0)
+    for max_requests, window in limits:
+        assert max_in_window(times, window) <= max_requests
+
+
+def test_penalize_blocks_everyone():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter([(50, 1)], clock=clock, sleep=clock.sleep)
+    limiter.acquire()
+    limiter.penalize(5)
+    assert limiter.acquire() >= 5 and clock.now >= 5
+
+
+if __name__ == "__main__":
+    test_upstox_windows_never_exceeded()
+    test_fyers_windows_never_exceeded()
+    test_penalize_blocks_everyone()
+    print("✅ Rate windows respected")
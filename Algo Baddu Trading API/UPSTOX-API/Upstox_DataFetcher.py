@@ -11,16 +11,23 @@ Run locally:
     python TB4.py
 """
 
-import requests
 import json
 import os
+import sys
 import pandas as pd
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, date
 from datetime import time as dt_time  # ✅ Import time CLASS with alias!
 import config
 import urllib.parse
 
+# Project root on sys.path for the shared core/ package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.token_guard import get_upstox_client
+from core.candle_data import get_warehouse, decode_candles, ATM_OPTIONS_DATASET
+
 # Base host — build v2 and v3 paths per docs to avoid wrong endpoint versions.
 API_HOST = "https://api.upstox.com/"
 V2 = API_HOST + "v2/"
@@ -62,31 +69,16 @@ def is_trading_day(target_date, nifty_df):
 
 def safe_get(url, headers, max_retries=5):
     """
-    ✅ OPTIMIZED: Smart exponential backoff for 429 errors
-    Upstox limits: 50/sec, 500/min, 2000/30min
+    ✅ Goes through the shared Upstox client (core/token_guard):
+    pooled connections, the process-wide rate budget (50/sec, 500/min, 2000/30min)
+    is waited on BEFORE sending, jittered retries on 429/5xx/timeouts.
+    Returns None if every attempt failed.
     """
-    for attempt in range(max_retries):
-        try:
-            resp = requests.get(url, headers=headers, timeout=15)
-            
-            if resp.status_code == 429:
-                # Exponential backoff: 5s, 10s, 20s, 40s, 80s
-                wait = (2 ** attempt) * 5
-                print(f"[VEGETA-THROTTLE] 429 rate limit. Waiting {wait}s then retry ({attempt+1}/{max_retries})")
-                time.sleep(wait)  # ✅ Now time.sleep() works!
-                continue
-            
-            return resp
-            
-        except requests.exceptions.Timeout:
-            print(f"[TIMEOUT] Request timed out. Retry {attempt+1}/{max_retries}")
-            time.sleep(2)
-        except Exception as e:
-            print(f"[ERROR] Request failed: {e}")
-            time.sleep(2)
-    
-    print(f"[GOKU-DEFEAT] Max retries reached. Giving up.")
-    return None
+    try:
+        return get_upstox_client().get(url, headers=headers, timeout=15, max_retries=max_retries)
+    except Exception as e:
+        print(f"[GOKU-DEFEAT] Request failed after {max_retries} retries: {e}")
+        return None
 
 
 # ---------------------------
@@ -140,11 +132,7 @@ def get_historical_candles_expired(access_token, expired_instrument_key, target_
         return pd.DataFrame()
     if not candles:
         return pd.DataFrame()
-    columns = ["timestamp", "open", "high", "low", "close", "volume"]
-    if len(candles[0]) >= 7:
-        columns.append("oi")
-    df = pd.DataFrame(candles, columns=columns)
-    df['datetime'] = pd.to_datetime(df['timestamp'])
+    df = decode_candles(candles, keep_timestamp=True)
     df['date'] = target_date
     return df
 
@@ -212,15 +200,62 @@ def get_historical_candles_current_v3(access_token, instrument_key, target_date)
     if not candles:
         return pd.DataFrame()
     
-    columns = ["timestamp", "open", "high", "low", "close", "volume"]
-    if len(candles[0]) >= 7:
-        columns.append("oi")
-    
-    df = pd.DataFrame(candles, columns=columns)
-    df['datetime'] = pd.to_datetime(df['timestamp'])
+    df = decode_candles(candles, keep_timestamp=True)
     df['date'] = target_date
     return df
 
+# ---------------------------
+# Candle cache (instrument, date)
+# ---------------------------
+
+_candle_cache = {}
+_candle_cache_lock = threading.Lock()
+
+def _stored_day_candles(instrument_key, target_date):
+    """A past day already in the local warehouse, shaped like the API frames (None if not stored)."""
+    warehouse = get_warehouse()
+    if not warehouse.has_day(instrument_key, '5minute', target_date):
+        return None
+    df = warehouse.read_day(instrument_key, '5minute', target_date)
+    if df.empty:
+        return pd.DataFrame()
+    df.insert(0, 'timestamp', df['datetime'].map(pd.Timestamp.isoformat))
+    df = df[[c for c in df.columns if c != 'datetime'] + ['datetime']]
+    df['date'] = target_date
+    return df
+
+def get_day_candles(access_token, instrument_key, target_date, is_expired_api):
+    """
+    One instrument's candles for one day, fetched at most once.
+    The ATM probe fills the cache, so the final fetch of the chosen strike is free.
+    Past days are also kept in the local candle warehouse, so a re-run never downloads them again.
+    Returns a copy (callers add columns to it).
+    """
+    cache_key = (instrument_key, str(target_date), bool(is_expired_api))
+    with _candle_cache_lock:
+        cached = _candle_cache.get(cache_key)
+    if cached is None:
+        cached = _stored_day_candles(instrument_key, target_date)
+    if cached is None:
+        if is_expired_api:
+            cached = get_historical_candles_expired(access_token, instrument_key, target_date)
+        else:
+            cached = get_historical_candles_current_v3(access_token, instrument_key, target_date)
+        if not cached.empty and target_date < date.today():
+            get_warehouse().write(instrument_key, '5minute', cached.drop(columns=['timestamp', 'date']))
+    with _candle_cache_lock:
+        _candle_cache[cache_key] = cached
+    return cached.copy()
+
+def clear_candle_cache(target_date=None):
+    """Drop cached candles for one day (or everything)."""
+    with _candle_cache_lock:
+        if target_date is None:
+            _candle_cache.clear()
+            return
+        for cache_key in [k for k in _candle_cache if k[1] == str(target_date)]:
+            del _candle_cache[cache_key]
+
 # ---------------------------
 # Helper logic: ATM, expiry, keys
 # ---------------------------
@@ -250,6 +285,8 @@ def get_nearest_expiry(target_date, available_expired, available_current):
     return min(valid, key=lambda x: x - target_date)
 
 def find_atm_instrument_keys(contracts, atm_strike, is_expired):
+    if isinstance(contracts, ContractIndex):
+        return contracts.lookup(atm_strike)
     ce_key, pe_key = None, None
     for contract in contracts:
         try: strike = int(float(contract.get("strike_price")))
@@ -260,13 +297,170 @@ def find_atm_instrument_keys(contracts, atm_strike, is_expired):
             elif contract.get("instrument_type") == "PE": pe_key = instrument_key
     return ce_key, pe_key
 
+# ---------------------------
+# Contract list cache (per expiry)
+# ---------------------------
+
+CONTRACTS_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "contracts_cache")
+
+class ContractIndex:
+    """One expiry's option chain, indexed by (strike, CE/PE) -> instrument key (O(1) lookups)."""
+
+    def __init__(self, contracts, is_expired):
+        self.contracts = contracts
+        self.is_expired = is_expired
+        self.keys = {}
+        for contract in contracts:
+            try: strike = int(float(contract.get("strike_price")))
+            except (ValueError, TypeError): continue
+            instrument_type = contract.get("instrument_type")
+            if instrument_type in ("CE", "PE"):
+                self.keys[(strike, instrument_type)] = contract.get("expired_instrument_key" if is_expired else "instrument_key") or contract.get("instrument_key")
+
+    def __len__(self):
+        return len(self.contracts)
+
+    def lookup(self, strike):
+        """(ce_key, pe_key) for a strike; None where the chain has no such contract."""
+        return self.keys.get((strike, "CE")), self.keys.get((strike, "PE"))
+
+_contract_indexes = {}
+_contract_locks = {}
+_contract_indexes_lock = threading.Lock()
+
+def _contracts_cache_path(expiry_str, is_expired_api):
+    return os.path.join(CONTRACTS_CACHE_DIR, f"{'expired' if is_expired_api else 'current'}_{expiry_str}.json")
+
+def _load_cached_contracts(path, is_expired_api):
+    """Contract list from disk. Expired chains never change; a current chain is reused only on the day it was fetched."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not is_expired_api and cached.get("fetched") != str(date.today()):
+        return None
+    return cached.get("contracts")
+
+def get_contract_index(access_token, expiry_date, is_expired_api):
+    """
+    Option chain for one expiry, downloaded once and then served from memory / contracts_cache/.
+
+    Returns:
+        ContractIndex (empty if the download failed - failures are not cached)
+    """
+    expiry_str = expiry_date.strftime('%Y-%m-%d') if isinstance(expiry_date, date) else str(expiry_date)
+    cache_key = (expiry_str, bool(is_expired_api))
+    with _contract_indexes_lock:
+        if cache_key in _contract_indexes:
+            return _contract_indexes[cache_key]
+        key_lock = _contract_locks.setdefault(cache_key, threading.Lock())
+
+    # One download per expiry even when several days ask for it concurrently
+    with key_lock:
+        with _contract_indexes_lock:
+            if cache_key in _contract_indexes:
+                return _contract_indexes[cache_key]
+        path = _contracts_cache_path(expiry_str, is_expired_api)
+        contracts = _load_cached_contracts(path, is_expired_api)
+        if contracts is None:
+            contracts = get_option_contracts_expired(access_token, expiry_date) if is_expired_api else get_option_contracts_current(access_token, expiry_date)
+            if contracts:
+                os.makedirs(CONTRACTS_CACHE_DIR, exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump({"fetched": str(date.today()), "contracts": contracts}, f)
+                os.replace(tmp_path, path)
+        index = ContractIndex(contracts, is_expired_api)
+        if contracts:
+            with _contract_indexes_lock:
+                _contract_indexes[cache_key] = index
+        return index
+
 # ---------------------------
 # GOLDILOCKS ATM finder
 # ---------------------------
 
-def find_and_validate_atm_strike(spot_price, contracts, access_token, target_date, expiry_date, is_expired_api, search_range=15):
+def validate_strike(strike, contracts, access_token, target_date, is_expired_api, is_expiry, stop_event=None):
+    """
+    Goldilocks premium test for one strike (first candle's open of CE and PE).
+    Returns (passed, ce_key, pe_key). Skips its HTTP calls once stop_event is set.
+    """
+    lower_bound, upper_bound, min_premium = (30, 175, 1) if is_expiry else (50, 175, 10)
+    ce_key, pe_key = find_atm_instrument_keys(contracts, strike, is_expired_api)
+    if not ce_key and not pe_key:
+        return False, None, None
+
+    frames = {}
+    for label, key in (('CE', ce_key), ('PE', pe_key)):
+        if stop_event is not None and stop_event.is_set():
+            return False, None, None
+        frames[label] = get_day_candles(access_token, key, target_date, is_expired_api) if key else pd.DataFrame()
+    ce_df, pe_df = frames['CE'], frames['PE']
+
+    # ✅ SILENT MODE: no "Both CE and PE missing" flood for holidays / dead strikes
+    if ce_df.empty and pe_df.empty:
+        return False, None, None
+
+    ce_premium = float(ce_df.iloc[0]['open']) if not ce_df.empty else 0.0
+    pe_premium = float(pe_df.iloc[0]['open']) if not pe_df.empty else 0.0
+
+    ce_in_range = (lower_bound <= ce_premium <= upper_bound)
+    pe_in_range = (lower_bound <= pe_premium <= upper_bound)
+    ce_above_min = ce_premium > min_premium
+    pe_above_min = pe_premium > min_premium
+
+    # Goldilocks rule
+    if is_expiry:
+        goldilocks_pass = (ce_in_range and ce_above_min) or (pe_in_range and pe_above_min)
+    else:
+        goldilocks_pass = (ce_in_range or pe_in_range) and (ce_above_min and pe_above_min)
+
+    print(f"[ATM-VALIDATE] Strike {strike}: CE=₹{ce_premium:.2f} ({'OK' if ce_in_range else 'NO'}) | PE=₹{pe_premium:.2f} ({'OK' if pe_in_range else 'NO'}) -> {'✅ PASS' if goldilocks_pass else '❌ FAIL'}")
+
+    if goldilocks_pass:
+        return True, ce_key, pe_key
+    return False, None, None
+
+def probe_nearest_first(candidates, check, max_workers=6):
+    """
+    Run check(strike, stop_event) for all candidates concurrently, submitted nearest-first.
+    As soon as the nearest passing strike is confirmed (every nearer one has failed),
+    queued probes are cancelled and running ones skip their remaining HTTP calls.
+
+    Returns:
+        (strike, result) of the nearest pass, or (None, None)
+    """
+    stop_event = threading.Event()
+    results = {}
+    next_rank = 0
+    winner = None
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {pool.submit(check, strike, stop_event): rank for rank, strike in enumerate(candidates)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            while next_rank in results:
+                if results[next_rank][0]:
+                    winner = next_rank
+                    break
+                next_rank += 1
+            if winner is not None or next_rank == len(candidates):
+                break
+    finally:
+        stop_event.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    if winner is None:
+        return None, None
+    return candidates[winner], results[winner]
+
+def find_and_validate_atm_strike(spot_price, contracts, access_token, target_date, expiry_date, is_expired_api, search_range=15, max_workers=6):
     """
-    ✅ OPTIMIZED VERSION - Silences verbose holiday prints, fails fast
+    ✅ CONCURRENT VERSION - probes strikes nearest-first in parallel, stops at the nearest pass
+    (same answer as walking ATM, +50, -50, +100, -100, ... one at a time)
     """
     initial_atm_strike = calculate_atm_strike(spot_price)
     is_expiry = is_expiry_day(target_date, expiry_date)
@@ -275,97 +469,226 @@ def find_and_validate_atm_strike(spot_price, contracts, access_token, target_dat
     print(f"\n[ATM-SEARCH] Trading: {target_date} | Expiry: {expiry_date}")
     print(f"[ATM-SEARCH] NIFTY Spot: {spot_price:.2f} → Initial ATM: {initial_atm_strike}")
     print(f"[ATM-SEARCH] Mode: {'EXPIRY' if is_expiry else 'NORMAL'} | min_premium={min_premium} | bounds=[{lower_bound},{upper_bound}]")
-    
-    def validate_strike(current_strike, verbose=True):
-        """
-        Validate a single strike. 
-        verbose=False silences individual failed strike messages (speeds up holidays)
-        """
-        ce_key, pe_key = find_atm_instrument_keys(contracts, current_strike, is_expired_api)
-        
-        if not ce_key and not pe_key:
-            if verbose:
-                print(f"[ZORO-MISS] No instrument keys (CE/PE) found for strike {current_strike}")
-            return False, None, None
-        
-        # Fetch candles
-        ce_df = get_historical_candles_expired(access_token, ce_key, target_date) if is_expired_api and ce_key else (
-            get_historical_candles_current_v3(access_token, ce_key, target_date) if ce_key else pd.DataFrame()
-        )
-        pe_df = get_historical_candles_expired(access_token, pe_key, target_date) if is_expired_api and pe_key else (
-            get_historical_candles_current_v3(access_token, pe_key, target_date) if pe_key else pd.DataFrame()
-        )
-        
-        # ✅ SILENT MODE: Don't print "Both CE and PE missing" unless verbose
-        if ce_df.empty and pe_df.empty:
-            # Silenced for speed - only print if this is the initial ATM check
-            if verbose:
-                pass  # Skip the ZENITSU-TEARS flood!
-            return False, None, None
-        
-        ce_premium = float(ce_df.iloc[0]['open']) if not ce_df.empty else 0.0
-        pe_premium = float(pe_df.iloc[0]['open']) if not pe_df.empty else 0.0
-        
-        ce_in_range = (lower_bound <= ce_premium <= upper_bound)
-        pe_in_range = (lower_bound <= pe_premium <= upper_bound)
-        ce_above_min = ce_premium > min_premium
-        pe_above_min = pe_premium > min_premium
-        
-        # Goldilocks rule
-        if is_expiry:
-            goldilocks_pass = (ce_in_range and ce_above_min) or (pe_in_range and pe_above_min)
-        else:
-            goldilocks_pass = (ce_in_range or pe_in_range) and (ce_above_min and pe_above_min)
-        
-        # Only print validation results, not the "missing data" spam
-        print(f"[ATM-VALIDATE] Strike {current_strike}: CE=₹{ce_premium:.2f} ({'OK' if ce_in_range else 'NO'}) | PE=₹{pe_premium:.2f} ({'OK' if pe_in_range else 'NO'}) -> {'✅ PASS' if goldilocks_pass else '❌ FAIL'}")
-        
-        if goldilocks_pass:
-            return True, ce_key, pe_key
-        return False, None, None
-    
-    # Try initial ATM first (verbose mode)
-    is_valid, ce_key, pe_key = validate_strike(initial_atm_strike, verbose=True)
-    if is_valid:
-        print(f"[LEVI-CLEANUP] ✅ Found valid strike: {initial_atm_strike}")
-        return initial_atm_strike, ce_key, pe_key
-    
-    print(f"[ATM-SEARCH] Initial ATM failed, searching ±{search_range} strikes...")
-    
-    # ✅ OPTIMIZATION: Fast holiday detection
-    # If first 3 strikes have NO data at all, it's likely a holiday - fail fast!
-    quick_test_count = 0
-    for i in range(1, 4):  # Test just 3 strikes
-        for sign in [1, -1]:
-            strike_to_check = initial_atm_strike + (sign * i * 50)
-            ce_key_test, pe_key_test = find_atm_instrument_keys(contracts, strike_to_check, is_expired_api)
-            
-            if ce_key_test or pe_key_test:
-                # Found at least some keys, continue full search
-                quick_test_count += 1
-                break
-        if quick_test_count > 0:
-            break
-    
-    # If first 3 strikes had zero instruments, it's a holiday - exit immediately!
-    if quick_test_count == 0:
+
+    # ✅ Fast holiday detection (local, no HTTP): if the 3 nearest strikes on each side
+    # have no instruments at all, only the initial ATM is worth a request
+    neighbours_listed = any(
+        any(find_atm_instrument_keys(contracts, initial_atm_strike + sign * i * 50, is_expired_api))
+        for i in range(1, 4) for sign in [1, -1]
+    )
+    candidates = [initial_atm_strike]
+    if neighbours_listed:
+        candidates += [initial_atm_strike + sign * i * 50 for i in range(1, search_range + 1) for sign in [1, -1]]
+
+    def check(strike, stop_event):
+        return validate_strike(strike, contracts, access_token, target_date, is_expired_api, is_expiry, stop_event)
+
+    strike, result = probe_nearest_first(candidates, check, max_workers=max_workers)
+    if strike is not None:
+        offset = strike - initial_atm_strike
+        print(f"[LEVI-CLEANUP] ✅ Found valid strike: {strike}" + (f" ({'+' if offset > 0 else ''}{offset})" if offset else ""))
+        return strike, result[1], result[2]
+
+    if not neighbours_listed:
         print(f"[INFO] No instruments available for {target_date}. Likely market holiday. Skipping.")
         return None, None, None
-    
-    # Full search (silent mode to avoid spam)
-    for i in range(1, search_range + 1):
-        for sign in [1, -1]:
-            strike_to_check = initial_atm_strike + (sign * i * 50)
-            # ✅ verbose=False = no "missing data" prints during search
-            is_valid, ce_key, pe_key = validate_strike(strike_to_check, verbose=False)
-            if is_valid:
-                print(f"[LEVI-CLEANUP] ✅ Found valid strike: {strike_to_check} ({'+' if sign==1 else ''}{sign*i*50})")
-                return strike_to_check, ce_key, pe_key
-    
+
     print(f"[ZENITSU-TEARS] No valid ATM found near {initial_atm_strike} (±{search_range*50}).")
     return None, None, None
 
 
+# ---------------------------
+# Per-day pipeline
+# ---------------------------
+
+OUTPUT_FILE = 'atm_daily_options_HYBRID_V3_ULTRA_FIXED.csv'
+
+# Column order of atm_daily_options_HYBRID_V3_ULTRA_FIXED.csv
+CSV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'oi', 'datetime', 'date',
+               'instrument_type', 'strike_price', 'expiry_date', 'instrument_key', 'trading_day', 'is_expired']
+
+def process_trading_day(access_token, target_date, nifty_df, available_expired, available_current):
+    """
+    Resolve expiry + ATM strike for one trading day and fetch its CE/PE candles.
+    The expiry's contract list comes from the per-expiry cache (get_contract_index).
+
+    Returns:
+        (frames, day_stats) - frames: CE/PE DataFrames ready for the CSV,
+        day_stats: {'expired_candles', 'current_candles', 'failed_days'} increments
+    """
+    day_stats = {'expired_candles': 0, 'current_candles': 0, 'failed_days': 0}
+
+    warehouse = get_warehouse()
+    if warehouse.has_day(ATM_OPTIONS_DATASET, '5minute', target_date):
+        stored = warehouse.read_day(ATM_OPTIONS_DATASET, '5minute', target_date)
+        if not stored.empty:
+            print(f"[DATA] {target_date} already in the warehouse ({len(stored)} candles) - no download")
+            columns = [c for c in CSV_COLUMNS if c in stored.columns]
+            # The warehouse keeps object columns as strings - back to date like freshly fetched rows
+            for col in ('date', 'expiry_date', 'trading_day'):
+                if col in stored.columns:
+                    stored[col] = pd.to_datetime(stored[col]).dt.date
+            frames = [stored[stored['instrument_type'] == t][columns] for t in ('CE', 'PE')]
+            return [f.reset_index(drop=True) for f in frames if not f.empty], day_stats
+
+    day_candles = nifty_df[nifty_df['date'] == target_date]
+    candle_915 = day_candles[day_candles['datetime'].dt.time == dt_time(9, 15)]
+    if candle_915.empty:
+        print(f"[ZENITSU-TEARS] No 9:15 candle for {target_date}. Using first available.")
+        candle_915 = day_candles.head(1)
+    if candle_915.empty:
+        day_stats['failed_days'] += 1; print(f"[ZENITSU-TEARS] No NIFTY data for {target_date}. Skipping."); return [], day_stats
+
+    spot_price = float(candle_915.iloc[0]['close'])
+    expiry_date = get_nearest_expiry(target_date, available_expired, available_current)
+    if not expiry_date:
+        day_stats['failed_days'] += 1; print(f"[ZENITSU-TEARS] No expiry >= {target_date}. Skipping."); return [], day_stats
+
+    is_expired_api = expiry_date < date.today()
+    contracts = get_contract_index(access_token, expiry_date, is_expired_api)
+    if not contracts:
+        day_stats['failed_days'] += 1; print(f"[ZENITSU-TEARS] No contracts for expiry {expiry_date}. Skipping."); return [], day_stats
+
+    atm_strike, ce_key, pe_key = find_and_validate_atm_strike(spot_price, contracts, access_token, target_date, expiry_date, is_expired_api)
+    if not ce_key and not pe_key:
+        clear_candle_cache(target_date)
+        day_stats['failed_days'] += 1; print(f"[ZENITSU-TEARS] No valid ATM for {target_date}. Skipping."); return [], day_stats
+
+    print(f"[LEVI-CLEANUP] Final ATM: {atm_strike} | CE: {ce_key} | PE: {pe_key}")
+
+    # Served from the probe's candle cache - no extra requests
+    ce_df = get_day_candles(access_token, ce_key, target_date, is_expired_api) if ce_key else pd.DataFrame()
+    pe_df = get_day_candles(access_token, pe_key, target_date, is_expired_api) if pe_key else pd.DataFrame()
+    clear_candle_cache(target_date)
+
+    frames = []
+    is_expired_for_csv = expiry_date <= target_date
+    for df, opt_type, key in [(ce_df, 'CE', ce_key), (pe_df, 'PE', pe_key)]:
+        if not df.empty:
+            df['instrument_type'], df['strike_price'], df['expiry_date'], df['instrument_key'], df['trading_day'], df['is_expired'] = [opt_type, atm_strike, expiry_date, key, target_date, is_expired_for_csv]
+            frames.append(df)
+            day_stats['current_candles' if not is_expired_api else 'expired_candles'] += len(df)
+            print(f"[DATA] Stored {opt_type} candles: {len(df)}")
+        else:
+            print(f"[ZENITSU-TEARS] {opt_type} candles empty for {target_date} (key={key})")
+
+    if ce_df.empty and pe_df.empty: day_stats['failed_days'] += 1
+    if frames and target_date < date.today():
+        warehouse.write(ATM_OPTIONS_DATASET, '5minute', pd.concat(frames, ignore_index=True),
+                        key_columns=('instrument_key',))
+    return frames, day_stats
+
+
+# ---------------------------
+# Incremental update
+# ---------------------------
+
+def find_days_to_update(nifty_df, days, min_coverage=0.9):
+    """
+    Days the ATM dataset does not cover yet, and days it holds only partially
+    (a CE/PE side with fewer than min_coverage of that day's NIFTY candles).
+
+    Returns:
+        (missing_days, partial_days)
+    """
+    warehouse = get_warehouse()
+    missing = warehouse.missing_days(ATM_OPTIONS_DATASET, '5minute', days)
+    stored = warehouse.read(ATM_OPTIONS_DATASET, '5minute', start=days[0], end=days[-1], columns=['instrument_type'])
+    if stored.empty:
+        return missing, []
+    sides = stored.groupby([stored['datetime'].dt.date, 'instrument_type']).size().unstack(fill_value=0)
+    sides = sides.reindex(columns=['CE', 'PE'], fill_value=0).min(axis=1)
+    expected = nifty_df.groupby('date').size()
+    missing_set = set(missing)
+    partial = [d for d in days if d not in missing_set and sides.get(d, 0) < min_coverage * expected.get(d, 0)]
+    return missing, partial
+
+def drop_stored_day(target_date):
+    """Remove a day's ATM rows and its contracts' candles from the warehouse so it is fetched from scratch."""
+    warehouse = get_warehouse()
+    stored = warehouse.read_day(ATM_OPTIONS_DATASET, '5minute', target_date)
+    if not stored.empty:
+        for instrument_key in stored['instrument_key'].unique():
+            warehouse.drop_day(instrument_key, '5minute', target_date)
+    warehouse.drop_day(ATM_OPTIONS_DATASET, '5minute', target_date)
+
+def update(months=6, output_file=OUTPUT_FILE):
+    """
+    ⚡ Incremental refresh: only days the dataset is missing (or holds partially) are downloaded.
+    New days go to the warehouse as appended partitions; the CSV gets the new rows appended
+    (it is only rewritten if a day in the middle had to be repaired).
+    """
+    print("="*70)
+    print("⚡ HYBRID UPSTOX DATA FETCHER - INCREMENTAL UPDATE")
+    print("="*70)
+
+    access_token = load_access_token()
+    if not access_token:
+        print("[ZENITSU-TEARS] No access token found. Run upstox_auth to generate one.")
+        return
+
+    try:
+        nifty_df = pd.read_csv(config.NIFTY_DATA_FILE)
+        nifty_df['datetime'] = pd.to_datetime(nifty_df['datetime'])
+        nifty_df['date'] = nifty_df['datetime'].dt.date
+    except Exception as e:
+        print(f"[ZENITSU-TEARS] Failed to load NIFTY CSV: {e}")
+        return
+
+    warehouse = get_warehouse()
+    if os.path.exists(output_file):
+        warehouse.import_csv(output_file, ATM_OPTIONS_DATASET, '5minute', only_if_changed=True)
+
+    today = datetime.now().date()
+    start_day = today - timedelta(days=30 * months)
+    days = [d for d in sorted(nifty_df['date'].unique()) if start_day <= d < today]
+    if not days:
+        print("[ZENITSU-TEARS] No trading days in range.")
+        return
+
+    missing, partial = find_days_to_update(nifty_df, days)
+    print(f"[INFO] {len(days)} trading days | {len(days) - len(missing) - len(partial)} up to date | "
+          f"{len(missing)} missing | {len(partial)} partial")
+    if not missing and not partial:
+        print("🎉 Dataset already up to date - nothing to download.")
+        return
+
+    for target_date in partial:
+        drop_stored_day(target_date)
+
+    available_expired = get_available_expiries_expired(access_token)
+    available_current = get_available_expiries_current(access_token)
+
+    new_frames, stats = [], {'expired_candles': 0, 'current_candles': 0, 'failed_days': 0}
+    for target_date in sorted(missing + partial):
+        print(f"\n📅 {target_date} ({'repair' if target_date in partial else 'new'})")
+        day_frames, day_stats = process_trading_day(access_token, target_date, nifty_df, available_expired, available_current)
+        new_frames.extend(day_frames)
+        for key, value in day_stats.items():
+            stats[key] += value
+
+    print(f"\n{'='*70}\n💾 SAVING UPDATE\n{'='*70}")
+    if not new_frames:
+        print("[ZENITSU-TEARS] No option data collected.")
+        return
+    new_df = pd.concat(new_frames, ignore_index=True).sort_values(['trading_day', 'datetime', 'instrument_type'])
+    new_df = new_df[[c for c in CSV_COLUMNS if c in new_df.columns]]
+
+    last_csv_day = None
+    if os.path.exists(output_file):
+        last_csv_day = pd.read_csv(output_file, usecols=['trading_day'])['trading_day'].max()
+    appendable = not partial and (last_csv_day is None or str(new_df['trading_day'].min()) > last_csv_day)
+    if appendable:
+        new_df.to_csv(output_file, mode='a', header=last_csv_day is None, index=False)
+        print(f"🎉 Appended {len(new_df)} candles ({new_df['trading_day'].nunique()} days) to {output_file}")
+    else:
+        full_df = warehouse.read(ATM_OPTIONS_DATASET, '5minute')
+        full_df = full_df.sort_values(['trading_day', 'datetime', 'instrument_type']).reset_index(drop=True)
+        full_df[[c for c in CSV_COLUMNS if c in full_df.columns]].to_csv(output_file, index=False)
+        print(f"🎉 Rewrote {output_file} with repaired days ({len(full_df)} candles)")
+    print(f"📊 STATS: New/repaired days: {new_df['trading_day'].nunique()} | Failed: {stats['failed_days']}")
+
+
 # ---------------------------
 # MAIN
 # ---------------------------
@@ -424,54 +747,24 @@ def main():
         print(f"📅 Day {day_num}/{len(days_to_process)}: {target_date}")
         print("="*70)
 
-        day_candles = nifty_df[nifty_df['date'] == target_date]
-        candle_915 = day_candles[day_candles['datetime'].dt.time == dt_time(9, 15)]
-        if candle_915.empty:
-            print(f"[ZENITSU-TEARS] No 9:15 candle for {target_date}. Using first available.")
-            candle_915 = day_candles.head(1)
-        if candle_915.empty:
-            stats['failed_days'] += 1; print(f"[ZENITSU-TEARS] No NIFTY data for {target_date}. Skipping."); continue
-
-        spot_price = float(candle_915.iloc[0]['close'])
-        expiry_date = get_nearest_expiry(target_date, available_expired, available_current)
-        if not expiry_date:
-            stats['failed_days'] += 1; print(f"[ZENITSU-TEARS] No expiry >= {target_date}. Skipping."); continue
-
-        is_expired_api = expiry_date < date.today()
-        contracts = get_option_contracts_expired(access_token, expiry_date) if is_expired_api else get_option_contracts_current(access_token, expiry_date)
-        if not contracts:
-            stats['failed_days'] += 1; print(f"[ZENITSU-TEARS] No contracts for expiry {expiry_date}. Skipping."); continue
-
-        atm_strike, ce_key, pe_key = find_and_validate_atm_strike(spot_price, contracts, access_token, target_date, expiry_date, is_expired_api)
-        if not ce_key and not pe_key:
-            stats['failed_days'] += 1; print(f"[ZENITSU-TEARS] No valid ATM for {target_date}. Skipping."); continue
-
-        print(f"[LEVI-CLEANUP] Final ATM: {atm_strike} | CE: {ce_key} | PE: {pe_key}")
-
-        ce_df = get_historical_candles_expired(access_token, ce_key, target_date) if is_expired_api and ce_key else (get_historical_candles_current_v3(access_token, ce_key, target_date) if ce_key else pd.DataFrame())
-        pe_df = get_historical_candles_expired(access_token, pe_key, target_date) if is_expired_api and pe_key else (get_historical_candles_current_v3(access_token, pe_key, target_date) if pe_key else pd.DataFrame())
-
-        is_expired_for_csv = expiry_date <= target_date
-        for df, opt_type, key in [(ce_df, 'CE', ce_key), (pe_df, 'PE', pe_key)]:
-            if not df.empty:
-                df['instrument_type'], df['strike_price'], df['expiry_date'], df['instrument_key'], df['trading_day'], df['is_expired'] = [opt_type, atm_strike, expiry_date, key, target_date, is_expired_for_csv]
-                all_option_data.append(df)
-                stats['current_candles' if not is_expired_api else 'expired_candles'] += len(df)
-                print(f"[DATA] Stored {opt_type} candles: {len(df)}")
-            else:
-                print(f"[ZENITSU-TEARS] {opt_type} candles empty for {target_date} (key={key})")
-        
-        if ce_df.empty and pe_df.empty: stats['failed_days'] += 1
+        day_frames, day_stats = process_trading_day(access_token, target_date, nifty_df, available_expired,
+                                                    available_current)
+        all_option_data.extend(day_frames)
+        for key, value in day_stats.items():
+            stats[key] += value
 
     if all_option_data:
         final_df = pd.concat(all_option_data, ignore_index=True).sort_values(['trading_day', 'datetime', 'instrument_type']).reset_index(drop=True)
-        output_file = 'atm_daily_options_HYBRID_V3_ULTRA_FIXED.csv'
-        final_df.to_csv(output_file, index=False)
+        final_df.to_csv(OUTPUT_FILE, index=False)
         print(f"\n{'='*70}\n💾 SAVING FINAL DATA\n{'='*70}")
-        print(f"\n🎉 ULTRA INSTINCT SUCCESS! Saved {len(final_df)} candles to {output_file}")
+        print(f"\n🎉 ULTRA INSTINCT SUCCESS! Saved {len(final_df)} candles to {OUTPUT_FILE}")
         print(f"\n📊 STATS: Days: {final_df['trading_day'].nunique()}/{len(days_to_process)} | Failed: {stats['failed_days']}")
     else:
         print("\n[ZENITSU-TEARS] No option data collected.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # python Upstox_DataFetcher.py --update  -> fetch only missing / partial days
+    if "--update" in sys.argv:
+        update()
+    else:
+        main()
\ No newline at end of file
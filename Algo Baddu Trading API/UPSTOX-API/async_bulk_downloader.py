@@ -0,0 +1,162 @@
+"""
+UPSTOX ASYNC BULK DOWNLOADER - RESUMABLE, RATE-BUDGETED 🔥
+
+Upstox_DataFetcher.main() walks the days one by one with a 0.5s pause and
+only slows down after a 429. This runner:
+- Processes several trading days concurrently (asyncio + worker threads,
+  bounded by a semaphore) using the same per-day pipeline (process_trading_day)
+- Every HTTP call goes through the shared Upstox client (core/token_guard), whose
+  sliding-window limiter enforces ALL Upstox windows (50/sec, 500/min, 2000/30min) BEFORE
+  the request goes out
+- Checkpoints each finished day to its own CSV; a re-run skips those days
+- Merges the day files into the usual ATM options CSV at the end
+
+Run locally:
+    python async_bulk_downloader.py
+"""
+
+import os
+import glob
+import time
+import asyncio
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+import config
+import Upstox_DataFetcher as fetcher
+from core.token_guard import get_upstox_client
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "download_checkpoints")
+OUTPUT_FILE = 'atm_daily_options_HYBRID_V3_ULTRA_FIXED.csv'
+
+
+# ---------------------------
+# Checkpoints
+# ---------------------------
+
+def _day_path(checkpoint_dir, target_date):
+    return os.path.join(checkpoint_dir, f"{target_date}.csv")
+
+
+def completed_days(checkpoint_dir=CHECKPOINT_DIR):
+    """Days that already have a checkpoint file."""
+    return {os.path.splitext(os.path.basename(p))[0] for p in glob.glob(os.path.join(checkpoint_dir, "*.csv"))}
+
+
+def save_day(checkpoint_dir, target_date, frames):
+    """Write one day's CE/PE candles atomically (a partial file never looks complete)."""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = _day_path(checkpoint_dir, target_date)
+    tmp_path = f"{path}.tmp"
+    pd.concat(frames, ignore_index=True).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def merge_checkpoints(days, checkpoint_dir=CHECKPOINT_DIR, output_file=OUTPUT_FILE):
+    """Concatenate the day files for `days` into the final options CSV (same ordering as main())."""
+    paths = [_day_path(checkpoint_dir, d) for d in days if os.path.exists(_day_path(checkpoint_dir, d))]
+    if not paths:
+        return None
+    final_df = pd.concat([pd.read_csv(p) for p in paths], ignore_index=True)
+    final_df = final_df.sort_values(['trading_day', 'datetime', 'instrument_type']).reset_index(drop=True)
+    final_df.to_csv(output_file, index=False)
+    return final_df
+
+
+# ---------------------------
+# Async runner
+# ---------------------------
+
+async def download_days(access_token, nifty_df, days, available_expired, available_current,
+                        concurrency=8, checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Download all `days` with at most `concurrency` in flight; days with a checkpoint are skipped.
+
+    Returns:
+        stats dict (done / skipped / failed days, candle counts)
+    """
+    done = completed_days(checkpoint_dir)
+    pending = [d for d in days if str(d) not in done]
+    stats = {'expired_candles': 0, 'current_candles': 0, 'failed_days': 0,
+             'downloaded_days': 0, 'resumed_days': len(days) - len(pending)}
+    if stats['resumed_days']:
+        print(f"[RESUME] {stats['resumed_days']} day(s) already checkpointed, {len(pending)} to go")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+
+    async def run_day(target_date):
+        async with semaphore:
+            frames, day_stats = await asyncio.to_thread(
+                fetcher.process_trading_day, access_token, target_date, nifty_df,
+                available_expired, available_current
+            )
+        for key, value in day_stats.items():
+            stats[key] += value
+        if frames:
+            await asyncio.to_thread(save_day, checkpoint_dir, target_date, frames)
+            stats['downloaded_days'] += 1
+        finished = stats['downloaded_days'] + stats['failed_days']
+        print(f"📅 [{finished}/{len(pending)}] {target_date}: {'✅ saved' if frames else '❌ no data'}")
+
+    await asyncio.gather(*(run_day(d) for d in pending))
+    return stats
+
+
+def main(concurrency=8, months=6):
+    print("="*70)
+    print("🔥 UPSTOX ASYNC BULK DOWNLOADER (rate-budgeted, resumable)")
+    print("="*70)
+
+    access_token = fetcher.load_access_token()
+    if not access_token:
+        print("[ZENITSU-TEARS] No access token found. Run upstox_auth to generate one.")
+        return
+
+    try:
+        nifty_df = pd.read_csv(config.NIFTY_DATA_FILE)
+        nifty_df['datetime'] = pd.to_datetime(nifty_df['datetime'])
+        nifty_df['date'] = nifty_df['datetime'].dt.date
+    except Exception as e:
+        print(f"[ZENITSU-TEARS] Failed to load NIFTY CSV: {e}")
+        return
+
+    today = datetime.now().date()
+    start_day = today - timedelta(days=30 * months)
+    days = [d for d in sorted(nifty_df['date'].unique()) if start_day <= d < today]
+    if not days:
+        print("[ZENITSU-TEARS] No trading days in range.")
+        return
+
+    client = get_upstox_client(access_token)
+
+    available_expired = fetcher.get_available_expiries_expired(access_token)
+    available_current = fetcher.get_available_expiries_current(access_token)
+    print(f"[INFO] {len(days)} trading days from {days[0]} to {days[-1]} | concurrency={concurrency}")
+    print(f"[SUCCESS] Expired: {len(available_expired)}, Current candidates: {len(available_current)}")
+
+    started = time.time()
+    stats = asyncio.run(download_days(access_token, nifty_df, days, available_expired, available_current,
+                                      concurrency=concurrency))
+    elapsed = time.time() - started
+
+    final_df = merge_checkpoints(days)
+    client_stats = client.stats()
+    limiter_stats = client_stats['limiter']
+    print(f"\n{'='*70}\n💾 SAVING FINAL DATA\n{'='*70}")
+    if final_df is not None:
+        print(f"🎉 Saved {len(final_df)} candles ({final_df['trading_day'].nunique()}/{len(days)} days) to {OUTPUT_FILE}")
+    else:
+        print("[ZENITSU-TEARS] No option data collected.")
+    print(f"📊 Downloaded: {stats['downloaded_days']} | Resumed: {stats['resumed_days']} | "
+          f"Failed: {stats['failed_days']} | {elapsed:.1f}s")
+    print(f"🚦 Requests: {limiter_stats['requests']} | Time spent waiting for rate budget: {limiter_stats['wait_sec']}s")
+    for endpoint, entry in sorted(client_stats['endpoints'].items(), key=lambda kv: -kv[1]['calls']):
+        print(f"   {endpoint}: {entry['calls']} calls | {entry['errors']} errors | {entry['rate_limited']}x 429 | "
+              f"avg {entry['avg_ms']}ms")
+
+
+if __name__ == "__main__":
+    main()
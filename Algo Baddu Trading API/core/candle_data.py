@@ -0,0 +1,516 @@
+"""
+Candle Data - local market-data warehouse shared by backtest and live
+
+Layout (append-only Arrow IPC segments, partitioned by instrument / interval / date):
+    <root>/<instrument>/<interval>/<YYYY-MM-DD>/<seq>.arrow
+    <root>/index.json   - covered days per (instrument, interval): rows, first/last bar,
+                          complete flag (past day fully fetched), segment count
+    <root>/index.lock   - cross-process lock; every index update re-reads index.json under it,
+                          so the live bot, fetchers and backtests never erase each other's days
+
+- write() only appends bars a day does not already hold, so re-fetching never duplicates
+- A past day that was fetched is marked complete; missing_days() / missing_range() tell
+  fetchers exactly what still has to be downloaded
+- read() memory-maps the segments (pa.memory_map) and returns one sorted DataFrame
+
+Usage:
+    from core.candle_data import get_warehouse
+    wh = get_warehouse()
+    wh.write("NSE_INDEX|Nifty 50", "5minute", df)
+    df = wh.read("NSE_INDEX|Nifty 50", "5minute", start="2025-06-01", end="2025-06-30")
+"""
+
+import os
+import re
+import json
+import glob
+import uuid
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = os.environ.get(
+    "CANDLE_WAREHOUSE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "market_data")
+)
+
+TIMEZONE = "Asia/Kolkata"
+INDEX_FORMAT = 1
+
+# Dataset name for the per-day ATM CE/PE candles used by the Phase-2 backtests
+ATM_OPTIONS_DATASET = "ATM_OPTIONS|NIFTY"
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+def _is_day(value):
+    """True for a bare date (date object or 'YYYY-MM-DD'), False for a timestamp."""
+    if isinstance(value, datetime) or isinstance(value, pd.Timestamp):
+        return False
+    return isinstance(value, date) or (isinstance(value, str) and len(value) == 10)
+
+
+def _safe_name(text):
+    """Instrument key / interval → directory name ('NSE_INDEX|Nifty 50' → 'NSE_INDEX_Nifty_50')."""
+    return re.sub(r"[^A-Za-z0-9.\-]+", "_", str(text)).strip("_")
+
+
+def _today_ist():
+    return pd.Timestamp.now(tz=TIMEZONE).date()
+
+
+class FileLock:
+    """Exclusive lock on a lock file, held across processes (fcntl on POSIX, msvcrt on Windows)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.handle = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX)
+        else:
+            self.handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after ~10s; keep waiting
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+            else:
+                self.handle.seek(0)
+                msvcrt.locking(self.handle.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.handle.close()
+            self.handle = None
+
+
+class CandleWarehouse:
+    def __init__(self, root=DEFAULT_ROOT):
+        """
+        Args:
+            root: Warehouse directory (created on first write)
+        """
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self.lock_path = os.path.join(root, "index.lock")
+        self.lock = threading.RLock()
+        self.index = None
+        self.index_stamp = None
+        with self.lock:
+            self._refresh_index()
+
+    # ==================== INDEX ====================
+    def _index_stamp(self):
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh_index(self):
+        """Re-read index.json if another process / instance saved it since we last looked (caller holds self.lock)."""
+        stamp = self._index_stamp()
+        if self.index is not None and stamp == self.index_stamp:
+            return
+        self.index = self._load_index()
+        self.index_stamp = self._index_stamp()
+
+    @contextmanager
+    def _exclusive(self):
+        """Thread + cross-process lock for a read-modify-write of the index (fresh copy loaded first)."""
+        with self.lock, FileLock(self.lock_path):
+            self._refresh_index()
+            yield
+
+    def _load_index(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r") as f:
+                    index = json.load(f)
+                if index.get("format") == INDEX_FORMAT:
+                    return index
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"⚠️ Warehouse index unreadable ({e}) - rebuilding from segments")
+            return self._rebuild_index()
+        if glob.glob(os.path.join(self.root, "*", "*", "_meta.json")):
+            return self._rebuild_index()
+        return {"format": INDEX_FORMAT, "instruments": {}}
+
+    def _save_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+        self.index_stamp = self._index_stamp()
+
+    def _rebuild_index(self):
+        """Recreate index.json from the segment files (row counts only, days treated as complete if past)."""
+        index = {"format": INDEX_FORMAT, "instruments": {}}
+        for meta_path in glob.glob(os.path.join(self.root, "*", "*", "_meta.json")):
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            part_dir = os.path.dirname(meta_path)
+            days = {}
+            for day_dir in sorted(glob.glob(os.path.join(part_dir, "????-??-??"))):
+                table = self._read_segments(sorted(glob.glob(os.path.join(day_dir, "*.arrow"))))
+                day = os.path.basename(day_dir)
+                days[day] = self._day_entry(table, complete=_to_date(day) < _today_ist(),
+                                            segments=len(glob.glob(os.path.join(day_dir, "*.arrow"))))
+            index["instruments"].setdefault(meta["instrument"], {})[meta["interval"]] = {"days": days}
+        self.index = index
+        self._save_index()
+        return index
+
+    def _days(self, instrument, interval, create=False):
+        instruments = self.index["instruments"]
+        if create:
+            return instruments.setdefault(instrument, {}).setdefault(interval, {"days": {}})["days"]
+        return instruments.get(instrument, {}).get(interval, {}).get("days", {})
+
+    @staticmethod
+    def _day_entry(table, complete, segments):
+        if table is None or table.num_rows == 0:
+            return {"rows": 0, "first": None, "last": None, "complete": complete, "segments": segments}
+        times = table.column("datetime")
+        return {
+            "rows": table.num_rows,
+            "first": pd.Timestamp(pc.min(times).as_py()).isoformat(),
+            "last": pd.Timestamp(pc.max(times).as_py()).isoformat(),
+            "complete": complete,
+            "segments": segments,
+        }
+
+    # ==================== PATHS & SEGMENTS ====================
+    def _partition_dir(self, instrument, interval):
+        return os.path.join(self.root, _safe_name(instrument), _safe_name(interval))
+
+    def _day_dir(self, instrument, interval, day):
+        return os.path.join(self._partition_dir(instrument, interval), str(day))
+
+    @staticmethod
+    def _read_segments(paths):
+        """Memory-map every segment and concatenate (buffers stay backed by the files)."""
+        tables = []
+        for path in paths:
+            with pa.memory_map(path, "r") as source:
+                tables.append(ipc.open_file(source).read_all())
+        if not tables:
+            return None
+        return pa.concat_tables(tables, promote_options="default")
+
+    def _segment_paths(self, instrument, interval, day):
+        return sorted(glob.glob(os.path.join(self._day_dir(instrument, interval, day), "*.arrow")))
+
+    # ==================== WRITE ====================
+    @staticmethod
+    def normalize(df, key_columns=()):
+        """Canonical frame: tz-aware 'datetime' (IST) first, sorted, one row per (bar, key_columns)."""
+        out = df.copy()
+        if "datetime" not in out.columns:
+            out["datetime"] = out["timestamp"]
+        out["datetime"] = pd.to_datetime(out["datetime"])
+        if out["datetime"].dt.tz is None:
+            out["datetime"] = out["datetime"].dt.tz_localize(TIMEZONE)
+        else:
+            out["datetime"] = out["datetime"].dt.tz_convert(TIMEZONE)
+        out["datetime"] = out["datetime"].astype(f"datetime64[ns, {TIMEZONE}]")
+        for col in out.columns:
+            # Mixed/object columns (dates, bools from CSVs) are stored as strings
+            if col != "datetime" and out[col].dtype == object:
+                out[col] = out[col].astype(str)
+        columns = ["datetime"] + [c for c in out.columns if c != "datetime"]
+        out = out[columns].drop_duplicates(subset=["datetime", *key_columns], keep="last")
+        return out.sort_values("datetime", kind="stable").reset_index(drop=True)
+
+    def write(self, instrument, interval, df, complete=None, key_columns=()):
+        """
+        Append bars that are not stored yet.
+
+        Args:
+            instrument: Instrument key (e.g. 'NSE_INDEX|Nifty 50') or dataset name
+            interval: e.g. '1minute', '5minute'
+            df: Candles with 'datetime' (or 'timestamp') and OHLC(V) columns
+            complete: Mark written days complete; default = every day before today (IST)
+            key_columns: Extra columns that distinguish rows sharing a timestamp (e.g. 'instrument_key')
+
+        Returns:
+            Number of new rows written
+        """
+        if df is None or df.empty:
+            return 0
+        frame = self.normalize(df, key_columns)
+        frame_days = frame["datetime"].dt.date
+        today = _today_ist()
+        written = 0
+
+        with self._exclusive():
+            part_dir = self._partition_dir(instrument, interval)
+            os.makedirs(part_dir, exist_ok=True)
+            meta_path = os.path.join(part_dir, "_meta.json")
+            if not os.path.exists(meta_path):
+                with open(meta_path, "w") as f:
+                    json.dump({"instrument": instrument, "interval": interval}, f)
+
+            days = self._days(instrument, interval, create=True)
+            for day, day_frame in frame.groupby(frame_days, sort=True):
+                existing_paths = self._segment_paths(instrument, interval, day)
+                existing = self._read_segments(existing_paths)
+                if existing is not None and existing.num_rows:
+                    stored = existing.select(["datetime", *key_columns]).to_pandas()
+                    row_keys = ["datetime", *key_columns]
+                    seen = set(map(tuple, stored[row_keys].astype(str).to_numpy()))
+                    mask = [tuple(row) not in seen for row in day_frame[row_keys].astype(str).to_numpy()]
+                    day_frame = day_frame[mask]
+
+                day_complete = (day < today) if complete is None else complete
+                segments = len(existing_paths)
+                if not day_frame.empty:
+                    day_dir = self._day_dir(instrument, interval, day)
+                    os.makedirs(day_dir, exist_ok=True)
+                    table = pa.Table.from_pandas(day_frame, preserve_index=False)
+                    # Unique name: a segment can never replace another writer's file
+                    path = os.path.join(day_dir, f"{segments:04d}_{os.getpid()}_{uuid.uuid4().hex[:8]}.arrow")
+                    tmp_path = f"{path}.tmp"
+                    with pa.OSFile(tmp_path, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+                    os.replace(tmp_path, path)
+                    segments += 1
+                    written += len(day_frame)
+                    existing = table if existing is None else pa.concat_tables([existing, table],
+                                                                               promote_options="default")
+
+                previous = days.get(str(day), {})
+                days[str(day)] = self._day_entry(existing, previous.get("complete", False) or day_complete, segments)
+            self._save_index()
+        return written
+
+    def mark_complete(self, instrument, interval, days):
+        """Record days as fully fetched even if they hold no bars (holidays, weekends)."""
+        with self._exclusive():
+            entries = self._days(instrument, interval, create=True)
+            for day in days:
+                entry = entries.setdefault(str(_to_date(day)), self._day_entry(None, True, 0))
+                entry["complete"] = True
+            self._save_index()
+
+    def drop_day(self, instrument, interval, day):
+        """Forget one day (segments + index entry) so it can be downloaded again from scratch."""
+        with self._exclusive():
+            shutil.rmtree(self._day_dir(instrument, interval, _to_date(day)), ignore_errors=True)
+            self._days(instrument, interval).pop(str(_to_date(day)), None)
+            self._save_index()
+
+    # ==================== READ ====================
+    def read(self, instrument, interval, start=None, end=None, columns=None):
+        """
+        Bars for [start, end] (dates or timestamps, inclusive), memory-mapped from disk.
+
+        Returns:
+            DataFrame sorted by datetime (empty if nothing is stored)
+        """
+        start_ts = pd.Timestamp(start) if start is not None else None
+        end_ts = pd.Timestamp(end) if end is not None else None
+        start_day = start_ts.date() if start_ts is not None else None
+        end_day = end_ts.date() if end_ts is not None else None
+
+        with self.lock:
+            self._refresh_index()
+            day_keys = sorted(d for d, e in self._days(instrument, interval).items() if e["rows"])
+        day_keys = [d for d in day_keys
+                    if (start_day is None or _to_date(d) >= start_day) and (end_day is None or _to_date(d) <= end_day)]
+
+        paths = [p for d in day_keys for p in self._segment_paths(instrument, interval, d)]
+        table = self._read_segments(paths)
+        if table is None:
+            return pd.DataFrame()
+        if columns is not None:
+            table = table.select(["datetime"] + [c for c in columns if c != "datetime"])
+        df = table.to_pandas().sort_values("datetime", kind="stable").reset_index(drop=True)
+
+        # Timestamps (not bare dates) narrow the range inside the first/last day
+        if start_ts is not None and not _is_day(start):
+            df = df[df["datetime"] >= (start_ts if start_ts.tz else start_ts.tz_localize(TIMEZONE))]
+        if end_ts is not None and not _is_day(end):
+            df = df[df["datetime"] <= (end_ts if end_ts.tz else end_ts.tz_localize(TIMEZONE))]
+        return df.reset_index(drop=True)
+
+    def read_day(self, instrument, interval, day):
+        return self.read(instrument, interval, start=_to_date(day), end=_to_date(day))
+
+    # ==================== COVERAGE ====================
+    def covered_days(self, instrument, interval):
+        """Days that are complete (nothing left to download)."""
+        with self.lock:
+            self._refresh_index()
+            return {_to_date(d) for d, e in self._days(instrument, interval).items() if e.get("complete")}
+
+    def has_day(self, instrument, interval, day):
+        return _to_date(day) in self.covered_days(instrument, interval)
+
+    def missing_days(self, instrument, interval, days):
+        """Subset of `days` that still has to be downloaded."""
+        covered = self.covered_days(instrument, interval)
+        return [d for d in days if _to_date(d) not in covered]
+
+    def missing_range(self, instrument, interval, start, end):
+        """
+        Smallest [from, to] date span covering every not-yet-complete weekday in [start, end],
+        or None if the warehouse already has all of it.
+        """
+        covered = self.covered_days(instrument, interval)
+        day, end_day = _to_date(start), _to_date(end)
+        missing = []
+        while day <= end_day:
+            if day.weekday() < 5 and day not in covered:
+                missing.append(day)
+            day += timedelta(days=1)
+        if not missing:
+            return None
+        return missing[0], missing[-1]
+
+    def coverage(self, instrument, interval):
+        """Contiguous runs of complete days: [(first_day, last_day), ...] (weekend gaps bridged)."""
+        days = sorted(self.covered_days(instrument, interval))
+        ranges = []
+        for day in days:
+            if ranges and (day - ranges[-1][1]).days <= 3:
+                ranges[-1][1] = day
+            else:
+                ranges.append([day, day])
+        return [tuple(r) for r in ranges]
+
+    def instruments(self):
+        """{instrument: [intervals]} currently stored."""
+        with self.lock:
+            self._refresh_index()
+            return {name: sorted(intervals) for name, intervals in self.index["instruments"].items()}
+
+    # ==================== IMPORT ====================
+    def import_csv(self, path, instrument, interval, only_if_changed=False, **read_csv_kwargs):
+        """
+        Append an existing candle CSV (e.g. nifty_5min_last_year.csv); bars already stored are skipped.
+
+        Args:
+            only_if_changed: Skip the file if it was imported before and has not been modified since
+        """
+        mtime = os.path.getmtime(path)
+        source_key = f"{instrument}|{interval}|{os.path.abspath(path)}"
+        with self.lock:
+            self._refresh_index()
+            sources = self.index.get("sources", {})
+            if only_if_changed and sources.get(source_key) == mtime:
+                return 0
+        df = pd.read_csv(path, **read_csv_kwargs)
+        written = self.write(instrument, interval, df,
+                             key_columns=("instrument_key",) if "instrument_key" in df.columns else ())
+        with self._exclusive():
+            self.index.setdefault("sources", {})[source_key] = mtime
+            self._save_index()
+        logger.info(f"📦 Imported {written} new bars from {os.path.basename(path)} → {instrument} {interval}")
+        return written
+
+
+_warehouses = {}
+_warehouses_lock = threading.Lock()
+
+
+def get_warehouse(root=DEFAULT_ROOT):
+    """Process-wide CandleWarehouse per root directory."""
+    with _warehouses_lock:
+        if root not in _warehouses:
+            _warehouses[root] = CandleWarehouse(root)
+        return _warehouses[root]
+
+
+# ==================== CANDLE DECODING ====================
+# Upstox candle timestamps: '2025-06-02T09:15:00+05:30'
+IST_SUFFIX = "+05:30"
+CANDLE_COLUMNS = ["open", "high", "low", "close", "volume", "oi"]
+CANDLE_DTYPES = {"open": "float64", "high": "float64", "low": "float64", "close": "float64",
+                 "volume": "int64", "oi": "int64"}
+
+
+def parse_ist_timestamps(values):
+    """
+    ISO-8601 '+05:30' strings → tz-aware DatetimeIndex (IST).
+    Fixed format: numpy parses the first 19 characters in C; any other offset/format
+    falls back to pd.to_datetime. Naive timestamps are taken as IST.
+    """
+    arr = np.asarray(values, dtype=str)
+    if arr.size and np.char.endswith(arr, IST_SUFFIX).all() and (np.char.str_len(arr) == 25).all():
+        utc = arr.astype("U19").astype("datetime64[s]") - np.timedelta64(5 * 3600 + 30 * 60, "s")
+        return pd.DatetimeIndex(utc.astype("datetime64[ns]")).tz_localize("UTC").tz_convert(TIMEZONE)
+    parsed = pd.DatetimeIndex(pd.to_datetime(arr, format="ISO8601"))
+    parsed = parsed.tz_localize(TIMEZONE) if parsed.tz is None else parsed.tz_convert(TIMEZONE)
+    return parsed.as_unit("ns")
+
+
+def decode_candles(candles, keep_timestamp=False):
+    """
+    Raw Upstox candle array [[ts, o, h, l, c, vol(, oi)], ...] → DataFrame of typed NumPy columns.
+
+    Args:
+        keep_timestamp: Also keep the raw ISO string as 'timestamp' (first column)
+
+    Returns:
+        DataFrame with ['timestamp'], open, high, low, close, volume, [oi], datetime (IST)
+    """
+    if not candles:
+        return pd.DataFrame()
+    columns = list(zip(*candles))[:1 + len(CANDLE_COLUMNS)]
+    data = {}
+    if keep_timestamp:
+        data["timestamp"] = list(columns[0])
+    for name, values in zip(CANDLE_COLUMNS, columns[1:]):
+        dtype = CANDLE_DTYPES[name]
+        array = np.asarray(values, dtype="float64")
+        data[name] = array.astype(dtype) if dtype == "int64" and not np.isnan(array).any() else array
+    data["datetime"] = parse_ist_timestamps(columns[0])
+    return pd.DataFrame(data)
+
+
+def candles_to_frame(candles):
+    """Raw Upstox candle lists [ts, o, h, l, c, vol(, oi)] → DataFrame with 'datetime'."""
+    return decode_candles(candles)
+
+
+def frame_to_candles(df):
+    """Warehouse frame → raw Upstox candle lists (what warm-up code consumes)."""
+    if df is None or df.empty:
+        return []
+    cols = [c for c in ("open", "high", "low", "close", "volume", "oi") if c in df.columns]
+    times = df["datetime"].map(pd.Timestamp.isoformat).tolist()
+    values = df[cols].astype(object).to_numpy().tolist()
+    return [[ts, *row] for ts, row in zip(times, values)]
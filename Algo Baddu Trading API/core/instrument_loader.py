@@ -0,0 +1,342 @@
+"""
+Instrument Loader - one locally cached instrument index for NSE_FO, NSE_INDEX and MCX
+
+Upstox master files (NSE.json.gz, MCX.json.gz) are downloaded at most once a day,
+reduced to the segments we trade and stored as columnar Arrow files:
+    <cache_dir>/<exchange>.arrow       - instrument_key, segment, underlying, instrument_type,
+                                         expiry, strike, lot_size, trading_symbol
+    <cache_dir>/<exchange>.meta.json   - build date, ETag / Last-Modified for conditional refresh
+
+- Each exchange is loaded only when a caller asks for it (a commodity-only bot never
+  downloads the much larger NSE master)
+- A cache built today is used without touching the network
+- An older cache is served immediately and refreshed in a background thread
+  (If-None-Match / If-Modified-Since - an unchanged master is not downloaded again)
+- Lookups are dict hits: (underlying, expiry, strike, option type) → instrument key,
+  nearest expiry / future by binary search over sorted expiries
+
+Usage:
+    from core.instrument_loader import get_instrument_index
+    index = get_instrument_index(("NSE",))
+    expiry = index.nearest_expiry("NIFTY")
+    ce_key, pe_key = index.option_keys("NIFTY", expiry, 24500)
+    future = get_instrument_index(("MCX",)).nearest_future("CRUDEOIL")
+"""
+
+import os
+import gzip
+import json
+import bisect
+import logging
+import threading
+from datetime import datetime, date
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from core.token_guard import get_upstox_client
+
+logger = logging.getLogger(__name__)
+
+MASTER_URLS = {
+    "NSE": "https://assets.upstox.com/market-quote/instruments/exchange/NSE.json.gz",
+    "MCX": "https://assets.upstox.com/market-quote/instruments/exchange/MCX.json.gz",
+}
+
+# Segments kept from each master (NSE_EQ etc. are dropped)
+SEGMENTS = {"NSE": {"NSE_FO", "NSE_INDEX"}, "MCX": {"MCX_FO"}}
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "INSTRUMENT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "market_data", "instruments")
+)
+
+# MCX-only futures index CommodityKeySelector kept before this loader; removed on first use
+LEGACY_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Phase-3",
+                                "instrument_cache")
+LEGACY_CACHE_FILES = ("MCX_futures_index.json",)
+
+TIMEZONE = "Asia/Kolkata"
+COLUMNS = ["instrument_key", "segment", "underlying", "instrument_type", "expiry", "strike", "lot_size",
+           "trading_symbol"]
+OPTION_TYPES = ("CE", "PE")
+
+
+def _today():
+    return datetime.now().date()
+
+
+def _expiry_str(value):
+    """date / datetime / 'YYYY-MM-DD' → 'YYYY-MM-DD'"""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)[:10]
+
+
+def master_to_frame(instruments, segments):
+    """
+    Master rows → columnar frame with one row per instrument of `segments`.
+    Expiries are IST dates ('YYYY-MM-DD'), strikes floats (NaN for futures / indices).
+    """
+    rows = [item for item in instruments if item.get("segment") in segments]
+    if not rows:
+        return pd.DataFrame(columns=COLUMNS)
+    raw = pd.DataFrame.from_records(rows)
+    for col in ("underlying_symbol", "expiry", "strike_price", "lot_size", "trading_symbol", "name"):
+        if col not in raw.columns:
+            raw[col] = None
+
+    expiry = pd.to_datetime(pd.to_numeric(raw["expiry"], errors="coerce"), unit="ms", utc=True)
+    frame = pd.DataFrame({
+        "instrument_key": raw["instrument_key"].astype(str),
+        "segment": raw["segment"].astype(str),
+        # Indices carry no underlying_symbol; their name ('Nifty 50') is the lookup symbol
+        "underlying": raw["underlying_symbol"].fillna(raw["name"]).fillna(raw["trading_symbol"]).astype(str),
+        "instrument_type": raw["instrument_type"].fillna("").astype(str),
+        "expiry": expiry.dt.tz_convert(TIMEZONE).dt.strftime("%Y-%m-%d").fillna(""),
+        "strike": pd.to_numeric(raw["strike_price"], errors="coerce").astype("float64"),
+        "lot_size": pd.to_numeric(raw["lot_size"], errors="coerce").fillna(0).astype("int64"),
+        "trading_symbol": raw["trading_symbol"].fillna("").astype(str),
+    })
+    return frame[COLUMNS]
+
+
+# ==================== INDEX ====================
+class InstrumentIndex:
+    """Columnar instrument table + hash / sorted-expiry indexes over it."""
+
+    def __init__(self, frame):
+        self.frame = frame.reset_index(drop=True)
+        self.keys = keys = self.frame["instrument_key"].tolist()
+        underlyings = self.frame["underlying"].tolist()
+        types = self.frame["instrument_type"].tolist()
+        expiries = self.frame["expiry"].tolist()
+        strikes = self.frame["strike"].tolist()
+
+        self.contracts = {}   # (underlying, expiry, strike, CE/PE) → row
+        self.futures = {}     # underlying → [(expiry, row), ...] sorted
+        self.by_key = {}      # instrument_key → row
+        option_expiries = {}
+        for row, (key, underlying, kind, expiry, strike) in enumerate(zip(keys, underlyings, types, expiries, strikes)):
+            self.by_key[key] = row
+            if kind in OPTION_TYPES and expiry:
+                self.contracts[(underlying, expiry, int(round(strike)), kind)] = row
+                option_expiries.setdefault(underlying, set()).add(expiry)
+            elif kind == "FUT" and expiry:
+                self.futures.setdefault(underlying, []).append((expiry, row))
+        self.option_expiries = {u: sorted(e) for u, e in option_expiries.items()}
+        for rows in self.futures.values():
+            rows.sort()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def row(self, position):
+        """One instrument as a dict."""
+        return self.frame.iloc[position].to_dict()
+
+    def get(self, instrument_key):
+        position = self.by_key.get(instrument_key)
+        return None if position is None else self.row(position)
+
+    def option_key(self, underlying, expiry, strike, option_type):
+        """Instrument key for one option contract, or None."""
+        position = self.contracts.get((underlying, _expiry_str(expiry), int(round(strike)), option_type))
+        return None if position is None else self.keys[position]
+
+    def option_keys(self, underlying, expiry, strike):
+        """(ce_key, pe_key) for a strike."""
+        return tuple(self.option_key(underlying, expiry, strike, kind) for kind in OPTION_TYPES)
+
+    def expiries(self, underlying, on_or_after=None):
+        """Sorted option expiries ('YYYY-MM-DD') from on_or_after (default today)."""
+        expiries = self.option_expiries.get(underlying, [])
+        start = _expiry_str(on_or_after or _today())
+        return expiries[bisect.bisect_left(expiries, start):]
+
+    def nearest_expiry(self, underlying, on_or_after=None):
+        expiries = self.expiries(underlying, on_or_after)
+        return expiries[0] if expiries else None
+
+    def nearest_future(self, underlying, on_or_after=None):
+        """Nearest future expiring on/after the date: dict with instrument_key, lot_size, expiry, trading_symbol."""
+        futures = self.futures.get(underlying, [])
+        start = _expiry_str(on_or_after or _today())
+        position = bisect.bisect_left(futures, (start, -1))
+        if position == len(futures):
+            return None
+        return self.row(futures[position][1])
+
+
+# ==================== LOADER ====================
+def remove_legacy_cache(cache_dir=LEGACY_CACHE_DIR):
+    """Delete the old Phase-3/instrument_cache MCX index (superseded by <cache_dir>/MCX.arrow)."""
+    for name in LEGACY_CACHE_FILES:
+        path = os.path.join(cache_dir, name)
+        for stale in (path, f"{path}.tmp"):
+            try:
+                os.remove(stale)
+                logger.info(f"🧹 Removed legacy instrument cache {stale}")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"⚠️ Could not remove legacy instrument cache {stale}: {e}")
+    try:
+        os.rmdir(cache_dir)  # only if nothing else lives there
+    except OSError:
+        pass
+
+
+class InstrumentLoader:
+    def __init__(self, exchanges=("NSE", "MCX"), cache_dir=DEFAULT_CACHE_DIR):
+        """
+        Args:
+            exchanges: Default master files for get_index() (keys of MASTER_URLS)
+            cache_dir: Where the columnar masters and their metadata live
+        """
+        self.exchanges = tuple(exchanges)
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        self.frames = {}
+        self.meta = {}
+        self.refreshing = set()
+        self.indexes = {}  # exchanges tuple → InstrumentIndex over those masters
+
+    def _paths(self, exchange):
+        base = os.path.join(self.cache_dir, exchange)
+        return f"{base}.arrow", f"{base}.meta.json"
+
+    def _load_cached(self, exchange):
+        data_path, meta_path = self._paths(exchange)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, {}
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            with pa.memory_map(data_path, "r") as source:
+                frame = ipc.open_file(source).read_all().to_pandas()
+            return frame, meta
+        except (OSError, ValueError, pa.ArrowInvalid) as e:
+            logger.warning(f"⚠️ {exchange} instrument cache unreadable ({e}) - downloading again")
+            return None, {}
+
+    def _save_cached(self, exchange, frame, meta):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data_path, meta_path = self._paths(exchange)
+        if frame is not None:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            with pa.OSFile(f"{data_path}.tmp", "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(f"{data_path}.tmp", data_path)
+        with open(f"{meta_path}.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    def refresh(self, exchange):
+        """Conditional download of one master; the index is rebuilt only if it changed."""
+        meta = dict(self.meta.get(exchange, {}))
+        headers = {}
+        if exchange in self.frames:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            logger.info(f"📥 Checking {exchange} instrument master...")
+            response = get_upstox_client().get(MASTER_URLS[exchange], headers=headers, timeout=60)
+            if response.status_code == 304:
+                meta["built"] = _today().isoformat()
+                self._save_cached(exchange, None, meta)
+                with self.lock:
+                    self.meta[exchange] = meta
+                logger.info(f"✅ {exchange} master unchanged - cached index kept")
+                return True
+            if response.status_code != 200:
+                logger.error(f"❌ Failed to download {exchange} master: {response.status_code}")
+                return False
+
+            instruments = json.loads(gzip.decompress(response.content))
+            frame = master_to_frame(instruments, SEGMENTS[exchange])
+            meta = {"built": _today().isoformat(), "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"), "rows": len(frame)}
+            self._save_cached(exchange, frame, meta)
+            with self.lock:
+                self.frames[exchange] = frame
+                self.meta[exchange] = meta
+                self._drop_indexes(exchange)
+            logger.info(f"✅ {exchange} master: {len(instruments)} instruments → {len(frame)} indexed")
+            return True
+        except Exception as e:
+            logger.error(f"💥 {exchange} master refresh failed: {e}", exc_info=True)
+            return False
+        finally:
+            with self.lock:
+                self.refreshing.discard(exchange)
+
+    def _refresh_in_background(self, exchange):
+        with self.lock:
+            if exchange in self.refreshing:
+                return
+            self.refreshing.add(exchange)
+        threading.Thread(target=self.refresh, args=(exchange,), name=f"{exchange}-master-refresh", daemon=True).start()
+
+    def _drop_indexes(self, exchange):
+        """Forget every combined index built over `exchange` (caller holds the lock)."""
+        self.indexes = {key: index for key, index in self.indexes.items() if exchange not in key}
+
+    def get_index(self, exchanges=None):
+        """
+        InstrumentIndex over `exchanges` (default: the loader's exchanges), None if none could be loaded.
+        Only those masters are read / downloaded; only a cold start (no cache) waits on a download.
+        """
+        exchanges = tuple(exchanges or self.exchanges)
+        today = _today().isoformat()
+        for exchange in exchanges:
+            if exchange not in self.frames:
+                frame, meta = self._load_cached(exchange)
+                if frame is not None:
+                    with self.lock:
+                        if exchange not in self.frames:
+                            self.frames[exchange] = frame
+                            self.meta[exchange] = meta
+                            self._drop_indexes(exchange)
+            if exchange not in self.frames:
+                self.refresh(exchange)
+            elif self.meta.get(exchange, {}).get("built") != today:
+                self._refresh_in_background(exchange)
+
+        with self.lock:
+            loaded = tuple(e for e in exchanges if e in self.frames)
+            if not loaded:
+                return None
+            if exchanges not in self.indexes:
+                self.indexes[exchanges] = InstrumentIndex(pd.concat([self.frames[e] for e in loaded],
+                                                                    ignore_index=True))
+            return self.indexes[exchanges]
+
+
+_loader = None
+_loader_lock = threading.Lock()
+
+
+def get_instrument_loader():
+    """Process-wide InstrumentLoader (NSE + MCX)."""
+    global _loader
+    with _loader_lock:
+        if _loader is None:
+            remove_legacy_cache()
+            _loader = InstrumentLoader()
+        return _loader
+
+
+def get_instrument_index(exchanges=None):
+    """
+    Shortcut: the process-wide InstrumentIndex (None if unavailable).
+
+    Args:
+        exchanges: Masters the caller needs, e.g. ("MCX",); default NSE + MCX
+    """
+    return get_instrument_loader().get_index(exchanges)
@@ -0,0 +1,260 @@
+"""
+Token Guard - process-wide Upstox HTTP client
+One pooled session + one rate budget for every module that talks to Upstox.
+
+- Keep-alive connection pooling (requests.Session + HTTPAdapter)
+- Multi-window sliding-window limiter matching Upstox limits (50/s, 500/min, 2000/30min),
+  waited on BEFORE a request is sent
+- Retries on 429 / 5xx / connection errors with exponential backoff + jitter
+- Per-endpoint call, error, 429 and latency counters
+
+Usage:
+    from core.token_guard import get_upstox_client
+    client = get_upstox_client(access_token)
+    response = client.get(url, timeout=10)
+"""
+
+import re
+import time
+import random
+import logging
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Upstox API limits: (requests, window seconds)
+UPSTOX_RATE_LIMITS = [(50, 1), (500, 60), (2000, 1800)]
+
+# Only these hosts count against the API budget (assets.upstox.com master files do not)
+RATE_LIMITED_HOSTS = {"api.upstox.com"}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+# ==================== RATE LIMITER ====================
+class SlidingWindowLimiter:
+    """
+    One log of send times per rate window; a request goes out only if every window
+    has room, so no window of `window_seconds` ever holds more than its limit.
+    Thread-safe, acquire() blocks the calling thread until all windows allow it.
+    """
+
+    def __init__(self, limits=UPSTOX_RATE_LIMITS, safety=0.9, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            limits: [(max_requests, window_seconds), ...]
+            safety: Fraction of each limit actually used (headroom for other clients)
+            clock: Monotonic time source (seconds)
+            sleep: Blocking sleep used while waiting for budget
+        """
+        self.clock = clock
+        self.sleep = sleep
+        self.windows = [{'limit': max(1, int(max_requests * safety)), 'window': window, 'sent': deque()}
+                        for max_requests, window in limits]
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+        self.total_requests = 0
+        self.total_wait = 0.0
+
+    def _wait_time(self, now):
+        """Seconds until every window has room (0 if a request may go now)."""
+        wait = self.blocked_until - now
+        for w in self.windows:
+            sent = w['sent']
+            while sent and sent[0] <= now - w['window']:
+                sent.popleft()
+            if len(sent) >= w['limit']:
+                wait = max(wait, sent[0] + w['window'] - now)
+        return wait
+
+    def acquire(self):
+        """Block until every window has room, then record the request. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = self.clock()
+                wait = self._wait_time(now)
+                if wait <= 0:
+                    for w in self.windows:
+                        w['sent'].append(now)
+                    self.total_requests += 1
+                    self.total_wait += waited
+                    return waited
+            self.sleep(wait)
+            waited += wait
+
+    def penalize(self, seconds):
+        """Server said 429: hold every thread back for `seconds`."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+
+    def stats(self):
+        with self.lock:
+            return {'requests': self.total_requests, 'wait_sec': round(self.total_wait, 2)}
+
+
+# ==================== ENDPOINT STATS ====================
+# Path segments that identify an instrument/date rather than an endpoint
+_VARIABLE_SEGMENT = re.compile(r"(\||%7C|^\d{4}-\d{2}-\d{2}$|^\d+$)", re.IGNORECASE)
+
+
+def endpoint_name(method, url):
+    """'GET /v3/historical-candle/{}/minutes/{}/{}/{}' - query string and ids stripped."""
+    parts = urlsplit(url)
+    segments = ["{}" if _VARIABLE_SEGMENT.search(seg) else seg for seg in parts.path.split("/")]
+    return f"{method.upper()} {parts.netloc}{'/'.join(segments)}"
+
+
+class EndpointStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, endpoint, latency, status=None, error=False):
+        with self.lock:
+            entry = self.endpoints.setdefault(endpoint, {'calls': 0, 'errors': 0, 'rate_limited': 0,
+                                                         'total_ms': 0.0, 'max_ms': 0.0})
+            ms = latency * 1000
+            entry['calls'] += 1
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+            if status == 429:
+                entry['rate_limited'] += 1
+            if error or (status is not None and status >= 400):
+                entry['errors'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                endpoint: {**entry, 'avg_ms': round(entry['total_ms'] / entry['calls'], 1) if entry['calls'] else 0.0,
+                           'total_ms': round(entry['total_ms'], 1), 'max_ms': round(entry['max_ms'], 1)}
+                for endpoint, entry in self.endpoints.items()
+            }
+
+
+# ==================== CLIENT ====================
+class UpstoxClient:
+    def __init__(self, access_token=None, limits=UPSTOX_RATE_LIMITS, max_retries=4, backoff=0.5,
+                 pool_size=32, timeout=15):
+        """
+        Args:
+            access_token: Sent as Bearer token to api.upstox.com unless the caller passes its own
+                Authorization header
+            limits: Rate windows for the shared limiter
+            max_retries: Retries on 429/5xx/connection errors (0 = single attempt)
+            backoff: Base delay (s) for exponential backoff; full jitter is applied
+            pool_size: Keep-alive connections per host
+            timeout: Default request timeout (s)
+        """
+        self.access_token = access_token
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = SlidingWindowLimiter(limits)
+        self.endpoint_stats = EndpointStats()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def set_access_token(self, access_token):
+        self.access_token = access_token
+
+    def _headers(self, headers, host):
+        merged = {"Accept": "application/json"}
+        # The token only goes to the API - never to public hosts like assets.upstox.com
+        if self.access_token and host in RATE_LIMITED_HOSTS:
+            merged["Authorization"] = f"Bearer {self.access_token}"
+        merged.update(headers or {})
+        return merged
+
+    def _sleep_before_retry(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = random.uniform(0, self.backoff * (2 ** attempt))  # full jitter
+        if response is not None and response.status_code == 429:
+            self.limiter.penalize(delay)
+        time.sleep(delay)
+
+    def request(self, method, url, headers=None, timeout=None, max_retries=None, **kwargs):
+        """
+        Send one request through the shared pool and rate budget.
+
+        Returns:
+            requests.Response (the last one if retries ran out on 429/5xx)
+
+        Raises:
+            requests.exceptions.RequestException if every attempt failed at the connection level
+        """
+        retries = self.max_retries if max_retries is None else max_retries
+        endpoint = endpoint_name(method, url)
+        host = urlsplit(url).hostname
+        limited = host in RATE_LIMITED_HOSTS
+        headers = self._headers(headers, host)
+
+        for attempt in range(retries + 1):
+            if limited:
+                self.limiter.acquire()
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, headers=headers, timeout=timeout or self.timeout, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self.endpoint_stats.record(endpoint, time.monotonic() - started, error=True)
+                if attempt >= retries:
+                    raise
+                logger.warning(f"⚠️ {endpoint} failed ({e.__class__.__name__}), retry {attempt + 1}/{retries}")
+                self._sleep_before_retry(attempt)
+                continue
+
+            self.endpoint_stats.record(endpoint, time.monotonic() - started, status=response.status_code)
+            if response.status_code in RETRY_STATUS and attempt < retries:
+                logger.warning(f"⚠️ {endpoint} -> {response.status_code}, retry {attempt + 1}/{retries}")
+                self._sleep_before_retry(attempt, response)
+                continue
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        """{'limiter': {...}, 'endpoints': {endpoint: counters}}"""
+        return {'limiter': self.limiter.stats(), 'endpoints': self.endpoint_stats.snapshot()}
+
+    def log_stats(self):
+        snapshot = self.stats()
+        logger.info(f"🚦 Upstox requests: {snapshot['limiter']['requests']} | "
+                    f"rate-budget wait: {snapshot['limiter']['wait_sec']}s")
+        for endpoint, entry in sorted(snapshot['endpoints'].items(), key=lambda kv: -kv[1]['calls']):
+            logger.info(f"   {endpoint}: {entry['calls']} calls | {entry['errors']} errors | "
+                        f"{entry['rate_limited']}x 429 | avg {entry['avg_ms']}ms | max {entry['max_ms']}ms")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_upstox_client(access_token=None):
+    """
+    The process-wide client (created on first use).
+
+    Args:
+        access_token: Optional; sets/refreshes the default Bearer token
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = UpstoxClient(access_token)
+        elif access_token and access_token != _client.access_token:
+            _client.set_access_token(access_token)
+        return _client